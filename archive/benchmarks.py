@@ -0,0 +1,334 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# report panels drawn off screen, with the filters of the batch reports
+from scouting_reports import REPORT_PANELS, default_filters
+from IPython.core.interactiveshell import InteractiveShell
+
+# dashboard functions, caches and load time structures
+import plotting
+from filter_cache import filter_cache
+from figure_cache import figure_cache, render_panel
+from filter_index import build_filter_index
+from count_cube import build_count_cube
+from stat_cube import build_stat_cube
+from count_flow import build_count_flow, write_count_flow
+
+# pitch data storage and the summaries stored with it
+from storage import write_pitch_data
+from query_backend import write_profile
+from stat_cube import write_stat_cube
+
+# data preparation stages and synthetic statcast data
+from statcast_prep import CONTEXT_COLUMNS, chunk_context, derive_features, filter_pitch_types, filter_starters, join_names
+from schema import apply_pitch_schema
+from statcast_synthetic import scale_seasons, synthetic_names, synthetic_pitch_data, synthetic_season
+
+
+##### Global Options -----
+
+# data scales benchmarked by default, in seasons
+DEFAULT_SCALES = [1, 5, 20]
+
+# timed runs of each benchmark
+DEFAULT_REPEAT = 3
+
+# slowdown over the baseline reported as a regression
+DEFAULT_TOLERANCE = 0.25
+
+# results file of the benchmark runs
+DEFAULT_OUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "output", "benchmarks", "benchmarks.json")
+
+# committed baseline the runs are compared with, written by a run with --out pointing at it
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "output", "benchmarks", "baseline.json")
+
+
+##### Define Functions -----
+
+'''
+Define a function to clear the filter and figure caches so each run starts cold
+'''
+def clear_caches():
+    filter_cache.clear()
+    figure_cache.clear()
+
+
+'''
+Define a function to time a function over repeated runs and measure its peak memory in
+an extra traced run. Returns the median and fastest seconds, the peak megabytes and
+the last result.
+'''
+def measure(func, repeat = DEFAULT_REPEAT, setup = clear_caches):
+
+    times = []
+    for _ in range(repeat):
+        setup()
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+
+    # tracing slows the run down, so memory is measured separately
+    setup()
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'median_s': float(np.median(times)), 'min_s': float(np.min(times)), 'peak_mb': peak / 1024**2}, result
+
+
+'''
+Define a function to benchmark the data preparation stages on each season of a scale.
+Each stage runs on the output of the previous one, times and peaks are summed and
+maximized over the seasons.
+'''
+def benchmark_prep(scale, repeat, seed = 0):
+
+    stages = dict()
+
+    for season, share in scale_seasons(scale):
+        raw = synthetic_season(season, share, seed)
+
+        stats, context = measure(lambda: chunk_context([raw[CONTEXT_COLUMNS]]), repeat)
+        records = [('chunk_context', stats, len(raw))]
+
+        df = raw
+        for name, stage in [('filter_starters', lambda df: list(filter_starters([df], context['starters']))[0]),
+                            ('join_names', lambda df: list(join_names([df], synthetic_names))[0]),
+                            ('filter_pitch_types', lambda df: list(filter_pitch_types([df]))[0]),
+                            ('derive_features', lambda df: list(derive_features([df], context))[0]),
+                            ('apply_pitch_schema', apply_pitch_schema)]:
+            stats, out = measure(lambda: stage(df), repeat)
+            records.append((name, stats, len(df)))
+            df = out
+
+        for name, stats, rows in records:
+            total = stages.setdefault(name, {'median_s': 0.0, 'min_s': 0.0, 'peak_mb': 0.0, 'rows': 0})
+            total['median_s'] += stats['median_s']
+            total['min_s'] += stats['min_s']
+            total['peak_mb'] = max(total['peak_mb'], stats['peak_mb'])
+            total['rows'] += rows
+
+        del raw, df
+        gc.collect()
+
+    return [dict(group = 'prep', name = name, **stats) for name, stats in stages.items()]
+
+
+'''
+Define a function to benchmark building the load time structures of the dashboard, and
+loading the dashboard data from parquet pitch data as the dashboard starts: read into
+memory with its load time structures, or opened on disk with its stored summaries
+'''
+def benchmark_load(data, repeat):
+
+    results = []
+    for name, func in [('build_filter_index', build_filter_index), ('build_count_cube', build_count_cube),
+                       ('build_stat_cube', build_stat_cube), ('build_count_flow', build_count_flow)]:
+        stats, _ = measure(lambda: func(data), repeat)
+        results.append(dict(group = 'load', name = name, rows = len(data), **stats))
+
+    with tempfile.TemporaryDirectory() as pitch_path:
+
+        # the pitch data is stored with its summaries as the data preparation stores it
+        write_pitch_data(data, pitch_path)
+        write_count_flow(pitch_path)
+        write_profile(pitch_path)
+        write_stat_cube(pitch_path)
+
+        for name, out_of_core in [('load_data', False), ('load_data_out_of_core', True)]:
+            stats, _ = measure(lambda: plotting.load_data(pitch_path, 'pitch_data', columns = plotting.DASHBOARD_COLUMNS,
+                                                          out_of_core = out_of_core), repeat)
+            results.append(dict(group = 'load', name = name, rows = len(data), **stats))
+
+    return results
+
+
+'''
+Define a function to benchmark the filter and aggregation functions and every panel
+for the pitcher with the most pitches, each with cold caches
+'''
+def benchmark_dashboard(data, repeat):
+
+    filters = default_filters(data)
+    pitcher = data['pitcher_name'].value_counts().index[0]
+    results = []
+
+    calls = [('statcast_df_filter', lambda: plotting.statcast_df_filter(data, pitcher, **filters)),
+             ('statcast_df_non_pitcher_filter', lambda: plotting.statcast_df_non_pitcher_filter(data, pitcher, **filters)),
+             ('statcast_count_filter', lambda: plotting.statcast_count_filter(data, ['count', 'pitch_name'], pitcher, **filters)),
+             ('statcast_pitcher_summary_filter', lambda: plotting.statcast_pitcher_summary_filter(data, pitcher, **filters)),
+             ('statcast_tto_summary_filter', lambda: plotting.statcast_tto_summary_filter(data, pitcher, **filters)),
+             ('statcast_count_flow_filter', lambda: plotting.statcast_count_flow_filter(data, pitcher, **filters)),
+             ('statcast_location_density', lambda: plotting.statcast_location_density(data, pitcher, **filters, breakdown_var = 'pitch_name'))]
+
+    for name, func in calls:
+        stats, _ = measure(func, repeat)
+        results.append(dict(group = 'filter', name = name, rows = len(data), **stats))
+
+    # panels are drawn without the figure cache, as on a first selection
+    for _, name, extra in REPORT_PANELS:
+        func = getattr(plotting, name)
+        panel = getattr(func, '__wrapped__', func)
+
+        try:
+            stats, _ = measure(lambda: render_panel(panel, data, pitcher_name_filter = pitcher, **filters, **extra), repeat)
+        except Exception as e:
+            results.append(dict(group = 'panel', name = name, rows = len(data), error = "{}: {}".format(type(e).__name__, e)))
+            continue
+
+        results.append(dict(group = 'panel', name = name, rows = len(data), **stats))
+
+    return results
+
+
+'''
+Define a function to describe the machine and library versions of a benchmark run
+'''
+def run_metadata():
+
+    import matplotlib
+    import plotnine
+
+    return {'date': datetime.datetime.now().isoformat(timespec = 'seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'matplotlib': matplotlib.__version__,
+            'plotnine': plotnine.__version__}
+
+
+'''
+Define a function to run the benchmark suite at each data scale. Groups are any of
+prep, load, filter and panel.
+'''
+def run_benchmarks(scales = DEFAULT_SCALES, repeat = DEFAULT_REPEAT, groups = ('prep', 'load', 'filter', 'panel'),
+                   seed = 0, verbose = True):
+
+    # panels display their outputs through a shell so rich outputs are recorded
+    InteractiveShell.instance()
+
+    results = []
+    for scale in scales:
+
+        scale_results = []
+        if 'prep' in groups:
+            scale_results += benchmark_prep(scale, repeat, seed)
+
+        if set(groups) & {'load', 'filter', 'panel'}:
+            data = synthetic_pitch_data(scale, seed)
+
+            if 'load' in groups:
+                scale_results += benchmark_load(data, repeat)
+
+            # the dashboard loads the data with its filter index, cubes and count transitions
+            build_filter_index(data)
+            build_count_cube(data)
+            build_stat_cube(data)
+            build_count_flow(data)
+
+            if set(groups) & {'filter', 'panel'}:
+                scale_results += [r for r in benchmark_dashboard(data, repeat) if r['group'] in groups]
+
+            del data
+            clear_caches()
+            gc.collect()
+
+        for result in scale_results:
+            result['scale'] = scale
+            if verbose:
+                print_result(result)
+
+        results += scale_results
+
+    return {'meta': run_metadata(), 'results': results}
+
+
+'''
+Define a function to print one benchmark result
+'''
+def print_result(result):
+
+    if 'error' in result:
+        print("{:>5}x {:<7} {:<36} failed: {}".format(result['scale'], result['group'], result['name'], result['error']))
+    else:
+        print("{:>5}x {:<7} {:<36} {:>9.4f} s {:>9.1f} MB {:>10} rows".format(result['scale'], result['group'], result['name'],
+                                                                              result['median_s'], result['peak_mb'], result['rows']))
+
+
+'''
+Define a function to compare benchmark results with a baseline. Returns the benchmarks
+whose median time or peak memory grew by more than the tolerance.
+'''
+def compare_results(results, baseline, tolerance = DEFAULT_TOLERANCE):
+
+    base = {(r['scale'], r['group'], r['name']): r for r in baseline['results'] if 'error' not in r}
+    regressions = []
+
+    for result in results['results']:
+        key = (result['scale'], result['group'], result['name'])
+        if 'error' in result or key not in base:
+            continue
+
+        for metric in ['median_s', 'peak_mb']:
+            ratio = result[metric] / max(base[key][metric], 1e-9)
+            if ratio > 1 + tolerance:
+                regressions.append(dict(scale = key[0], group = key[1], name = key[2], metric = metric,
+                                        baseline = base[key][metric], value = result[metric], ratio = ratio))
+
+    return regressions
+
+
+'''
+Define a function to write benchmark results as json
+'''
+def write_results(results, out_path):
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok = True)
+
+    with open(out_path + ".tmp", "w") as f:
+        json.dump(results, f, indent = 1)
+    os.replace(out_path + ".tmp", out_path)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description = "Benchmark the data preparation and dashboard on synthetic statcast data.")
+    parser.add_argument("--scales", nargs = "+", type = float, default = DEFAULT_SCALES, help = "data scales in seasons")
+    parser.add_argument("--repeat", type = int, default = DEFAULT_REPEAT, help = "timed runs of each benchmark")
+    parser.add_argument("--groups", nargs = "+", choices = ['prep', 'load', 'filter', 'panel'], default = ['prep', 'load', 'filter', 'panel'])
+    parser.add_argument("--out", default = DEFAULT_OUT_PATH, help = "results json")
+    parser.add_argument("--baseline", nargs = "?", const = DEFAULT_BASELINE_PATH, default = None,
+                        help = "baseline json to compare the results with, output/benchmarks/baseline.json when no path is given")
+    parser.add_argument("--tolerance", type = float, default = DEFAULT_TOLERANCE, help = "slowdown reported as a regression")
+    args = parser.parse_args()
+
+    results = run_benchmarks([int(s) if float(s).is_integer() else s for s in args.scales], args.repeat, args.groups)
+    write_results(results, args.out)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            regressions = compare_results(results, json.load(f), args.tolerance)
+
+        for r in regressions:
+            print("regression: {}x {} {} {} {:.4g} -> {:.4g} ({:.2f}x)".format(r['scale'], r['group'], r['name'], r['metric'],
+                                                                              r['baseline'], r['value'], r['ratio']))
+
+        sys.exit(1 if regressions else 0)
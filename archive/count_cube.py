@@ -0,0 +1,160 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+
+# object registry
+import weakref
+
+# dashboard filter index
+from filter_index import RANGE_COLUMN, get_filter_index
+
+
+##### Global Options -----
+
+# filter dimensions of the cube, the batter is left out to keep the cube small
+CUBE_FILTER_COLUMNS = ['pitcher_name',
+                       'pitch_name',
+                       'stand',
+                       'count',
+                       'count_advantage',
+                       'outs_when_up',
+                       'inning',
+                       'runners_on_base']
+
+# result dimensions the bar charts break pitches down by
+CUBE_LABEL_COLUMNS = ['events', 'batted_ball_type']
+
+# registry of built cubes keyed by the id of the data frame they summarise
+_COUNT_CUBES = {}
+
+
+##### Define Classes -----
+
+'''
+Define a class holding the number of pitches in every observed combination of the
+dashboard filter dimensions and the result labels.
+
+Cells are keyed by the integer codes of the filter index, so the code lookups built
+for a filter apply to the cube unchanged. Cells are sorted by pitcher so a pitcher
+query only reads that pitcher's cells.
+'''
+class StatcastCountCube:
+
+    def __init__(self, data, index):
+
+        self.index = index
+        self.uniques = {col: index.uniques[col] for col in CUBE_FILTER_COLUMNS}
+
+        codes = {col: index.codes[col] for col in CUBE_FILTER_COLUMNS}
+
+        # factorize the result labels, missing values get the last code
+        for col in CUBE_LABEL_COLUMNS:
+            col_codes, uniques = pd.factorize(data[col])
+            col_codes = col_codes.astype(np.int32)
+            col_codes[col_codes < 0] = len(uniques)
+            codes[col] = col_codes
+            self.uniques[col] = pd.Index(uniques)
+
+        # factorize the run differential so it can be grouped on with the codes
+        range_codes, range_uniques = pd.factorize(index.range_values)
+        range_codes[range_codes < 0] = len(range_uniques)
+        codes[RANGE_COLUMN] = range_codes.astype(np.int32)
+        range_uniques = np.append(np.asarray(range_uniques, dtype = float), np.nan)
+
+        # count pitches in each observed combination, sorted by pitcher first
+        cells = pd.DataFrame(codes).groupby(list(codes), sort = True).size()
+        cells = cells.reset_index(name = 'n')
+
+        self.n_cells = len(cells)
+        self.cell_codes = {col: cells[col].to_numpy(dtype = np.int32) for col in codes}
+        self.cell_counts = cells['n'].to_numpy(dtype = np.int64)
+        self.cell_range_values = range_uniques[self.cell_codes[RANGE_COLUMN]]
+
+        # cell offsets of each pitcher code
+        pitcher_codes = self.cell_codes['pitcher_name']
+        self.pitcher_offsets = np.searchsorted(pitcher_codes, np.arange(len(self.uniques['pitcher_name']) + 2))
+
+    '''
+    Define a function returning the positions of the cells matching the filters.
+    Filters map a column to a lookup from the filter index, the range is (low, high).
+    '''
+    def cells(self, filters, value_range = None):
+
+        # only read the cells of the selected pitchers
+        if 'pitcher_name' in filters:
+            offsets = self.pitcher_offsets
+            cells = np.concatenate([np.arange(offsets[code], offsets[code + 1])
+                                    for code in np.flatnonzero(filters['pitcher_name'])] +
+                                   [np.empty(0, dtype = np.int64)])
+        else:
+            cells = np.arange(self.n_cells)
+
+        for col, allowed in filters.items():
+            if col == 'pitcher_name' or len(cells) == 0:
+                continue
+            cells = cells[allowed[self.cell_codes[col][cells]]]
+
+        if value_range is not None and len(cells):
+            values = self.cell_range_values[cells]
+            cells = cells[(values >= value_range[0]) & (values <= value_range[1])]
+
+        return cells
+
+    '''
+    Define a function returning the number of pitches by the given columns for the
+    matching cells. Pitches missing any of the columns are left out, like groupby.
+    '''
+    def counts(self, by, filters, value_range = None, name = None):
+
+        cells = self.cells(filters, value_range)
+
+        # drop cells where a grouping column is missing
+        for col in by:
+            cells = cells[self.cell_codes[col][cells] < len(self.uniques[col])]
+
+        # sum the cell counts by the codes of the grouping columns
+        grouped = pd.DataFrame({col: self.cell_codes[col][cells] for col in by})
+        grouped['n'] = self.cell_counts[cells]
+        grouped = grouped.groupby(by, sort = False)['n'].sum()
+
+        # convert the codes back to labels
+        if len(by) == 1:
+            labels = self.uniques[by[0]].take(grouped.index.to_numpy())
+            labels.name = by[0]
+        else:
+            labels = pd.MultiIndex.from_arrays([self.uniques[col].take(grouped.index.get_level_values(col).to_numpy())
+                                                for col in by], names = by)
+
+        counts = pd.Series(grouped.to_numpy(), index = labels, name = by[0] if name is None else name)
+
+        return counts[counts > 0].sort_index()
+
+
+##### Define Functions -----
+
+'''
+Define a function to build the count cube for a data frame and register it
+'''
+def build_count_cube(data):
+
+    cube = StatcastCountCube(data, get_filter_index(data))
+    _COUNT_CUBES[id(data)] = (weakref.ref(data), cube)
+
+    return cube
+
+
+'''
+Define a function to return the registered count cube of a data frame,
+building it on first use
+'''
+def get_count_cube(data):
+
+    entry = _COUNT_CUBES.get(id(data))
+
+    # rebuild if the id was reused by another frame or its filter index was rebuilt
+    if entry is None or entry[0]() is not data or entry[1].index is not get_filter_index(data):
+        return build_count_cube(data)
+
+    return entry[1]
@@ -0,0 +1,264 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+import os
+
+# object registry
+import weakref
+
+# columnar storage
+import pyarrow as pa
+
+# dashboard filter index, the filter dimensions of the count cube and the pitch data storage
+from filter_index import RANGE_COLUMN, StatcastFilterIndex
+from count_cube import CUBE_FILTER_COLUMNS, StatcastCountCube
+from storage import (PARTITION_COLUMNS, open_pitch_dataset, open_summary_dataset, partition_filter, read_pitch_data,
+                     replace_summary, summary_write_path, write_summary_partitions)
+from schema import CATEGORY_ORDERS
+
+
+##### Global Options -----
+
+# counts in order of balls * 3 + strikes, the rows and columns of the transition matrices
+COUNT_LABELS = CATEGORY_ORDERS['count']
+N_COUNTS = len(COUNT_LABELS)
+
+# directory of the stored transitions inside the pitch data, skipped when the pitch data is read
+FLOW_DIR_NAME = '_count_flow'
+
+# dimensions of the stored transition cells, partitioned as the pitch data
+FLOW_KEY_COLUMNS = PARTITION_COLUMNS + CUBE_FILTER_COLUMNS + [RANGE_COLUMN]
+
+# pitch data columns the transitions are built from
+FLOW_COLUMNS = FLOW_KEY_COLUMNS + ['lead_count', 'events']
+
+# pitchers whose pitches are read at once when storing the transitions
+FLOW_PITCHER_GROUP = 50
+
+# registry of built transition cubes keyed by the id of the data frame they summarise
+_COUNT_FLOWS = {}
+
+
+##### Define Classes -----
+
+'''
+Define a class holding the count transitions of every observed combination of the
+dashboard filter dimensions: the pitches going from their count to each next count,
+and the at bat outcomes of the pitches ending an at bat.
+
+A filter selection sums its cells into a 12x12 transition matrix and a matrix of
+outcomes by count, whatever the number of pitches. Cells are built from the stored
+transitions or from pitch data with its next count, and are selected as in the count
+cube with code lookups built from the cube's own labels.
+'''
+class CountFlowCube(StatcastCountCube):
+
+    # the filter code lookups of the cube are built as the filter index builds them
+    allowed_codes = StatcastFilterIndex.allowed_codes
+
+    def __init__(self, cells):
+
+        self.uniques = dict()
+        codes = dict()
+
+        # factorize the filter dimensions and outcomes, missing values get the last code
+        for col in CUBE_FILTER_COLUMNS + ['outcome']:
+            col_codes, uniques = pd.factorize(cells[col])
+            col_codes = col_codes.astype(np.int32)
+            col_codes[col_codes < 0] = len(uniques)
+            codes[col] = col_codes
+            self.uniques[col] = pd.Index(uniques)
+
+        # the next count is coded by its position, the end of the at bat gets the last code
+        next_codes = pd.Categorical(cells['lead_count'], categories = COUNT_LABELS).codes.astype(np.int32)
+        next_codes[next_codes < 0] = N_COUNTS
+        codes['lead_count'] = next_codes
+
+        # factorize the run differential so it can be grouped on with the codes
+        range_codes, range_uniques = pd.factorize(cells[RANGE_COLUMN].to_numpy(dtype = float))
+        range_codes[range_codes < 0] = len(range_uniques)
+        codes[RANGE_COLUMN] = range_codes.astype(np.int32)
+        range_uniques = np.append(np.asarray(range_uniques, dtype = float), np.nan)
+
+        # add up the cells of every season and chunk, sorted by pitcher first
+        grouped = pd.DataFrame(codes).assign(n = cells['n'].to_numpy()).groupby(list(codes), sort = True)['n'].sum()
+        grouped = grouped.reset_index()
+
+        self.n_cells = len(grouped)
+        self.cell_codes = {col: grouped[col].to_numpy(dtype = np.int32) for col in codes}
+        self.cell_counts = grouped['n'].to_numpy(dtype = np.int64)
+        self.cell_range_values = range_uniques[self.cell_codes[RANGE_COLUMN]]
+
+        # position of each count label among the matrix rows, -1 for other labels
+        self.count_positions = np.append(pd.Categorical(self.uniques['count'], categories = COUNT_LABELS).codes, -1).astype(np.int64)
+
+        # cell offsets of each pitcher code
+        pitcher_codes = self.cell_codes['pitcher_name']
+        self.pitcher_offsets = np.searchsorted(pitcher_codes, np.arange(len(self.uniques['pitcher_name']) + 2))
+
+    '''
+    Define a function to sum the matching cells by count and next count, the last
+    column holding the pitches ending an at bat
+    '''
+    def flows(self, filters, value_range = None):
+
+        cells = self.cells(filters, value_range)
+
+        rows = self.count_positions[self.cell_codes['count'][cells]]
+        keep = rows >= 0
+        flat = rows[keep] * (N_COUNTS + 1) + self.cell_codes['lead_count'][cells][keep]
+
+        flows = np.bincount(flat, weights = self.cell_counts[cells][keep], minlength = N_COUNTS * (N_COUNTS + 1))
+
+        return flows.reshape(N_COUNTS, N_COUNTS + 1).astype(np.int64)
+
+    '''
+    Define a function returning the 12x12 matrix of pitches going from each count to
+    each next count in the at bat for the matching cells
+    '''
+    def transitions(self, filters, value_range = None):
+        return self.flows(filters, value_range)[:, :N_COUNTS]
+
+    '''
+    Define a function returning the at bat outcomes of the pitches ending an at bat by
+    count for the matching cells. At bats ending without an event are left out.
+    '''
+    def outcomes(self, filters, value_range = None):
+
+        cells = self.cells(filters, value_range)
+
+        rows = self.count_positions[self.cell_codes['count'][cells]]
+        n_outcomes = len(self.uniques['outcome'])
+        outcome_codes = self.cell_codes['outcome'][cells]
+        keep = (rows >= 0) & (self.cell_codes['lead_count'][cells] == N_COUNTS) & (outcome_codes < n_outcomes)
+
+        outcomes = np.bincount(rows[keep] * n_outcomes + outcome_codes[keep], weights = self.cell_counts[cells][keep],
+                               minlength = N_COUNTS * n_outcomes).reshape(N_COUNTS, n_outcomes)
+
+        return pd.DataFrame(outcomes.astype(np.int64), index = pd.Index(COUNT_LABELS, name = 'count'),
+                            columns = self.uniques['outcome'])
+
+
+##### Define Functions -----
+
+'''
+Define a function to count the pitches of prepped pitch data by season, pitcher, filter
+dimensions, next count and the outcome of the pitches ending an at bat
+'''
+def count_flow_cells(df):
+
+    keys = df[FLOW_KEY_COLUMNS + ['lead_count']].assign(outcome = df['events'].where(df['lead_count'].isna()))
+
+    # group on integer codes, so missing labels form their own cells
+    codes = dict()
+    uniques = dict()
+    for col in keys.columns:
+        codes[col], uniques[col] = pd.factorize(keys[col])
+
+    cells = pd.DataFrame(codes).groupby(list(codes), sort = False).size().reset_index(name = 'n')
+
+    # convert the codes back to labels, missing codes give missing values
+    for col in keys.columns:
+        cells[col] = pd.Series(uniques[col]).reindex(cells[col]).to_numpy()
+
+    return cells
+
+
+'''
+Define a function to get the directory of the stored transitions of pitch data
+'''
+def count_flow_path(pitch_path):
+    return os.path.join(pitch_path, FLOW_DIR_NAME)
+
+
+'''
+Define a function to store the transitions of the stored pitch data, partitioned by
+season and pitcher as the pitch data. Only the given seasons and pitchers are read and
+their partitions replaced, so adding a day of data only rebuilds the pitchers who pitched.
+Without pitchers the seasons are rebuilt aside and swapped in, so the transitions of
+pitchers no longer stored are removed. Pitchers are read a group at a time to bound the
+memory of the pitches read.
+'''
+def write_count_flow(pitch_path, seasons = None, pitchers = None, group_size = FLOW_PITCHER_GROUP):
+
+    dataset = open_pitch_dataset(pitch_path)
+    flow_path = count_flow_path(pitch_path)
+
+    # a full rebuild of the seasons is written next to the stored transitions
+    rebuild = pitchers is None
+    if rebuild:
+        pitchers = dataset.to_table(columns = ['pitcher'], filter = partition_filter(seasons, None))['pitcher'].unique().to_pylist()
+    out_path = summary_write_path(flow_path, rebuild)
+
+    # every write uses the column types of the stored pitch data
+    fields = []
+    for col in FLOW_KEY_COLUMNS + ['lead_count', 'outcome']:
+        field_type = dataset.schema.field('events' if col == 'outcome' else col).type
+        fields.append(pa.field(col, field_type.value_type if pa.types.is_dictionary(field_type) else field_type))
+    schema = pa.schema(fields + [pa.field('n', pa.int64())])
+
+    for start in range(0, len(pitchers), group_size):
+        df = read_pitch_data(pitch_path, columns = FLOW_COLUMNS, seasons = seasons, pitchers = list(pitchers[start:start + group_size]))
+
+        write_summary_partitions(pa.Table.from_pandas(count_flow_cells(df), schema = schema, preserve_index = False), out_path)
+
+    # swap in the rebuilt transitions, of every season or of the rebuilt seasons only
+    if rebuild:
+        replace_summary(out_path, flow_path, seasons)
+
+
+'''
+Define a function to read the stored transitions of the requested seasons and pitchers,
+or None if the pitch data has no stored transitions
+'''
+def read_count_flow(pitch_path, seasons = None, pitchers = None):
+
+    dataset = open_summary_dataset(count_flow_path(pitch_path))
+    if dataset is None:
+        return None
+
+    return dataset.to_table(filter = partition_filter(seasons, pitchers)).to_pandas()
+
+
+'''
+Define a function to convert pitch counts by count and next count into a 12x12
+transition matrix
+'''
+def transition_matrix(counts):
+
+    rows = pd.Categorical(counts.index.get_level_values(0), categories = COUNT_LABELS).codes.astype(np.int64)
+    cols = pd.Categorical(counts.index.get_level_values(1), categories = COUNT_LABELS).codes.astype(np.int64)
+    keep = (rows >= 0) & (cols >= 0)
+
+    matrix = np.bincount(rows[keep] * N_COUNTS + cols[keep], weights = counts.to_numpy()[keep], minlength = N_COUNTS**2)
+
+    return matrix.reshape(N_COUNTS, N_COUNTS).astype(np.int64)
+
+
+'''
+Define a function to build the transition cube for a data frame and register it,
+from the stored transitions when given and from the next count of the pitches otherwise
+'''
+def build_count_flow(data, cells = None):
+
+    cube = CountFlowCube(count_flow_cells(data) if cells is None else cells)
+    _COUNT_FLOWS[id(data)] = (weakref.ref(data), cube)
+
+    return cube
+
+
+'''
+Define a function to return the registered transition cube of a data frame,
+building it on first use
+'''
+def get_count_flow(data):
+
+    entry = _COUNT_FLOWS.get(id(data))
+
+    # rebuild if the id was reused by another frame
+    if entry is None or entry[0]() is not data:
+        return build_count_flow(data)
+
+    return entry[1]
@@ -0,0 +1,237 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+
+
+##### Global Options -----
+
+# plotted pitch location window, catcher's view of plate_x and the normalized height
+LOCATION_X_LIMITS = (-1.66, 1.66)
+LOCATION_Z_LIMITS = (1, 4)
+
+# grid cells per foot, and the margin binned around the window so densities near the edges are complete
+GRID_CELLS_PER_FOOT = 40
+GRID_MARGIN = 1.5
+
+# kernels are cut off at this many bandwidths
+KERNEL_CUTOFF = 4
+
+
+##### Define Classes -----
+
+'''
+Define a class holding a fixed grid over a plotting window and the kernel density
+of every category on it.
+
+Pitches are binned onto the grid once per category, and the Gaussian kernel of each
+category is applied by FFT convolution for all categories in one batch. Bandwidths
+follow the normal reference rule statsmodels uses for plotnine's stat_density_2d.
+'''
+class DensityGrid:
+
+    def __init__(self, x_limits = LOCATION_X_LIMITS, y_limits = LOCATION_Z_LIMITS,
+                 cells_per_unit = GRID_CELLS_PER_FOOT, margin = GRID_MARGIN):
+
+        self.step = 1 / cells_per_unit
+        self.x_edges = np.arange(x_limits[0] - margin, x_limits[1] + margin + self.step, self.step)
+        self.y_edges = np.arange(y_limits[0] - margin, y_limits[1] + margin + self.step, self.step)
+
+        # cell centers, the coordinates of the density values
+        self.x = (self.x_edges[:-1] + self.x_edges[1:]) / 2
+        self.y = (self.y_edges[:-1] + self.y_edges[1:]) / 2
+        self.shape = (len(self.x), len(self.y))
+
+    '''
+    Define a function to count the points of each category in each grid cell.
+    Codes are the category of each point, from 0 to n_categories - 1.
+    '''
+    def bin(self, x, y, codes, n_categories):
+
+        ix = np.floor((x - self.x_edges[0]) / self.step).astype(np.int64)
+        iy = np.floor((y - self.y_edges[0]) / self.step).astype(np.int64)
+
+        # points outside the grid are left out
+        valid = (ix >= 0) & (ix < self.shape[0]) & (iy >= 0) & (iy < self.shape[1])
+
+        cells = (codes[valid] * self.shape[0] + ix[valid]) * self.shape[1] + iy[valid]
+        counts = np.bincount(cells, minlength = n_categories * self.shape[0] * self.shape[1])
+
+        return counts.reshape((n_categories,) + self.shape).astype(float)
+
+    '''
+    Define a function returning the kernel density of each category on the grid,
+    an array of shape (n_categories, len(x), len(y))
+    '''
+    def density(self, x, y, codes, n_categories):
+
+        x = np.asarray(x, dtype = float)
+        y = np.asarray(y, dtype = float)
+        codes = np.asarray(codes, dtype = np.int64)
+
+        # drop points missing a coordinate or outside the categories
+        keep = ~(np.isnan(x) | np.isnan(y)) & (codes >= 0)
+        x, y, codes = x[keep], y[keep], codes[keep]
+
+        counts = self.bin(x, y, codes, n_categories)
+        bw_x, bw_y, n = normal_reference_bandwidths(x, y, codes, n_categories)
+
+        # narrow kernels are kept at least a cell wide
+        bw_x = np.maximum(bw_x, self.step)
+        bw_y = np.maximum(bw_y, self.step)
+
+        # one kernel size for the batch, wide enough for the widest bandwidth
+        half_x = min(int(np.ceil(KERNEL_CUTOFF * bw_x.max() / self.step)), self.shape[0])
+        half_y = min(int(np.ceil(KERNEL_CUTOFF * bw_y.max() / self.step)), self.shape[1])
+
+        kernels = gaussian_kernels(bw_x, bw_y, self.step, half_x, half_y)
+        smoothed = fft_convolve(counts, kernels)
+
+        # crop the full convolution back to the grid and scale to a density
+        smoothed = smoothed[:, half_x:half_x + self.shape[0], half_y:half_y + self.shape[1]]
+        density = smoothed / (np.maximum(n, 1)[:, None, None] * self.step**2)
+
+        return np.clip(density, 0, None)
+
+
+##### Define Functions -----
+
+'''
+Define a function returning the normal reference bandwidths and number of points of
+each category: 1.06 * standard deviation * n^(-1/6) for two dimensional data
+'''
+def normal_reference_bandwidths(x, y, codes, n_categories):
+
+    n = np.bincount(codes, minlength = n_categories).astype(float)
+    safe_n = np.maximum(n, 1)
+
+    bandwidths = []
+    for values in [x, y]:
+        mean = np.bincount(codes, weights = values, minlength = n_categories) / safe_n
+        variance = np.bincount(codes, weights = values**2, minlength = n_categories) / safe_n - mean**2
+        bandwidths.append(1.06 * np.sqrt(np.clip(variance, 0, None)) * safe_n ** (-1 / 6))
+
+    return bandwidths[0], bandwidths[1], n
+
+
+'''
+Define a function building a batch of normalized separable Gaussian kernels sampled
+on the grid step
+'''
+def gaussian_kernels(bw_x, bw_y, step, half_x, half_y):
+
+    offsets_x = np.arange(-half_x, half_x + 1) * step
+    offsets_y = np.arange(-half_y, half_y + 1) * step
+
+    kernel_x = np.exp(-0.5 * (offsets_x[None, :] / bw_x[:, None])**2)
+    kernel_y = np.exp(-0.5 * (offsets_y[None, :] / bw_y[:, None])**2)
+
+    # each kernel sums to one so counts keep their total
+    kernel_x /= kernel_x.sum(axis = 1, keepdims = True)
+    kernel_y /= kernel_y.sum(axis = 1, keepdims = True)
+
+    return kernel_x[:, :, None] * kernel_y[:, None, :]
+
+
+'''
+Define a function to convolve each grid of a batch with its kernel by FFT.
+Returns the full linear convolution.
+'''
+def fft_convolve(grids, kernels):
+
+    shape = tuple(g + k - 1 for g, k in zip(grids.shape[1:], kernels.shape[1:]))
+
+    # pad to a fast transform length
+    fft_shape = tuple(fast_fft_length(s) for s in shape)
+
+    product = np.fft.rfft2(grids, s = fft_shape) * np.fft.rfft2(kernels, s = fft_shape)
+    full = np.fft.irfft2(product, s = fft_shape)
+
+    return full[:, :shape[0], :shape[1]]
+
+
+'''
+Define a function returning the smallest length of the form 2^a * 3^b * 5^c at least n
+'''
+def fast_fft_length(n):
+
+    length = n
+    while True:
+        m = length
+        for factor in [2, 3, 5]:
+            while m % factor == 0:
+                m //= factor
+        if m == 1:
+            return length
+        length += 1
+
+
+'''
+Define a function to compute the pitch location density of every category of a
+breakdown, returning the grid and a dict of density arrays by category. Categories
+with fewer than min_pitches pitches are left out.
+'''
+def location_densities(df, breakdown_var, min_pitches = 50, grid = None):
+
+    grid = DensityGrid() if grid is None else grid
+
+    # categories with enough pitches, in the order of their counts
+    breakdown_counts = df[breakdown_var].value_counts()
+    categories = breakdown_counts[breakdown_counts >= min_pitches].index.tolist()
+
+    if not categories:
+        return grid, dict()
+
+    codes = pd.Categorical(df[breakdown_var], categories = categories).codes
+
+    # the plots show the catcher's view, so plate_x is flipped
+    density = grid.density(-df['plate_x'].to_numpy(dtype = float), df['plate_z_norm'].to_numpy(dtype = float),
+                           codes, len(categories))
+
+    return grid, {category: density[j] for j, category in enumerate(categories)}
+
+
+'''
+Define a function to bin the points of a scatter plot onto a grid of square cells by
+category, so a large scatter plot can be drawn as density tiles. Returns the occupied
+cells with their number of points and share of the fullest cell of their category,
+and the centroid of every category over all of its points.
+'''
+def binned_scatter(x, y, labels, x_limits, y_limits, cell_size):
+
+    x = np.asarray(x, dtype = float)
+    y = np.asarray(y, dtype = float)
+    labels = pd.Series(labels)
+    labels = labels if isinstance(labels.dtype, pd.CategoricalDtype) else labels.astype('category')
+
+    # drop points missing a coordinate or a label
+    codes = labels.cat.codes.to_numpy().astype(np.int64)
+    keep = ~(np.isnan(x) | np.isnan(y)) & (codes >= 0)
+    x, y, codes = x[keep], y[keep], codes[keep]
+    n_categories = len(labels.cat.categories)
+
+    grid = DensityGrid(x_limits, y_limits, cells_per_unit = 1 / cell_size, margin = 0)
+    counts = grid.bin(x, y, codes, n_categories)
+
+    # occupied cells, shaded relative to the fullest cell of their category
+    k, ix, iy = np.nonzero(counts)
+    n = counts[k, ix, iy]
+    fullest = counts.reshape(n_categories, -1).max(axis = 1)
+
+    cells = pd.DataFrame({'x': grid.x[ix],
+                          'y': grid.y[iy],
+                          labels.name: pd.Categorical.from_codes(k, dtype = labels.dtype),
+                          'n': n,
+                          'share': n / fullest[k]})
+
+    # centroids over all points, including those outside the grid
+    totals = np.bincount(codes, minlength = n_categories)
+    present = np.flatnonzero(totals)
+
+    centroids = pd.DataFrame({'x': np.bincount(codes, weights = x, minlength = n_categories)[present] / totals[present],
+                              'y': np.bincount(codes, weights = y, minlength = n_categories)[present] / totals[present],
+                              labels.name: pd.Categorical.from_codes(present, dtype = labels.dtype),
+                              'n': totals[present]})
+
+    return cells, centroids
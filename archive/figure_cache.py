@@ -0,0 +1,180 @@
+##### Import Libraries -----
+
+# data manipulation
+import base64
+import io
+
+# notebook output
+from IPython.display import publish_display_data
+from IPython.utils.capture import capture_output
+
+# caching
+import functools
+import inspect
+import sys
+import weakref
+
+# size-bounded cache and filter argument keys
+from filter_cache import LRUCache, filter_cache_key
+
+# call timings
+from instrumentation import mark, row_count, span
+
+
+##### Global Options -----
+
+# default memory budget of the rendered figure cache (bytes)
+FIGURE_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+
+##### Define Functions -----
+
+'''
+Define a function to get the numbers of the open matplotlib figures. Pyplot is imported
+by the panels drawing with it, until then no figure is open.
+'''
+def figure_numbers():
+
+    pyplot = sys.modules.get('matplotlib.pyplot')
+
+    return [] if pyplot is None else pyplot.get_fignums()
+
+
+'''
+Define a function to render a matplotlib figure to a png display bundle
+'''
+def figure_bundle(fig):
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format = 'png', bbox_inches = 'tight')
+
+    return ({'image/png': base64.b64encode(buffer.getvalue()).decode('ascii'), 'text/plain': repr(fig)}, {})
+
+
+'''
+Define a function to run a panel and record everything it outputs: printed text,
+displayed objects such as tables, markdown and plotly images, and the matplotlib
+figures it leaves open, rendered to png. Returns the panel's result and its outputs.
+'''
+def render_panel(func, *args, **kwargs):
+
+    open_figures = set(figure_numbers())
+
+    with capture_output(display = True) as captured:
+        result = func(*args, **kwargs)
+
+    outputs = []
+    if captured.stdout:
+        outputs.append(('stdout', captured.stdout))
+    for output in captured.outputs:
+        outputs.append(('display', (output.data, output.metadata)))
+
+    # figures drawn but not shown yet are rendered and closed, as the inline backend would
+    mark('draw')
+    for number in figure_numbers():
+        if number not in open_figures:
+            plt = sys.modules['matplotlib.pyplot']
+            fig = plt.figure(number)
+            outputs.append(('display', figure_bundle(fig)))
+            plt.close(fig)
+
+    return result, outputs
+
+
+'''
+Define a function to replay the recorded outputs of a panel
+'''
+def replay_outputs(outputs):
+
+    for kind, value in outputs:
+        if kind == 'stdout':
+            sys.stdout.write(value)
+        else:
+            publish_display_data(value[0], metadata = value[1])
+
+
+'''
+Define a decorator caching the rendered output of a dashboard panel. The key is the
+panel and its normalized filter arguments, so a filter state seen before is replayed
+before any filtering or plotting runs.
+'''
+def cached_figure(func = None, cache = None):
+
+    if func is None:
+        return functools.partial(cached_figure, cache = cache)
+
+    signature = inspect.signature(func)
+    data_name = next(iter(signature.parameters))
+
+    '''
+    Define a function returning the cache, key and data frame of a call
+    '''
+    def locate(data, *args, **kwargs):
+
+        store = figure_cache if cache is None else cache
+
+        # bind positional and keyword calls to the same arguments
+        arguments = signature.bind(data, *args, **kwargs).arguments
+        arguments = {k: v for k, v in arguments.items() if k != data_name}
+
+        return store, filter_cache_key(func.__name__, data, arguments), data
+
+    @functools.wraps(func)
+    def wrapper(data, *args, **kwargs):
+
+        # a drawn panel is broken down into filter, aggregate, build, draw and display phases
+        with span(func.__name__, 'panel', phase = 'filter', rows_in = row_count(data)) as call:
+
+            store, key, data = locate(data, *args, **kwargs)
+
+            # the frame id is only valid while the same frame is alive
+            entry = store.get(key, valid = lambda entry: entry[0]() is data)
+            if entry is None:
+                call.note(cache = 'miss')
+                result, outputs = render_panel(func, data, *args, **kwargs)
+                entry = store.put(key, (weakref.ref(data), outputs, result))
+            else:
+                call.note(cache = 'hit')
+
+            mark('display')
+            replay_outputs(entry[1])
+
+        return entry[2]
+
+    wrapper.locate = locate
+
+    return wrapper
+
+
+'''
+Define a function returning the cached outputs of a panel call, or None if the call
+was not drawn before or the panel is not cached
+'''
+def cached_outputs(panel, **kwargs):
+
+    if not hasattr(panel, 'locate'):
+        return None
+
+    store, key, data = panel.locate(**kwargs)
+    entry = store.get(key, valid = lambda entry: entry[0]() is data)
+
+    if entry is None:
+        return None
+
+    return entry[1]
+
+
+'''
+Define a function to cache the outputs of a panel call drawn elsewhere, such as in a worker process
+'''
+def store_outputs(panel, outputs, result = None, **kwargs):
+
+    if not hasattr(panel, 'locate'):
+        return
+
+    store, key, data = panel.locate(**kwargs)
+    store.put(key, (weakref.ref(data), outputs, result))
+
+
+# shared cache of rendered dashboard panels
+figure_cache = LRUCache(FIGURE_CACHE_MAX_BYTES)
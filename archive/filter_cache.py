@@ -0,0 +1,219 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+
+# caching
+import functools
+import inspect
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+
+# call timings
+from instrumentation import row_count, span
+
+
+##### Global Options -----
+
+# default memory budget of the shared filter cache (bytes)
+FILTER_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+##### Define Classes -----
+
+'''
+Define a least recently used cache bounded by the total size of its values in bytes
+'''
+class LRUCache:
+
+    def __init__(self, max_bytes):
+
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    '''
+    Define a function to return a cached value and mark it as recently used. A value
+    failing the valid check, such as one cached for a frame no longer alive, is dropped
+    and counted as a miss.
+    '''
+    def get(self, key, default = None, valid = None):
+
+        with self._lock:
+            if key in self._entries and valid is not None and not valid(self._entries[key][0]):
+                self.nbytes -= self._entries.pop(key)[1]
+
+            if key not in self._entries:
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    '''
+    Define a function to store a value and evict the least recently used values over budget
+    '''
+    def put(self, key, value, nbytes = None):
+
+        if nbytes is None:
+            nbytes = object_nbytes(value)
+
+        with self._lock:
+
+            # the previous value of the key is dropped even if the new one is not kept
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+
+            # values larger than the whole budget are not kept
+            if nbytes > self.max_bytes:
+                return value
+
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted_nbytes) = self._entries.popitem(last = False)
+                self.nbytes -= evicted_nbytes
+                self.evictions += 1
+
+        return value
+
+    '''
+    Define a function to drop every cached value
+    '''
+    def clear(self):
+
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    '''
+    Define a function to summarise the cache usage
+    '''
+    def stats(self):
+
+        lookups = self.hits + self.misses
+
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'nbytes': self.nbytes,
+                'max_bytes': self.max_bytes}
+
+
+##### Define Functions -----
+
+'''
+Define a function to estimate the memory held by a cached value.
+Filtered frames share their string objects with the source frame,
+so the shallow size is what the cache adds.
+'''
+def object_nbytes(value):
+
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(index = True, deep = False)))
+
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+
+    # containers of frames or arrays, such as grids by category
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(object_nbytes(v) for v in value.values())
+
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(object_nbytes(v) for v in value)
+
+    return sys.getsizeof(value)
+
+
+'''
+Define a function to normalize a filter argument into a hashable form.
+Collections are sorted so the same selection in any order shares a key.
+'''
+def normalize_filter_arg(value):
+
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+
+    if isinstance(value, (list, tuple, set, frozenset, pd.Index, pd.Series)):
+        items = set(normalize_filter_arg(v) for v in value)
+        return ('collection',) + tuple(sorted(items, key = lambda v: (type(v).__name__, repr(v))))
+
+    if isinstance(value, np.generic):
+        value = value.item()
+
+    # missing values do not compare equal, give them a single key
+    if isinstance(value, float) and np.isnan(value):
+        return ('nan',)
+
+    return value
+
+
+'''
+Define a function to build the cache key of a call on a data frame
+'''
+def filter_cache_key(name, data, arguments):
+
+    return (name,
+            id(data),
+            tuple(sorted((k, normalize_filter_arg(v)) for k, v in arguments.items())))
+
+
+'''
+Define a decorator caching the result of a filter function in a shared cache.
+The first argument is the data frame, the rest are the dashboard filters.
+Arguments listed in ignore do not change the result and are left out of the key.
+'''
+def cached_filter(func = None, cache = None, ignore = ()):
+
+    if func is None:
+        return functools.partial(cached_filter, cache = cache, ignore = ignore)
+
+    signature = inspect.signature(func)
+    data_name = next(iter(signature.parameters))
+
+    @functools.wraps(func)
+    def wrapper(data, *args, **kwargs):
+
+        store = filter_cache if cache is None else cache
+
+        # bind positional and keyword calls to the same arguments
+        arguments = signature.bind(data, *args, **kwargs).arguments
+        arguments = {k: v for k, v in arguments.items() if k != data_name and k not in ignore}
+        key = filter_cache_key(func.__name__, data, arguments)
+
+        with span(func.__name__, 'filter', rows_in = row_count(data)) as call:
+
+            # the frame id is only valid while the same frame is alive
+            entry = store.get(key, valid = lambda entry: entry[0]() is data)
+            if entry is not None:
+                call.note(cache = 'hit', rows_out = row_count(entry[1]))
+                return entry[1]
+
+            result = func(data, *args, **kwargs)
+            store.put(key, (weakref.ref(data), result), object_nbytes(result))
+            call.note(cache = 'miss', rows_out = row_count(result))
+
+        return result
+
+    return wrapper
+
+
+# shared cache of filtered views used by every dashboard panel
+filter_cache = LRUCache(FILTER_CACHE_MAX_BYTES)
@@ -0,0 +1,231 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+
+# object registry
+import weakref
+
+
+##### Global Options -----
+
+# dashboard filter dimensions answered by the inverted index
+FILTER_COLUMNS = ['pitcher_name',
+                  'pitch_name',
+                  'stand',
+                  'batter_name',
+                  'count',
+                  'count_advantage',
+                  'outs_when_up',
+                  'inning',
+                  'runners_on_base']
+
+# dashboard filter dimension answered by the sorted range index
+RANGE_COLUMN = 'run_differential'
+
+# registry of built indexes keyed by the id of the data frame they index
+_FILTER_INDEXES = {}
+
+
+##### Define Classes -----
+
+'''
+Define a class holding an inverted index over the dashboard filter dimensions.
+
+Each filter column is factorized once into integer codes and the row positions
+are grouped by code, so every value maps to a sorted list of row ids. The run
+differential is kept as a sorted index so a range maps to a slice. Queries
+start from the most selective dimension and check the remaining dimensions
+against the codes of the surviving rows only.
+'''
+class StatcastFilterIndex:
+
+    def __init__(self, data):
+
+        self.n_rows = len(data)
+        self.uniques = dict()
+        self.codes = dict()
+        self.row_ids = dict()
+        self.offsets = dict()
+        self.value_counts = dict()
+
+        for col in FILTER_COLUMNS:
+
+            # factorize the column, missing values get the last code
+            codes, uniques = pd.factorize(data[col])
+            codes = codes.astype(np.int32)
+            codes[codes < 0] = len(uniques)
+
+            # group the row positions by code
+            counts = np.bincount(codes, minlength = len(uniques) + 1)
+
+            self.uniques[col] = pd.Index(uniques)
+            self.codes[col] = codes
+            self.row_ids[col] = np.argsort(codes, kind = 'stable').astype(np.int32)
+            self.offsets[col] = np.concatenate([[0], np.cumsum(counts)])
+            self.value_counts[col] = counts
+
+        # sort the row positions by run differential, missing values sort last
+        range_values = data[RANGE_COLUMN].to_numpy(dtype = float)
+        self.range_values = range_values
+        self.range_row_ids = np.argsort(range_values, kind = 'stable').astype(np.int32)
+        self.range_sorted = range_values[self.range_row_ids]
+
+    '''
+    Define a function returning a boolean lookup over the codes of a column
+    '''
+    def allowed_codes(self, col, values, equals = False):
+
+        uniques = self.uniques[col]
+
+        # the trailing slot is the missing value code
+        allowed = np.zeros(len(uniques) + 1, dtype = bool)
+
+        if equals:
+            allowed[:-1] = np.asarray(uniques == values, dtype = bool)
+        else:
+            values = list(values)
+            allowed[:-1] = uniques.isin(values)
+            allowed[-1] = bool(len(values)) and bool(pd.isna(pd.Series(values, dtype = object)).any())
+
+        return allowed
+
+    '''
+    Define a function returning the sorted row positions matching the filters.
+    Filters map a column to a lookup from allowed_codes, the range is (low, high).
+    '''
+    def positions(self, filters, value_range = None):
+
+        # estimate the number of rows each filter keeps
+        estimates = {col: self.value_counts[col][allowed].sum() for col, allowed in filters.items()}
+
+        if value_range is not None:
+            start = np.searchsorted(self.range_sorted, value_range[0], side = 'left')
+            stop = np.searchsorted(self.range_sorted, value_range[1], side = 'right')
+            estimates[RANGE_COLUMN] = max(stop - start, 0)
+
+        # nothing to filter on returns every row
+        if not estimates:
+            return np.arange(self.n_rows)
+
+        # start from the most selective dimension
+        driver = min(estimates, key = estimates.get)
+
+        if driver == RANGE_COLUMN:
+            rows = np.sort(self.range_row_ids[start:max(stop, start)])
+        else:
+            row_ids = self.row_ids[driver]
+            offsets = self.offsets[driver]
+            rows = np.sort(np.concatenate([row_ids[offsets[code]:offsets[code + 1]]
+                                           for code in np.flatnonzero(filters[driver])] +
+                                          [np.empty(0, dtype = np.int32)]))
+
+        # check the remaining dimensions on the surviving rows
+        for col, allowed in filters.items():
+            if col == driver or len(rows) == 0:
+                continue
+            rows = rows[allowed[self.codes[col][rows]]]
+
+        if value_range is not None and driver != RANGE_COLUMN and len(rows):
+            values = self.range_values[rows]
+            rows = rows[(values >= value_range[0]) & (values <= value_range[1])]
+
+        return rows
+
+
+##### Define Functions -----
+
+'''
+Define a function to build the filter index for a data frame and register it
+'''
+def build_filter_index(data):
+
+    index = StatcastFilterIndex(data)
+    _FILTER_INDEXES[id(data)] = (weakref.ref(data), index)
+
+    return index
+
+
+'''
+Define a function to return the registered filter index of a data frame,
+building it on first use
+'''
+def get_filter_index(data):
+
+    entry = _FILTER_INDEXES.get(id(data))
+
+    # rebuild if the id was reused by another frame or the frame changed length
+    if entry is None or entry[0]() is not data or entry[1].n_rows != len(data):
+        return build_filter_index(data)
+
+    return entry[1]
+
+
+'''
+Define a function to build the code lookups of the active dashboard filters
+'''
+def filter_lookups(index,
+                   pitcher_name_filter,
+                   pitch_name_filter,
+                   stand_filter,
+                   batter_name_filter,
+                   count_filter,
+                   count_advantage_filter,
+                   outs_when_up_filter,
+                   inning_filter,
+                   runners_on_base_filter,
+                   filter_pitcher = True):
+
+    filters = dict()
+
+    if filter_pitcher:
+        filters['pitcher_name'] = index.allowed_codes('pitcher_name', pitcher_name_filter, equals = True)
+
+    filters['pitch_name'] = index.allowed_codes('pitch_name', pitch_name_filter)
+    filters['stand'] = index.allowed_codes('stand', stand_filter)
+
+    if batter_name_filter != 'All':
+        filters['batter_name'] = index.allowed_codes('batter_name', batter_name_filter, equals = True)
+
+    filters['count'] = index.allowed_codes('count', count_filter)
+    filters['count_advantage'] = index.allowed_codes('count_advantage', count_advantage_filter)
+    filters['outs_when_up'] = index.allowed_codes('outs_when_up', outs_when_up_filter)
+    filters['inning'] = index.allowed_codes('inning', inning_filter)
+    filters['runners_on_base'] = index.allowed_codes('runners_on_base', runners_on_base_filter)
+
+    return filters
+
+
+'''
+Define a function to get the row positions matching the dashboard filters
+'''
+def filter_positions(data,
+                     pitcher_name_filter,
+                     pitch_name_filter,
+                     stand_filter,
+                     batter_name_filter,
+                     count_filter,
+                     count_advantage_filter,
+                     outs_when_up_filter,
+                     inning_filter,
+                     runners_on_base_filter,
+                     run_differential_filter,
+                     filter_pitcher = True):
+
+    index = get_filter_index(data)
+
+    # build a code lookup for every active filter
+    filters = filter_lookups(index,
+                             pitcher_name_filter,
+                             pitch_name_filter,
+                             stand_filter,
+                             batter_name_filter,
+                             count_filter,
+                             count_advantage_filter,
+                             outs_when_up_filter,
+                             inning_filter,
+                             runners_on_base_filter,
+                             filter_pitcher = filter_pitcher)
+
+    return index.positions(filters, (run_differential_filter[0], run_differential_filter[1]))
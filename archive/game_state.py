@@ -0,0 +1,122 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+
+# count codes and their labels
+from pitch_features import COUNT_LOOKUP, count_codes, lookup_categorical
+
+
+##### Global Options -----
+
+# order of the pitches of a game
+GAME_ORDER = ['game_pk', 'at_bat_number', 'pitch_number']
+
+# columns the game state is reconstructed from
+GAME_STATE_COLUMNS = GAME_ORDER + ['inning', 'inning_topbot', 'outs_when_up', 'pitcher', 'batter', 'balls', 'strikes']
+
+
+##### Define Functions -----
+
+'''
+Define a function returning the positions that sort pitches by game, at bat and pitch number
+'''
+def game_order(df):
+    return np.lexsort([df[col].to_numpy() for col in reversed(GAME_ORDER)])
+
+
+'''
+Define a function to reconstruct the game state of every pitch in one pass over the
+pitches sorted by game, at bat and pitch number. Returns a data frame with the index of
+the pitches holding:
+
+    at_bat_start, at_bat_end: first and last pitch of each at bat
+    starter: pitch thrown by a starting pitcher of the game, the pitcher of the first
+             pitch with 0 outs in the first inning of each half of the innings
+    tto: times the pitcher has faced the batter in the game, counting this at bat
+    lead_count: next count in the at bat, missing on the last pitch
+
+Each pitcher's stint in an at bat counts as its own at bat, so a reliever coming in
+during an at bat faces the batter from that at bat on.
+'''
+def game_state(df):
+
+    n = len(df)
+    order = game_order(df)
+
+    game = df['game_pk'].to_numpy()[order]
+    at_bat = df['at_bat_number'].to_numpy()[order]
+    pitcher = df['pitcher'].to_numpy()[order]
+
+    # at bat boundaries where the game or at bat number changes
+    at_bat_start = np.ones(n, dtype = bool)
+    at_bat_start[1:] = (game[1:] != game[:-1]) | (at_bat[1:] != at_bat[:-1])
+    at_bat_end = np.ones(n, dtype = bool)
+    at_bat_end[:-1] = at_bat_start[1:]
+
+    # next count from the count code of the next pitch of the at bat
+    codes = count_codes(df['balls'].to_numpy()[order], df['strikes'].to_numpy()[order])
+    next_codes = np.full(n, -1, dtype = np.int64)
+    next_codes[:-1] = codes[1:]
+    next_codes[at_bat_end] = -1
+
+    # number the games in order and their halves of the innings, missing halves get the last code
+    new_game = np.ones(n, dtype = bool)
+    new_game[1:] = game[1:] != game[:-1]
+    game_codes = np.cumsum(new_game) - 1
+    topbot_codes, topbot = pd.factorize(df['inning_topbot'].to_numpy()[order])
+    n_halves = int(new_game.sum()) * len(topbot)
+    half = np.where(topbot_codes >= 0, game_codes * len(topbot) + topbot_codes, n_halves)
+
+    # the starter of each half pitches the first pitch with 0 outs in the first inning
+    first_inning = (df['inning'].to_numpy()[order] == 1) & (df['outs_when_up'].to_numpy()[order] == 0) & (half < n_halves)
+    candidates = np.flatnonzero(first_inning)
+    halves, first = np.unique(half[candidates], return_index = True)
+
+    has_starter = np.zeros(n_halves + 1, dtype = bool)
+    half_starter = np.zeros(n_halves + 1, dtype = pitcher.dtype)
+    has_starter[halves] = True
+    half_starter[halves] = pitcher[candidates[first]]
+    starter = has_starter[half] & (half_starter[half] == pitcher)
+
+    # each pitcher's stint in an at bat, numbered in game order
+    stint_start = at_bat_start.copy()
+    stint_start[1:] |= pitcher[1:] != pitcher[:-1]
+    stint_ids = np.cumsum(stint_start) - 1
+    stints = np.flatnonzero(stint_start)
+
+    # count the stints of each game, pitcher and batter in game order
+    pitcher_codes, pitcher_uniques = pd.factorize(pitcher[stints])
+    batter_codes, batter_uniques = pd.factorize(df['batter'].to_numpy()[order][stints])
+    keys = (game_codes[stints].astype(np.int64) * len(pitcher_uniques) + pitcher_codes) * len(batter_uniques) + batter_codes
+    key_order = np.argsort(keys, kind = 'stable')
+    sorted_keys = keys[key_order]
+    key_start = np.ones(len(stints), dtype = bool)
+    key_start[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    positions = np.arange(len(stints))
+    stint_tto = np.empty(len(stints), dtype = np.int64)
+    stint_tto[key_order] = positions - np.maximum.accumulate(np.where(key_start, positions, 0)) + 1
+
+    # back to the order of the pitches
+    state = pd.DataFrame({'at_bat_start': at_bat_start,
+                          'at_bat_end': at_bat_end,
+                          'starter': starter,
+                          'tto': stint_tto[stint_ids],
+                          'lead_count': lookup_categorical(next_codes, COUNT_LOOKUP, 'lead_count')})
+    positions = np.empty(n, dtype = np.int64)
+    positions[order] = np.arange(n)
+
+    return state.iloc[positions].set_axis(df.index)
+
+
+'''
+Define a function returning the ids of the pitchers who started a game in the pitches.
+Only the pitches with 0 outs in the first inning can flag a starter, so the game state
+is only reconstructed for those.
+'''
+def starting_pitchers(df):
+
+    first_inning_df = df[(df['inning'] == 1) & (df['outs_when_up'] == 0)]
+
+    return first_inning_df['pitcher'][game_state(first_inning_df)['starter']].unique()
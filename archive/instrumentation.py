@@ -0,0 +1,346 @@
+##### Import Libraries -----
+
+# data manipulation
+import pandas as pd
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+
+##### Global Options -----
+
+# most recent calls kept
+MAX_EVENTS = 100000
+
+# recording state, off by default so instrumented calls cost one check
+enabled = False
+trace_memory = False
+
+# recorded calls and the open spans of each thread
+events = deque(maxlen = MAX_EVENTS)
+_local = threading.local()
+
+# calls recorded since the start, each call is numbered with the count before it so
+# a position in the record stays valid when the oldest calls are dropped
+recorded = 0
+_record_lock = threading.Lock()
+
+
+##### Define Classes -----
+
+'''
+Define a class doing nothing in place of a span while recording is off
+'''
+class NullSpan:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def note(self, **fields):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+'''
+Define a class recording one call: its duration, the time spent in each phase marked
+during the call, fields such as row counts and cache hits, and the change in traced
+memory when memory tracing is on
+'''
+class Span:
+
+    def __init__(self, name, category, phase, fields):
+
+        self.name = name
+        self.category = category
+        self.fields = fields
+        self.phases = [(phase, 0)] if phase is not None else []
+
+    def __enter__(self):
+
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+
+        self.memory = tracemalloc.get_traced_memory()[0] if trace_memory and tracemalloc.is_tracing() else None
+        self.start = time.perf_counter_ns()
+
+        return self
+
+    def __exit__(self, *exc):
+
+        end = time.perf_counter_ns()
+        _local.stack.pop()
+
+        fields = dict(self.fields)
+        if self.memory is not None and tracemalloc.is_tracing():
+            fields['memory_delta_mb'] = (tracemalloc.get_traced_memory()[0] - self.memory) / 1024**2
+
+        # each phase lasts until the next one was marked
+        if self.phases:
+            marks = self.phases + [(None, end - self.start)]
+            phases = dict()
+            for (phase, offset), (_, next_offset) in zip(marks[:-1], marks[1:]):
+                phases[phase] = phases.get(phase, 0) + (next_offset - offset) / 1e6
+            fields['phases_ms'] = phases
+
+        record_events([{'name': self.name,
+                        'category': self.category,
+                        'start_us': self.start / 1e3,
+                        'duration_ms': (end - self.start) / 1e6,
+                        'pid': os.getpid(),
+                        'tid': threading.get_ident(),
+                        'depth': len(_local.stack),
+                        'fields': fields}])
+
+        return False
+
+    '''
+    Define a function to add fields to the record of the call
+    '''
+    def note(self, **fields):
+        self.fields.update(fields)
+
+
+##### Define Functions -----
+
+'''
+Define a function to turn recording on, optionally tracing memory to record memory
+deltas, which slows every allocation down
+'''
+def enable(memory = False):
+
+    global enabled, trace_memory
+
+    enabled = True
+    trace_memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+'''
+Define a function to turn recording off
+'''
+def disable():
+
+    global enabled, trace_memory
+
+    enabled = False
+    if trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    trace_memory = False
+
+
+'''
+Define a function to drop the recorded calls. The count of recorded calls goes on, so
+positions taken before still only select later calls.
+'''
+def clear():
+    events.clear()
+
+
+'''
+Define a function to add calls to the record, numbering each one, such as the calls
+recorded in a worker process
+'''
+def record_events(new_events):
+
+    global recorded
+
+    with _record_lock:
+        for event in new_events:
+            events.append(dict(event, seq = recorded))
+            recorded += 1
+
+
+'''
+Define a function returning a span recording a call, or a span doing nothing while
+recording is off. Phase names the first phase of a call broken down with mark.
+'''
+def span(name, category, phase = None, **fields):
+
+    if not enabled:
+        return NULL_SPAN
+
+    return Span(name, category, phase, fields)
+
+
+'''
+Define a function to get the innermost open span of this thread
+'''
+def current_span():
+
+    if not enabled:
+        return NULL_SPAN
+
+    stack = getattr(_local, 'stack', None)
+
+    return stack[-1] if stack else NULL_SPAN
+
+
+'''
+Define a function to mark the start of the next phase of the innermost call broken
+down into phases
+'''
+def mark(phase):
+
+    if not enabled:
+        return
+
+    for open_span in reversed(getattr(_local, 'stack', [])):
+        if open_span.phases:
+            open_span.phases.append((phase, time.perf_counter_ns() - open_span.start))
+            return
+
+
+'''
+Define a function to add fields to the record of the innermost open call
+'''
+def note(**fields):
+
+    if enabled:
+        current_span().note(**fields)
+
+
+'''
+Define a decorator recording the calls of a function with the rows of its first
+argument and of its result
+'''
+def instrumented(category):
+
+    def decorator(func):
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+
+            if not enabled:
+                return func(*args, **kwargs)
+
+            with span(func.__name__, category, rows_in = row_count(args[0]) if args else None) as call:
+                result = func(*args, **kwargs)
+                call.note(rows_out = row_count(result))
+
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+'''
+Define a function to get the number of rows of a data frame or series, or None
+'''
+def row_count(value):
+    return len(value) if isinstance(value, (pd.DataFrame, pd.Series)) else None
+
+
+'''
+Define a function to summarise the recorded calls by function: calls, cache hits,
+total and mean milliseconds and the milliseconds spent in each phase. Since is a count
+of recorded calls, only the calls recorded after it are summarised.
+'''
+def summary(since = 0):
+
+    records = [event for event in list(events) if event['seq'] >= since]
+    if not records:
+        return pd.DataFrame()
+
+    rows = []
+    for event in records:
+        row = {'name': event['name'], 'category': event['category'], 'ms': event['duration_ms'],
+               'cache_hit': event['fields'].get('cache') == 'hit',
+               'rows_in': event['fields'].get('rows_in'), 'rows_out': event['fields'].get('rows_out'),
+               'memory_delta_mb': event['fields'].get('memory_delta_mb')}
+        for phase, ms in event['fields'].get('phases_ms', dict()).items():
+            row[phase + '_ms'] = ms
+        rows.append(row)
+
+    calls = pd.DataFrame(rows)
+    grouped = calls.groupby(['category', 'name'], sort = False)
+
+    table = grouped.agg(calls = ('ms', 'size'), cache_hits = ('cache_hit', 'sum'), total_ms = ('ms', 'sum'),
+                        mean_ms = ('ms', 'mean'), rows_in = ('rows_in', 'max'), rows_out = ('rows_out', 'max'),
+                        memory_delta_mb = ('memory_delta_mb', lambda mb: mb.sum(min_count = 1)))
+    phase_cols = [col for col in calls.columns if col.endswith('_ms') and col != 'ms']
+    if phase_cols:
+        table = table.join(grouped[phase_cols].sum(min_count = 1))
+
+    return table.sort_values('total_ms', ascending = False).reset_index()
+
+
+'''
+Define a function to write the recorded calls as json lines, one call per line
+'''
+def export_log(path):
+
+    with open(path, 'w') as f:
+        for event in list(events):
+            f.write(json.dumps(event) + '\n')
+
+
+'''
+Define a function to write the recorded calls in the chrome trace event format, for
+chrome://tracing or perfetto. Phases are written as nested events of their call.
+'''
+def export_chrome_trace(path):
+
+    trace = []
+    for event in list(events):
+        args = {k: v for k, v in event['fields'].items() if k != 'phases_ms'}
+        trace.append({'name': event['name'], 'cat': event['category'], 'ph': 'X', 'ts': event['start_us'],
+                      'dur': event['duration_ms'] * 1e3, 'pid': event['pid'], 'tid': event['tid'], 'args': args})
+
+        offset = event['start_us']
+        for phase, ms in event['fields'].get('phases_ms', dict()).items():
+            trace.append({'name': phase, 'cat': 'phase', 'ph': 'X', 'ts': offset, 'dur': ms * 1e3,
+                          'pid': event['pid'], 'tid': event['tid'], 'args': {'call': event['name']}})
+            offset += ms * 1e3
+
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+
+'''
+Define a function returning a timing panel for the notebook: a toggle turning the
+recording on and off, and a table of the calls recorded since the panel was opened or cleared
+'''
+def timing_panel():
+
+    import ipywidgets as widgets
+    from IPython.display import display
+
+    toggle = widgets.ToggleButton(value = enabled, description = 'Record timings')
+    memory = widgets.Checkbox(value = trace_memory, description = 'Trace memory')
+    refresh = widgets.Button(description = 'Refresh')
+    reset = widgets.Button(description = 'Clear')
+    out = widgets.Output()
+    state = {'since': recorded}
+
+    def on_toggle(change):
+        enable(memory.value) if change['new'] else disable()
+
+    def on_refresh(button):
+        out.clear_output(wait = True)
+        with out:
+            table = summary(state['since'])
+            display(table.round(2) if len(table) else "No calls recorded")
+
+    def on_reset(button):
+        clear()
+        state['since'] = recorded
+        on_refresh(button)
+
+    toggle.observe(on_toggle, names = 'value')
+    refresh.on_click(on_refresh)
+    reset.on_click(on_reset)
+
+    return widgets.VBox([widgets.HBox([toggle, memory, refresh, reset]), out])
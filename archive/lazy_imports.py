@@ -0,0 +1,130 @@
+##### Import Libraries -----
+
+# data manipulation
+import pandas as pd
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import time
+
+# call timings
+from instrumentation import span
+
+
+##### Global Options -----
+
+# dependencies of the dashboard measured in startup mode
+STARTUP_MODULES = ['numpy', 'pandas', 'pyarrow', 'IPython.display', 'ipywidgets', 'matplotlib.pyplot',
+                   'plotnine', 'plotly.graph_objects', 'pybaseball', 'plotting']
+
+# seconds spent importing each lazily loaded module
+IMPORT_SECONDS = dict()
+
+
+##### Define Classes -----
+
+'''
+Define a class standing in for a module that is imported on first attribute access
+'''
+class LazyModule:
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def __getattr__(self, attr):
+
+        module = self.__dict__['_module']
+        if module is None:
+            module = self.__dict__['_module'] = timed_import(self._name)
+
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return "<lazy module '{}'{}>".format(self._name, "" if self._module is None else " (loaded)")
+
+
+##### Define Functions -----
+
+'''
+Define a function to import a module, recording the seconds its first import took
+'''
+def timed_import(name):
+
+    if name in sys.modules:
+        return sys.modules[name]
+
+    with span(name, 'import'):
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        IMPORT_SECONDS[name] = time.perf_counter() - start
+
+    return module
+
+
+'''
+Define a function returning a module that is only imported when first used
+'''
+def lazy_import(name):
+    return LazyModule(name)
+
+
+'''
+Define a function to import the public names of a module into a namespace, as a star
+import would
+'''
+def import_names(name, namespace):
+
+    module = timed_import(name)
+    names = getattr(module, '__all__', [n for n in vars(module) if not n.startswith('_')])
+
+    namespace.update({n: getattr(module, n) for n in names})
+
+
+'''
+Define a function to measure the import cost of each dependency of the dashboard in a
+fresh interpreter. Returns the seconds to import each module on its own, and the
+seconds each top level package adds to the import of the target module.
+'''
+def measure_startup(modules = STARTUP_MODULES, target = 'plotting'):
+
+    code_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH = os.pathsep.join([code_dir, os.environ.get('PYTHONPATH', '')]))
+
+    # cold import of each module on its own
+    alone = []
+    for name in modules:
+        script = "import time; start = time.perf_counter(); import {}; print(time.perf_counter() - start)".format(name)
+        run = subprocess.run([sys.executable, '-c', script], capture_output = True, text = True, env = env)
+        alone.append({'module': name, 'seconds': float(run.stdout.split()[-1]) if run.returncode == 0 else None})
+
+    # self times of the import of the target, summed by top level package
+    run = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + target], capture_output = True, text = True, env = env)
+    packages = dict()
+    for line in run.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(self_us) / 1e6
+
+    by_package = pd.Series(packages, name = 'seconds').sort_values(ascending = False).rename_axis('package').reset_index()
+
+    return pd.DataFrame(alone), by_package
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description = "Measure the import cost of each dependency of the dashboard.")
+    parser.add_argument("--target", default = 'plotting', help = "module whose import is broken down by package")
+    parser.add_argument("--top", type = int, default = 15, help = "packages shown in the breakdown")
+    args = parser.parse_args()
+
+    alone, by_package = measure_startup(target = args.target)
+
+    print("cold import of each module on its own (s)")
+    print(alone.round(3).to_string(index = False))
+    print("\nimport of {} by package, {:.3f} s in total (s)".format(args.target, by_package['seconds'].sum()))
+    print(by_package.head(args.top).round(3).to_string(index = False))
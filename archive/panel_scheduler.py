@@ -0,0 +1,322 @@
+##### Import Libraries -----
+
+# data manipulation
+import pandas as pd
+import traceback
+
+# event loop of the kernel and worker processes
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# widgets
+import ipywidgets as widgets
+from ipywidgets.widgets.interaction import show_inline_matplotlib_plots
+
+# rendered panel outputs
+from figure_cache import cached_outputs, render_panel, store_outputs
+
+# on-disk pitch data, shared with the workers like a data frame
+from query_backend import QueryBackend
+
+# call timings, recorded in the workers and sent back with their outputs
+import instrumentation
+
+
+##### Global Options -----
+
+# seconds without a filter change before the dashboard is redrawn
+DEBOUNCE_SECONDS = 0.3
+
+# data frames shared with the worker processes, inherited read only when the workers are forked.
+# Entries are dropped when their scheduler shuts down or the frame is replaced.
+SHARED_FRAMES = dict()
+
+
+##### Define Classes -----
+
+'''
+Define a class standing in for a shared data frame in the arguments sent to a worker
+'''
+class SharedFrame:
+
+    def __init__(self, key):
+        self.key = key
+
+
+'''
+Define a class scheduling the updates of the dashboard panels.
+
+Widget changes are coalesced: every change restarts a debounce timer on the kernel's
+event loop and marks the panels reading the changed widget as stale. When the timer
+fires, the stale panels are drawn one at a time with the latest filter values. A change
+arriving between two panels cancels the remaining draws, which are then done once for
+the newer state, so a burst of changes such as a slider drag costs one redraw.
+
+With workers, the stale panels are drawn at the same time in forked worker processes
+sharing the data frames of the kernel, and each output is shown as soon as its panel
+is done. Draws made stale by a newer change are cancelled or their output discarded.
+Workers are opt-in: forking a kernel with live threads is not safe everywhere, so
+by default and where processes cannot be forked the panels are drawn in the kernel.
+
+A panel added with another data frame for an argument replaces the frame: the panels
+drawn from the previous frame stop following the widgets and the frame is released.
+'''
+class PanelScheduler:
+
+    def __init__(self, debounce = DEBOUNCE_SECONDS, workers = 0):
+
+        self.debounce = debounce
+        self.workers = workers if 'fork' in multiprocessing.get_all_start_methods() else 0
+        self.generation = 0
+        self.panels = []
+        self.stale = []
+        self.renders = 0
+        self._timer = None
+        self._pool = None
+
+        # data frame of each fixed argument and the ids this scheduler shared with its workers
+        self.frames = dict()
+        self.shared = set()
+
+    '''
+    Define a function to add a panel, returning its output widget. Takes the same
+    arguments as widgets.interactive_output and draws the panel right away.
+    '''
+    def output(self, func, controls):
+
+        panel = {'func': func, 'controls': controls, 'output': widgets.Output(), 'future': None}
+        panel['handler'] = lambda change, panel = panel: self.changed(panel)
+
+        for name, control in controls.items():
+
+            # fixed arguments never change and are not observed
+            if isinstance(control, widgets.ValueWidget):
+                control.observe(panel['handler'], names = 'value')
+
+            elif isinstance(control.value, (pd.DataFrame, QueryBackend)):
+                self.share(name, control.value)
+
+        self.panels.append(panel)
+
+        if self.workers:
+            self.submit(panel)
+        else:
+            self.render(panel)
+
+        return panel['output']
+
+    '''
+    Define a function to register the data frame of a fixed argument, retiring the panels
+    of the frame it replaces and sharing it with the workers
+    '''
+    def share(self, name, frame):
+
+        previous = self.frames.get(name)
+        self.frames[name] = frame
+
+        if previous is not None and previous is not frame:
+            for panel in [panel for panel in self.panels if getattr(panel['controls'].get(name), 'value', None) is previous]:
+                self.retire(panel)
+
+        # workers forked before a new data frame was shared are replaced, sharing only the current frames
+        if self.workers and id(frame) not in self.shared:
+            self.shutdown()
+            for value in self.frames.values():
+                SHARED_FRAMES[id(value)] = value
+                self.shared.add(id(value))
+
+    '''
+    Define a function to stop sharing a data frame with the workers
+    '''
+    def unshare(self, key):
+
+        if key in self.shared:
+            self.shared.discard(key)
+            SHARED_FRAMES.pop(key, None)
+
+    '''
+    Define a function to stop updating a panel, so its widgets no longer hold on to it
+    '''
+    def retire(self, panel):
+
+        for control in panel['controls'].values():
+            if isinstance(control, widgets.ValueWidget):
+                control.unobserve(panel['handler'], names = 'value')
+
+        if panel['future'] is not None:
+            panel['future'].cancel()
+            panel['future'] = None
+
+        self.panels.remove(panel)
+        if panel in self.stale:
+            self.stale.remove(panel)
+
+    '''
+    Define a function to record a widget change and restart the debounce timer
+    '''
+    def changed(self, panel):
+
+        self.generation += 1
+
+        if panel not in self.stale:
+            self.stale.append(panel)
+
+        # a draw still waiting for a worker is already stale
+        if panel['future'] is not None:
+            panel['future'].cancel()
+
+        if self._timer is not None:
+            self._timer.cancel()
+
+        self._timer = asyncio.get_event_loop().call_later(self.debounce, self.flush, self.generation)
+
+    '''
+    Define a function to draw the stale panels once no change arrived for the debounce window
+    '''
+    def flush(self, generation):
+
+        self._timer = None
+
+        if self.workers:
+            panels, self.stale = self.stale, []
+            for panel in panels:
+                self.submit(panel)
+            return
+
+        # each draw is its own callback so widget changes queued behind it are seen before the next one
+        for panel in list(self.stale):
+            asyncio.get_event_loop().call_soon(self.render_stale, panel, generation)
+
+    '''
+    Define a function to draw a stale panel unless newer changes superseded the draw
+    '''
+    def render_stale(self, panel, generation):
+
+        if generation != self.generation or panel not in self.stale:
+            return
+
+        self.stale.remove(panel)
+        self.render(panel)
+
+    '''
+    Define a function to draw a panel with the current widget values
+    '''
+    def render(self, panel):
+
+        kwargs = {name: control.value for name, control in panel['controls'].items()}
+        out = panel['output']
+
+        self.renders += 1
+
+        # keep the previous output on screen until the new one is ready
+        with instrumentation.span(panel['func'].__name__, 'update'):
+            out.clear_output(wait = True)
+            with out:
+                panel['func'](**kwargs)
+                show_inline_matplotlib_plots()
+
+    '''
+    Define a function to draw a panel with the current widget values in a worker process
+    '''
+    def submit(self, panel):
+
+        kwargs = {name: control.value for name, control in panel['controls'].items()}
+
+        # selections drawn before are shown from the figure cache
+        outputs = cached_outputs(panel['func'], **kwargs)
+        if outputs is not None:
+            panel['future'] = None
+            with instrumentation.span(panel['func'].__name__, 'update', cache = 'hit'):
+                show_outputs(panel['output'], outputs)
+            return
+
+        # shared data frames are sent by reference
+        shared = {name: SharedFrame(id(value)) if id(value) in SHARED_FRAMES else value for name, value in kwargs.items()}
+
+        self.renders += 1
+        future = self.pool().submit(render_shared, panel['func'], shared,
+                                    instrumentation.enabled, instrumentation.trace_memory)
+        panel['future'] = future
+
+        # outputs are shown from the kernel's event loop as each worker finishes
+        loop = asyncio.get_event_loop()
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self.finished, panel, f, kwargs))
+
+    '''
+    Define a function to show the output of a worker unless a newer change made it stale
+    '''
+    def finished(self, panel, future, kwargs):
+
+        if future.cancelled() or future is not panel['future'] or panel in self.stale:
+            return
+
+        panel['future'] = None
+
+        try:
+            result, outputs, events = future.result()
+        except Exception:
+            outputs = [('stderr', traceback.format_exc())]
+        else:
+            store_outputs(panel['func'], outputs, result, **kwargs)
+            instrumentation.record_events(events)
+
+        show_outputs(panel['output'], outputs)
+
+    '''
+    Define a function returning the worker pool, forked with the shared data frames
+    '''
+    def pool(self):
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, mp_context = multiprocessing.get_context('fork'))
+
+        return self._pool
+
+    '''
+    Define a function to stop the worker processes and release the data frames shared with them
+    '''
+    def shutdown(self):
+
+        if self._pool is not None:
+            self._pool.shutdown(wait = False)
+            self._pool = None
+
+        for key in list(self.shared):
+            self.unshare(key)
+
+
+##### Define Functions -----
+
+'''
+Define a function to draw a panel in a worker process, returning its result, outputs
+and the calls recorded while drawing it when the kernel is recording
+'''
+def render_shared(func, kwargs, record = False, memory = False):
+
+    kwargs = {name: SHARED_FRAMES[value.key] if isinstance(value, SharedFrame) else value for name, value in kwargs.items()}
+
+    # follow the recording state of the kernel, dropping calls inherited from the fork
+    instrumentation.enable(memory) if record else instrumentation.disable()
+    instrumentation.clear()
+
+    # the worker draws the panel itself, its outputs are cached in the kernel
+    with instrumentation.span(func.__name__, 'worker', phase = 'filter'):
+        result, outputs = render_panel(getattr(func, '__wrapped__', func), **kwargs)
+
+    return result, outputs, list(instrumentation.events)
+
+
+'''
+Define a function to replace the contents of an output widget with recorded panel outputs
+'''
+def show_outputs(out, outputs):
+
+    records = []
+    for kind, value in outputs:
+        if kind in ['stdout', 'stderr']:
+            records.append({'output_type': 'stream', 'name': kind, 'text': value})
+        else:
+            records.append({'output_type': 'display_data', 'data': value[0], 'metadata': value[1]})
+
+    out.outputs = tuple(records)
@@ -0,0 +1,143 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+
+# category orders of the dashboard labels
+from schema import CATEGORY_ORDERS
+
+
+##### Global Options -----
+
+# counts grouped into the pitcher's count advantage
+COUNT_ADVANTAGES = [(['1-0', '2-1', '3-2'], 'Even'),
+                    (['0-0', '0-1', '1-1'], 'Ahead (<2 strikes)'),
+                    (['0-2', '1-2', '2-2'], 'Ahead (2 strikes)'),
+                    (['2-0', '3-0', '3-1'], 'Behind')]
+
+# (on_1b, on_2b, on_3b) indicators of each runners on base label
+RUNNERS_ON_BASE = [((0, 0, 0), 'Empty'),
+                   ((1, 0, 0), '1B'),
+                   ((0, 1, 0), '2B'),
+                   ((0, 0, 1), '3B'),
+                   ((1, 1, 0), '1B & 2B'),
+                   ((1, 0, 1), '1B & 3B'),
+                   ((0, 1, 1), '2B & 3B'),
+                   ((1, 1, 1), 'Bases Loaded')]
+
+# launch_speed_angle codes of each batted ball type
+BATTED_BALL_TYPES = [(1, 'Weak'), (2, 'Topped'), (3, 'Under'), (4, 'Flare/Burner'), (5, 'Solid Contact'), (6, 'Barrel')]
+
+# balls and strikes of a count, the count code is balls * 3 + strikes
+MAX_BALLS = 3
+MAX_STRIKES = 2
+N_STRIKES = MAX_STRIKES + 1
+
+# on base columns and their bit in the base state
+BASE_COLUMNS = ['on_1b', 'on_2b', 'on_3b']
+
+
+##### Define Functions -----
+
+'''
+Define a function to build a lookup array from feature codes to the category codes of
+a label column. Codes without a label map to -1, and the lookup ends with a -1 so the
+missing code -1 stays missing.
+'''
+def category_lookup(labels, col):
+
+    categories = CATEGORY_ORDERS[col]
+    lookup = np.full(max(labels) + 2, -1, dtype = np.int64)
+
+    for code, label in labels.items():
+        lookup[code] = categories.index(label)
+
+    return lookup
+
+
+'''
+Define a function to map feature codes through a lookup array into a categorical with
+the category order of a label column
+'''
+def lookup_categorical(codes, lookup, col):
+    return pd.Categorical.from_codes(lookup[codes], categories = CATEGORY_ORDERS[col])
+
+
+# lookup arrays of the labels of each count code, base state and launch_speed_angle code
+COUNT_LOOKUP = category_lookup({balls * N_STRIKES + strikes: f'{balls}-{strikes}'
+                                for balls in range(MAX_BALLS + 1) for strikes in range(N_STRIKES)}, 'count')
+COUNT_ADVANTAGE_LOOKUP = category_lookup({int(count[0]) * N_STRIKES + int(count[2]): label
+                                          for counts, label in COUNT_ADVANTAGES for count in counts}, 'count_advantage')
+RUNNERS_ON_BASE_LOOKUP = category_lookup({b1 + 2 * b2 + 4 * b3: label for (b1, b2, b3), label in RUNNERS_ON_BASE}, 'runners_on_base')
+BATTED_BALL_TYPE_LOOKUP = category_lookup(dict(BATTED_BALL_TYPES), 'batted_ball_type')
+
+
+'''
+Define a function to encode the count of each pitch as balls * 3 + strikes, -1 for
+missing or impossible counts. Four balls are counted as three.
+'''
+def count_codes(balls, strikes):
+
+    balls = np.minimum(np.asarray(balls, dtype = float), MAX_BALLS)
+    strikes = np.asarray(strikes, dtype = float)
+
+    valid = (balls >= 0) & (strikes >= 0) & (strikes <= MAX_STRIKES)
+
+    return np.where(valid, balls * N_STRIKES + strikes, -1).astype(np.int64)
+
+
+'''
+Define a function to encode the runners on base of each pitch as a 3-bit mask, first
+base in the lowest bit. The on base columns hold runner ids, missing without a runner.
+'''
+def base_state(df):
+
+    state = np.zeros(len(df), dtype = np.int64)
+    for bit, col in enumerate(BASE_COLUMNS):
+        state |= df[col].notna().to_numpy().astype(np.int64) << bit
+
+    return state
+
+
+'''
+Define a function to encode the launch_speed_angle of each pitch, -1 for pitches
+without a batted ball or with an unknown code
+'''
+def batted_ball_codes(launch_speed_angle):
+
+    codes = np.asarray(launch_speed_angle, dtype = float)
+    valid = (codes >= 1) & (codes < len(BATTED_BALL_TYPE_LOOKUP) - 1)
+
+    return np.where(valid, codes, -1).astype(np.int64)
+
+
+'''
+Define a function returning the count and count advantage of each pitch as categoricals
+'''
+def count_features(balls, strikes):
+
+    codes = count_codes(balls, strikes)
+
+    return (lookup_categorical(codes, COUNT_LOOKUP, 'count'),
+            lookup_categorical(codes, COUNT_ADVANTAGE_LOOKUP, 'count_advantage'))
+
+
+'''
+Define a function returning the on base indicators and the runners on base category of
+each pitch
+'''
+def runner_features(df):
+
+    state = base_state(df)
+    indicators = {col: (state >> bit) & 1 for bit, col in enumerate(BASE_COLUMNS)}
+
+    return indicators, lookup_categorical(state, RUNNERS_ON_BASE_LOOKUP, 'runners_on_base')
+
+
+'''
+Define a function returning the batted ball type of each pitch as a categorical,
+missing for pitches without a batted ball
+'''
+def batted_ball_type(launch_speed_angle):
+    return lookup_categorical(batted_ball_codes(launch_speed_angle), BATTED_BALL_TYPE_LOOKUP, 'batted_ball_type')
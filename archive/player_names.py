@@ -0,0 +1,75 @@
+##### Import Libraries -----
+
+# data manipulation
+import pandas as pd
+import os
+
+# pybaseball
+from pybaseball import playerid_reverse_lookup
+
+
+##### Define Classes -----
+
+'''
+Define a class holding a persistent registry of player names by mlbam id.
+
+Names are kept in a csv on disk. Ids not in the registry are resolved together in one
+pybaseball lookup and added to the registry, so a rerun does not look up any names.
+Ids pybaseball does not know are kept with an empty name, so they are not looked up again.
+'''
+class PlayerNameRegistry:
+
+    def __init__(self, path = None):
+
+        self.path = path
+        self.names = dict()
+
+        if path is not None and os.path.exists(path):
+            registry_df = pd.read_csv(path)
+            self.names = dict(zip(registry_df['player_id'].astype(int), registry_df['name'].fillna('')))
+
+    '''
+    Define a function returning the names of the given ids, resolving unseen ids in one
+    batched lookup. Ids pybaseball does not know get None.
+    '''
+    def lookup(self, ids):
+
+        ids = [int(i) for i in pd.unique(pd.Series(ids).dropna())]
+        new_ids = [i for i in ids if i not in self.names]
+
+        if new_ids:
+            # unresolved ids are recorded with an empty name
+            resolved = resolve_player_names(new_ids)
+            self.names.update({i: resolved.get(i, '') for i in new_ids})
+            self.save()
+
+        return {i: self.names[i] or None for i in ids}
+
+    '''
+    Define a function to write the registry to disk
+    '''
+    def save(self):
+
+        if self.path is None:
+            return
+
+        registry_df = pd.DataFrame({'player_id': list(self.names), 'name': list(self.names.values())})
+
+        # write to a temporary file first so an interrupted write keeps the previous registry
+        registry_df.sort_values(by = 'player_id').to_csv(self.path + ".tmp", index = False)
+        os.replace(self.path + ".tmp", self.path)
+
+
+##### Define Functions -----
+
+'''
+Define a function to resolve player names for a list of mlbam ids in one pybaseball lookup
+'''
+def resolve_player_names(ids):
+
+    lookup_df = playerid_reverse_lookup([int(i) for i in ids], key_type = 'mlbam')
+
+    # capitalize the first and last name the same way as the data preparation
+    names = lookup_df['name_first'].str.capitalize() + ' ' + lookup_df['name_last'].str.capitalize()
+
+    return dict(zip(lookup_df['key_mlbam'].astype(int), names))
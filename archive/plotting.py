@@ -4,33 +4,121 @@
 import numpy as np
 import pandas as pd 
 
-# plotting
-import seaborn as sns
-import matplotlib.pyplot as plt
-from plotnine import *
-from matplotlib import gridspec
-import plotly.graph_objects as go
+# plotting, the backends are imported by the first panel drawing with them
+from lazy_imports import import_names, lazy_import
+plt = lazy_import('matplotlib.pyplot')
+go = lazy_import('plotly.graph_objects')
 from math import pi
 from IPython.display import Markdown as md
+from IPython.display import display
 
-# pybaseball
-from pybaseball import playerid_reverse_lookup
-import pybaseball as pyb
+# spray chart over cached park outlines
+from spray_chart import DEFAULT_PARK, spray_chart
+
+# dashboard filter index and shared cache of filtered views
+from filter_index import build_filter_index, filter_positions, filter_lookups, get_filter_index
+from filter_cache import cached_filter, filter_cache
+
+# cache of rendered dashboard panels
+from figure_cache import cached_figure, figure_cache
+
+# call timings broken down by phase
+from instrumentation import instrumented, mark
+
+# pre-aggregated pitch counts for the bar charts
+from count_cube import build_count_cube, get_count_cube
+
+# pre-aggregated sums and counts of the times through order statistics
+from stat_cube import build_stat_cube, get_stat_cube
+
+# count transitions for the count flow chart
+from count_flow import COUNT_LABELS, build_count_flow, get_count_flow, read_count_flow, transition_matrix
+
+# binned kernel density grids for the pitch location panels
+from density_grid import LOCATION_X_LIMITS, LOCATION_Z_LIMITS, binned_scatter, location_densities
+
+# columnar pitch data storage and compact schema
+from storage import is_columnar_path, read_pitch_data
+from schema import apply_pitch_schema
+
+# out-of-core query backend for columnar data larger than memory
+from query_backend import PitchDataset, is_query_backend
+
+
+##### Global Options -----
+
+# columns read by the dashboard panels
+DASHBOARD_COLUMNS = ['game_pk', 'game_year', 'pitcher', 'at_bat_number', 'pitch_number',
+                     'pitcher_name', 'pitch_name', 'stand', 'batter_name', 'count', 'count_advantage',
+                     'outs_when_up', 'inning', 'runners_on_base', 'run_differential', 'lead_count', 'tto',
+                     'plate_x', 'plate_z_norm', 'pfx_x', 'pfx_z', 'release_pos_x', 'release_pos_z',
+                     'events', 'batted_ball_type', 'hc_x', 'hc_y',
+                     'strike_ind', 'whiff_ind', 'woba_value', 'launch_speed', 'release_spin_rate']
+
+
+# statistics compared between a pitcher and the rest of MLB
+COMPARE_STATS = ['strike_ind', 'whiff_ind', 'woba_value', 'launch_speed', 'release_spin_rate']
+
+# pitches above which the movement and release scatter plots draw density tiles instead of points
+SCATTER_MAX_POINTS = 5000
+
+# density tile sizes of the movement (inches) and release point (feet) scatter plots
+MOVEMENT_CELL_SIZE = 1
+RELEASE_CELL_SIZE = 0.1
 
 
 ##### Define Functions -----
 
 '''
-Define a function for loading in dataset
+Define a function to import plotnine into the module on the first ggplot panel
 '''
-def load_data(in_path, name):
-    df = pd.read_csv(in_path)
+def use_plotnine():
+
+    if 'ggplot' not in globals():
+        import_names('plotnine', globals())
+
+
+'''
+Define a function for loading in dataset. Columnar data only reads the requested
+columns and the partitions of the requested seasons and pitcher ids. Out of core,
+columnar data is not read but queried on disk by every dashboard function.
+'''
+@instrumented('load')
+def load_data(in_path, name, columns = None, seasons = None, pitchers = None, out_of_core = False):
+    
+    if out_of_core:
+        return PitchDataset(in_path, columns = columns, seasons = seasons, pitchers = pitchers)
+    
+    if is_columnar_path(in_path):
+        df = read_pitch_data(in_path, columns = columns, seasons = seasons, pitchers = pitchers)
+    else:
+        df = pd.read_csv(in_path, sep=';', usecols = None if columns is None else lambda col: col in set(columns))
+        
+        # csv files cannot be pruned, drop the other seasons and pitchers after reading
+        if seasons is not None:
+            df = df[df['game_year'].isin(seasons)].reset_index(drop = True)
+        if pitchers is not None:
+            df = df[df['pitcher'].isin(pitchers)].reset_index(drop = True)
+    
+    # convert labels to categoricals and downcast numerics
+    df = apply_pitch_schema(df)
+    
+    # build the filter index, count cube and stat cube once at load time
+    build_filter_index(df)
+    build_count_cube(df)
+    build_stat_cube(df)
+    
+    # count transitions are read from the ones stored with columnar data, or built from the pitches
+    build_count_flow(df, read_count_flow(in_path, seasons, pitchers) if is_columnar_path(in_path) else None)
+    
     return df
 
 
 '''
-Define a function to filter the original statcast data to the desired scope
+Define a function to filter the original statcast data to the desired scope.
+Results are shared across panels through the filter cache and must not be modified.
 '''
+@cached_filter
 def statcast_df_filter(data,
                        pitcher_name_filter,
                        pitch_name_filter,
@@ -43,45 +131,43 @@ def statcast_df_filter(data,
                        runners_on_base_filter,
                        run_differential_filter):
     
-    # filter pitcher name
-    statcast_df_filtered = data[data['pitcher_name'] == pitcher_name_filter]
-    
-    # filter pitch name
-    statcast_df_filtered = statcast_df_filtered[statcast_df_filtered['pitch_name'].isin(pitch_name_filter)]
-    
-    # filter batter stance
-    statcast_df_filtered = statcast_df_filtered[statcast_df_filtered['stand'].isin(stand_filter)]
-    
-    # filter batter name
-    if batter_name_filter != 'All':
-        statcast_df_filtered = statcast_df_filtered[statcast_df_filtered['batter_name'] == batter_name_filter]
-        
-    # filter count
-    statcast_df_filtered = statcast_df_filtered[statcast_df_filtered['count'].isin(count_filter)]
-    
-    # filter count advantage
-    statcast_df_filtered = statcast_df_filtered[statcast_df_filtered['count_advantage'].isin(count_advantage_filter)]
-    
-    # filter outs
-    statcast_df_filtered = statcast_df_filtered[statcast_df_filtered['outs_when_up'].isin(outs_when_up_filter)]
-    
-    # filter inning
-    statcast_df_filtered = statcast_df_filtered[statcast_df_filtered['inning'].isin(inning_filter)]
-    
-    # filter runners on base
-    statcast_df_filtered = statcast_df_filtered[statcast_df_filtered['runners_on_base'].isin(runners_on_base_filter)]
-    
-    # filter run differential
-    statcast_df_filtered = statcast_df_filtered[(statcast_df_filtered['run_differential'] >= run_differential_filter[0]) &
-                                                (statcast_df_filtered['run_differential'] <= run_differential_filter[1])]
+    # on-disk data is scanned with the filters pushed down
+    if is_query_backend(data):
+        return data.filter_rows(pitcher_name_filter,
+                                pitch_name_filter,
+                                stand_filter,
+                                batter_name_filter, 
+                                count_filter,
+                                count_advantage_filter,
+                                outs_when_up_filter,
+                                inning_filter,
+                                runners_on_base_filter,
+                                run_differential_filter)
+    
+    # get the matching row positions from the filter index
+    positions = filter_positions(data,
+                                 pitcher_name_filter,
+                                 pitch_name_filter,
+                                 stand_filter,
+                                 batter_name_filter, 
+                                 count_filter,
+                                 count_advantage_filter,
+                                 outs_when_up_filter,
+                                 inning_filter,
+                                 runners_on_base_filter,
+                                 run_differential_filter)
+    
+    # take the matching rows in a single copy
+    statcast_df_filtered = data.take(positions)
     
     return statcast_df_filtered
 
 
 '''
 Define a function to filter the original statcast data to the desired scope.
-Does not filter on pitcher.
+Does not filter on pitcher. Results are shared through the filter cache.
 '''
+@cached_filter(ignore = ('pitcher_name_filter',))
 def statcast_df_non_pitcher_filter(data,
                                    pitcher_name_filter,
                                    pitch_name_filter,
@@ -94,41 +180,159 @@ def statcast_df_non_pitcher_filter(data,
                                    runners_on_base_filter,
                                    run_differential_filter):
     
-    # filter pitch name
-    statcast_df_filtered = data[data['pitch_name'].isin(pitch_name_filter)]
+    # on-disk data is scanned with the filters pushed down, reading every pitcher
+    if is_query_backend(data):
+        return data.filter_rows(pitcher_name_filter,
+                                pitch_name_filter,
+                                stand_filter,
+                                batter_name_filter, 
+                                count_filter,
+                                count_advantage_filter,
+                                outs_when_up_filter,
+                                inning_filter,
+                                runners_on_base_filter,
+                                run_differential_filter,
+                                filter_pitcher = False)
+    
+    # get the matching row positions from the filter index, skipping the pitcher
+    positions = filter_positions(data,
+                                 pitcher_name_filter,
+                                 pitch_name_filter,
+                                 stand_filter,
+                                 batter_name_filter, 
+                                 count_filter,
+                                 count_advantage_filter,
+                                 outs_when_up_filter,
+                                 inning_filter,
+                                 runners_on_base_filter,
+                                 run_differential_filter,
+                                 filter_pitcher = False)
+    
+    # take the matching rows in a single copy
+    statcast_df_filtered = data.take(positions)
     
-    # filter batter stance
-    statcast_df_filtered = statcast_df_filtered[statcast_df_filtered['stand'].isin(stand_filter)]
+    return statcast_df_filtered
+
+
+'''
+Define a function to count pitches by the given columns given dashboard filters.
+Counts come from the count cube, the batter filter falls back to the filtered rows.
+On-disk data is counted out-of-core by its query backend.
+'''
+@instrumented('filter')
+def statcast_count_filter(data,
+                          by,
+                          pitcher_name_filter,
+                          pitch_name_filter,
+                          stand_filter,
+                          batter_name_filter, 
+                          count_filter,
+                          count_advantage_filter,
+                          outs_when_up_filter,
+                          inning_filter,
+                          runners_on_base_filter,
+                          run_differential_filter):
     
-    # filter batter name
+    # count the matching pitches of on-disk data batch by batch
+    if is_query_backend(data):
+        return data.count_rows(by,
+                               pitcher_name_filter,
+                               pitch_name_filter,
+                               stand_filter,
+                               batter_name_filter, 
+                               count_filter,
+                               count_advantage_filter,
+                               outs_when_up_filter,
+                               inning_filter,
+                               runners_on_base_filter,
+                               run_differential_filter)
+    
+    # the cube does not hold the batter, count the filtered rows instead
     if batter_name_filter != 'All':
-        statcast_df_filtered = statcast_df_filtered[statcast_df_filtered['batter_name'] == batter_name_filter]
+        statcast_df_filtered = statcast_df_filter(data,
+                                                  pitcher_name_filter,
+                                                  pitch_name_filter,
+                                                  stand_filter,
+                                                  batter_name_filter, 
+                                                  count_filter,
+                                                  count_advantage_filter,
+                                                  outs_when_up_filter,
+                                                  inning_filter,
+                                                  runners_on_base_filter,
+                                                  run_differential_filter)
         
-    # filter count
-    statcast_df_filtered = statcast_df_filtered[statcast_df_filtered['count'].isin(count_filter)]
-    
-    # filter count advantage
-    statcast_df_filtered = statcast_df_filtered[statcast_df_filtered['count_advantage'].isin(count_advantage_filter)]
-    
-    # filter outs
-    statcast_df_filtered = statcast_df_filtered[statcast_df_filtered['outs_when_up'].isin(outs_when_up_filter)]
-    
-    # filter inning
-    statcast_df_filtered = statcast_df_filtered[statcast_df_filtered['inning'].isin(inning_filter)]
-    
-    # filter runners on base
-    statcast_df_filtered = statcast_df_filtered[statcast_df_filtered['runners_on_base'].isin(runners_on_base_filter)]
-    
-    # filter run differential
-    statcast_df_filtered = statcast_df_filtered[(statcast_df_filtered['run_differential'] >= run_differential_filter[0]) &
-                                                (statcast_df_filtered['run_differential'] <= run_differential_filter[1])]
-    
-    return statcast_df_filtered
+        return statcast_df_filtered.groupby(by, observed = True)[by[0]].count()
+    
+    # build the code lookups of the filters and sum the matching cells
+    filters = filter_lookups(get_filter_index(data),
+                             pitcher_name_filter,
+                             pitch_name_filter,
+                             stand_filter,
+                             batter_name_filter, 
+                             count_filter,
+                             count_advantage_filter,
+                             outs_when_up_filter,
+                             inning_filter,
+                             runners_on_base_filter)
+    
+    return get_count_cube(data).counts(by, filters, (run_differential_filter[0], run_differential_filter[1]))
+
+
+'''
+Define a function to count pitches by count and next count given dashboard filters, as
+a 12x12 matrix. Transitions come from the count flow cube, the batter filter falls back
+to the filtered rows. On-disk data is counted out-of-core by its query backend.
+'''
+@instrumented('filter')
+def statcast_count_flow_filter(data,
+                               pitcher_name_filter,
+                               pitch_name_filter,
+                               stand_filter,
+                               batter_name_filter, 
+                               count_filter,
+                               count_advantage_filter,
+                               outs_when_up_filter,
+                               inning_filter,
+                               runners_on_base_filter,
+                               run_differential_filter):
+    
+    # the cube does not hold the batter, count the filtered rows instead
+    if is_query_backend(data) or batter_name_filter != 'All':
+        count_counts = statcast_count_filter(data,
+                                             ['count', 'lead_count'],
+                                             pitcher_name_filter,
+                                             pitch_name_filter,
+                                             stand_filter,
+                                             batter_name_filter, 
+                                             count_filter,
+                                             count_advantage_filter,
+                                             outs_when_up_filter,
+                                             inning_filter,
+                                             runners_on_base_filter,
+                                             run_differential_filter)
+        
+        return transition_matrix(count_counts)
+    
+    # build the code lookups of the filters from the cube's labels and sum the matching cells
+    count_flow = get_count_flow(data)
+    filters = filter_lookups(count_flow,
+                             pitcher_name_filter,
+                             pitch_name_filter,
+                             stand_filter,
+                             batter_name_filter, 
+                             count_filter,
+                             count_advantage_filter,
+                             outs_when_up_filter,
+                             inning_filter,
+                             runners_on_base_filter)
+    
+    return count_flow.transitions(filters, (run_differential_filter[0], run_differential_filter[1]))
 
 
 '''
 Define a function to print number of pitches given dashboard filters
 '''
+@cached_figure
 def number_of_pitches(data,
                       pitcher_name_filter,
                       pitch_name_filter,
@@ -156,12 +360,14 @@ def number_of_pitches(data,
     
     num_observations = len(statcast_df_filtered)
     
+    mark('build')
     display(md("**<font size='8'>{}</font>**".format(num_observations)))
     
 
 '''
 Define a function to print bar plot of pitch selection percents given dashboard filters
 '''
+@cached_figure
 def pitch_selection_bar(data,
                         pitcher_name_filter,
                         pitch_name_filter,
@@ -174,8 +380,9 @@ def pitch_selection_bar(data,
                         runners_on_base_filter,
                         run_differential_filter):
     
-    # filter data
-    statcast_df_filtered = statcast_df_filter(data,
+    # count pitches by pitch name given dashboard filters
+    pitch_name_counts = statcast_count_filter(data,
+                                              ['pitch_name'],
                                               pitcher_name_filter,
                                               pitch_name_filter,
                                               stand_filter,
@@ -188,7 +395,8 @@ def pitch_selection_bar(data,
                                               run_differential_filter)
     
     # create a dataframe with counts and relative frequency of pitch name
-    temp_df1 = pd.DataFrame(statcast_df_filtered.groupby(['pitch_name'])['pitch_name'].count())
+    mark('aggregate')
+    temp_df1 = pd.DataFrame(pitch_name_counts)
     temp_df1 = pd.DataFrame(temp_df1['pitch_name'] / temp_df1.groupby([True]*len(temp_df1))['pitch_name'].transform('sum')).add_suffix('_percent').reset_index()
 
     # determine order and create a categorical type of pitch name
@@ -199,6 +407,8 @@ def pitch_selection_bar(data,
     temp_df1 = temp_df1.assign(pitch_name_cat = pitch_name_cat)
 
     # plot a bar chart of the relative frequency of pitch selection
+    mark('build')
+    use_plotnine()
     (ggplot(temp_df1) +
       aes(x = 'pitch_name_cat', y = 'pitch_name_percent', fill = 'pitch_name') +
       geom_bar(size = 20, stat = 'identity') +
@@ -215,9 +425,90 @@ def pitch_selection_bar(data,
             figure_size = (8, 5))).draw();
     
     
+'''
+Define a function to plot sankey chart of pitch count flow given dashboard filters
+'''
+@cached_figure
+def pitch_count_sankey(data,
+                       pitcher_name_filter,
+                       pitch_name_filter,
+                       stand_filter,
+                       batter_name_filter, 
+                       count_filter,
+                       count_advantage_filter,
+                       outs_when_up_filter,
+                       inning_filter,
+                       runners_on_base_filter,
+                       run_differential_filter):
+    
+    # count pitches by count and next count given dashboard filters
+    transitions = statcast_count_flow_filter(data,
+                                             pitcher_name_filter,
+                                             pitch_name_filter,
+                                             stand_filter,
+                                             batter_name_filter, 
+                                             count_filter,
+                                             count_advantage_filter,
+                                             outs_when_up_filter,
+                                             inning_filter,
+                                             runners_on_base_filter,
+                                             run_differential_filter)
+
+    # calculate number of pitches in each source/target
+    mark('aggregate')
+    source, target = np.nonzero(transitions)
+    count_df = pd.DataFrame({'count': np.asarray(COUNT_LABELS)[source],
+                             'lead_count': np.asarray(COUNT_LABELS)[target],
+                             'pitch_number': transitions[source, target]})
+
+    # specify a reference table with the count labels and their locations in the sankey chart
+    d = {'count': ['0-0', '0-1',  '0-2', '1-1', '1-0',  '2-0', '1-2', '2-1', '2-2', '3-0', '3-1', '3-2'],
+         'x':     ['0',   '0.2',  '0.4', '0.4', '0.2',  '0.4', '0.6', '0.6', '0.8', '0.6', '0.8', '1'],
+         'y':     ['0.5', '0.75', '1',   '0.5', '0.25', '0',   '1',   '0.5', '0.75', '0', '0.25', '0.5'],
+         'count_index': [*range(12)]}
+
+    count_ref_df = pd.DataFrame(data=d)
+
+    # merge the count index
+    tmp_df = count_df.merge(count_ref_df, how='left', on='count')
+
+    # merge the next count index
+    final_count_df = tmp_df.merge(count_ref_df, how='left', left_on='lead_count', right_on='count', suffixes=('', '_lead'))
+
+    # plot the sankey chart
+    mark('build')
+    fig = go.FigureWidget(data=[go.Sankey(
+        arrangement = "snap",
+        valueformat = ".0f",
+        valuesuffix = " pitches",
+        node = dict(
+          pad = 15,
+          thickness = 20,
+          line = dict(color = "black", width = 0.5),
+          label = count_ref_df['count'],
+          x = list(count_ref_df['x']),
+          y = list(count_ref_df['y']),
+          color = "blue"
+        ),
+        link = dict(
+          source = list(final_count_df['count_index']),
+          target = list(final_count_df['count_index_lead']),
+          value = list(final_count_df['pitch_number'])
+      ))])
+
+    fig.update_layout(title_text="Pitch Count Flow", 
+                      font_size=12, 
+                      autosize=False,
+                      width=900,
+                      height=600)
+
+    fig.show(renderer="png")
+    
+    
 '''
 Define a function to plot pitch frequency by count given dashboard filters
 '''
+@cached_figure
 def pitch_count_bar(data,
                     pitcher_name_filter,
                     pitch_name_filter,
@@ -230,21 +521,23 @@ def pitch_count_bar(data,
                     runners_on_base_filter,
                     run_differential_filter):
     
-    # filter data
-    statcast_df_filtered = statcast_df_filter(data,
-                                              pitcher_name_filter,
-                                              pitch_name_filter,
-                                              stand_filter,
-                                              batter_name_filter, 
-                                              count_filter,
-                                              count_advantage_filter,
-                                              outs_when_up_filter,
-                                              inning_filter,
-                                              runners_on_base_filter,
-                                              run_differential_filter)
+    # count pitches by count given dashboard filters
+    count_counts = statcast_count_filter(data,
+                                         ['count'],
+                                         pitcher_name_filter,
+                                         pitch_name_filter,
+                                         stand_filter,
+                                         batter_name_filter, 
+                                         count_filter,
+                                         count_advantage_filter,
+                                         outs_when_up_filter,
+                                         inning_filter,
+                                         runners_on_base_filter,
+                                         run_differential_filter)
 
     # create a dataframe with counts and relative frequency of count
-    temp_df1 = pd.DataFrame(statcast_df_filtered.groupby(['count'])['count'].count())
+    mark('aggregate')
+    temp_df1 = pd.DataFrame(count_counts)
     temp_df1 = pd.DataFrame(temp_df1['count'] / temp_df1.groupby([True]*len(temp_df1))['count'].transform('sum')).add_suffix('_percent').reset_index()
 
     # determine order and create a categorical type of count
@@ -255,6 +548,8 @@ def pitch_count_bar(data,
     temp_df1 = temp_df1.assign(count_cat = count_cat)
 
     # plot a bar chart of the relative frequency of count
+    mark('build')
+    use_plotnine()
     (ggplot(temp_df1) +
       aes(x = 'count_cat', y = 'count_percent') +
       geom_bar(size = 20, stat = 'identity') +
@@ -274,6 +569,7 @@ def pitch_count_bar(data,
 '''
 Define a function to plot pitch type percent by count given dashboard filters
 '''    
+@cached_figure
 def pitch_count_stacked_bar(data,
                             pitcher_name_filter,
                             pitch_name_filter,
@@ -286,21 +582,37 @@ def pitch_count_stacked_bar(data,
                             runners_on_base_filter,
                             run_differential_filter):
     
-    # filter data
-    statcast_df_filtered = statcast_df_filter(data,
-                                              pitcher_name_filter,
-                                              pitch_name_filter,
-                                              stand_filter,
-                                              batter_name_filter, 
-                                              count_filter,
-                                              count_advantage_filter,
-                                              outs_when_up_filter,
-                                              inning_filter,
-                                              runners_on_base_filter,
-                                              run_differential_filter)
+    # count pitches by count given dashboard filters
+    count_counts = statcast_count_filter(data,
+                                         ['count'],
+                                         pitcher_name_filter,
+                                         pitch_name_filter,
+                                         stand_filter,
+                                         batter_name_filter, 
+                                         count_filter,
+                                         count_advantage_filter,
+                                         outs_when_up_filter,
+                                         inning_filter,
+                                         runners_on_base_filter,
+                                         run_differential_filter)
+    
+    # count pitches by count and pitch name given dashboard filters
+    count_pitch_name_counts = statcast_count_filter(data,
+                                                    ['count', 'pitch_name'],
+                                                    pitcher_name_filter,
+                                                    pitch_name_filter,
+                                                    stand_filter,
+                                                    batter_name_filter, 
+                                                    count_filter,
+                                                    count_advantage_filter,
+                                                    outs_when_up_filter,
+                                                    inning_filter,
+                                                    runners_on_base_filter,
+                                                    run_differential_filter)
     
     # create a dataframe with counts and relative frequency of count
-    temp_df1 = pd.DataFrame(statcast_df_filtered.groupby(['count'])['count'].count())
+    mark('aggregate')
+    temp_df1 = pd.DataFrame(count_counts)
     temp_df1 = pd.DataFrame(temp_df1['count'] / temp_df1.groupby([True]*len(temp_df1))['count'].transform('sum')).add_suffix('_percent').reset_index()
 
     # determine order and create a categorical type of count
@@ -311,8 +623,8 @@ def pitch_count_stacked_bar(data,
     temp_df1 = temp_df1.assign(count_cat = count_cat)
 
     # create a dataframe with counts and relative frequency of count and pitch name
-    temp_df2 = pd.DataFrame(statcast_df_filtered.groupby(['count', 'pitch_name'])['count'].count()).add_suffix('_group').reset_index()
-    temp_df3 = pd.DataFrame(temp_df2['count_group'] / temp_df2.groupby('count')['count_group'].transform('sum')).add_suffix('_percent')
+    temp_df2 = pd.DataFrame(count_pitch_name_counts).add_suffix('_group').reset_index()
+    temp_df3 = pd.DataFrame(temp_df2['count_group'] / temp_df2.groupby('count', observed = True)['count_group'].transform('sum')).add_suffix('_percent')
     temp_df4 = pd.concat([temp_df2.reset_index(drop = True), temp_df3], axis = 1)
 
     # determine order and create a categorical type of count
@@ -323,6 +635,8 @@ def pitch_count_stacked_bar(data,
     temp_df4 = temp_df4.assign(count_cat = count_cat)
 
     # plot a bar chart of the relative frequency of pitch selection by count
+    mark('build')
+    use_plotnine()
     (ggplot(temp_df4) +
       aes(x = 'count_cat', y = 'count_group_percent', fill = 'pitch_name') +
       geom_bar(size = 20, stat = 'identity', position = "stack") +
@@ -341,6 +655,7 @@ def pitch_count_stacked_bar(data,
 '''
 Define a function to plot pitch type percent by count advantage given dashboard filters
 '''
+@cached_figure
 def pitch_count_advantage_stacked_bar(data,
                                       pitcher_name_filter,
                                       pitch_name_filter,
@@ -353,25 +668,29 @@ def pitch_count_advantage_stacked_bar(data,
                                       runners_on_base_filter,
                                       run_differential_filter):
     
-    # filter data
-    statcast_df_filtered = statcast_df_filter(data,
-                                              pitcher_name_filter,
-                                              pitch_name_filter,
-                                              stand_filter,
-                                              batter_name_filter, 
-                                              count_filter,
-                                              count_advantage_filter,
-                                              outs_when_up_filter,
-                                              inning_filter,
-                                              runners_on_base_filter,
-                                              run_differential_filter)
+    # count pitches by count advantage and pitch name given dashboard filters
+    count_advantage_counts = statcast_count_filter(data,
+                                                   ['count_advantage', 'pitch_name'],
+                                                   pitcher_name_filter,
+                                                   pitch_name_filter,
+                                                   stand_filter,
+                                                   batter_name_filter, 
+                                                   count_filter,
+                                                   count_advantage_filter,
+                                                   outs_when_up_filter,
+                                                   inning_filter,
+                                                   runners_on_base_filter,
+                                                   run_differential_filter)
 
     # create a dataframe with counts and relative frequency
-    temp_df2 = pd.DataFrame(statcast_df_filtered.groupby(['count_advantage', 'pitch_name'])['count_advantage'].count()).add_suffix('_group').reset_index()
-    temp_df3 = pd.DataFrame(temp_df2['count_advantage_group'] / temp_df2.groupby('count_advantage')['count_advantage_group'].transform('sum')).add_suffix('_percent')
+    mark('aggregate')
+    temp_df2 = pd.DataFrame(count_advantage_counts).add_suffix('_group').reset_index()
+    temp_df3 = pd.DataFrame(temp_df2['count_advantage_group'] / temp_df2.groupby('count_advantage', observed = True)['count_advantage_group'].transform('sum')).add_suffix('_percent')
     temp_df4 = pd.concat([temp_df2.reset_index(drop=True), temp_df3], axis = 1)
 
     # plot a bar chart of the relative frequency of pitch selection by count
+    mark('build')
+    use_plotnine()
     (ggplot(temp_df4) +
       aes(x = 'count_advantage', y = 'count_advantage_group_percent', fill = 'pitch_name') +
       geom_bar(size = 20, stat = 'identity', position = "stack") +
@@ -387,9 +706,45 @@ def pitch_count_advantage_stacked_bar(data,
             figure_size = (8, 2))).draw();
     
 
+'''
+Define a function to compute the pitch location density grids of each breakdown category
+with at least 50 pitches. Grids are shared through the filter cache.
+'''
+@cached_filter
+def statcast_location_density(data,
+                              pitcher_name_filter,
+                              pitch_name_filter,
+                              stand_filter,
+                              batter_name_filter, 
+                              count_filter,
+                              count_advantage_filter,
+                              outs_when_up_filter,
+                              inning_filter,
+                              runners_on_base_filter,
+                              run_differential_filter,
+                              breakdown_var):
+
+    # filter data
+    statcast_df_filtered = statcast_df_filter(data,
+                                              pitcher_name_filter,
+                                              pitch_name_filter,
+                                              stand_filter,
+                                              batter_name_filter, 
+                                              count_filter,
+                                              count_advantage_filter,
+                                              outs_when_up_filter,
+                                              inning_filter,
+                                              runners_on_base_filter,
+                                              run_differential_filter)
+
+    # bin all categories onto one grid and smooth them in a single batch
+    return location_densities(statcast_df_filtered, breakdown_var, min_pitches = 50)
+
+
 '''
 Define a function to plot pitch location broken down by selection given dashboard filters
 '''
+@cached_figure
 def plot_pitch_location(data,
                         pitcher_name_filter,
                         pitch_name_filter,
@@ -416,95 +771,109 @@ def plot_pitch_location(data,
                                               runners_on_base_filter,
                                               run_differential_filter)
 
-    # initialise a list which will store the breakdown plots
-    plots = list()
-
     # initialize the breakdown variable
-    if breakdown_var_filter == 'none':
-        breakdown = statcast_df_filtered['pitcher_name']
-    else:
-        breakdown = statcast_df_filtered[breakdown_var_filter]
+    mark('aggregate')
+    breakdown_var = 'pitcher_name' if breakdown_var_filter == 'none' else breakdown_var_filter
+    breakdown = statcast_df_filtered[breakdown_var]
+
+    # get breakdown variable categories, skipping categorical levels without pitches
+    breakdown_counts = breakdown.value_counts()
+    categories = breakdown_counts[breakdown_counts > 0].index.tolist()
 
-    # get breakdown variable categories
-    categories = breakdown.value_counts().index.tolist()
+    # density grids of the categories with at least 50 pitches
+    grid, densities = statcast_location_density(data,
+                                                pitcher_name_filter,
+                                                pitch_name_filter,
+                                                stand_filter,
+                                                batter_name_filter, 
+                                                count_filter,
+                                                count_advantage_filter,
+                                                outs_when_up_filter,
+                                                inning_filter,
+                                                runners_on_base_filter,
+                                                run_differential_filter,
+                                                breakdown_var)
+
+    # create a subplot for each level of category in breakdown variable
+    mark('build')
+    fig, axes = plt.subplots(1, max(len(categories), 1), figsize = (5*max(len(categories), 1), 5), squeeze = False)
 
-    # create subplot for each level of category in breakdown variable
     for j, i in enumerate(categories):
-        
-        dat = statcast_df_filtered[breakdown == i]
-        
+
+        ax = axes[0, j]
+
         # if number of pitches is greater than 50
-        # plot 2d density of pitch location
-        if len(dat) >= 50:
-            
+        # draw the precomputed 2d density of pitch location
+        if i in densities:
+            contours = ax.contourf(grid.x, grid.y, densities[i].T, levels = 30, cmap = 'viridis')
+            ax.set_facecolor('#440154FF')
+            zone_color = 'white'
+
+            # show the density legend under the first subplot
             if j == 0:
-                leg_pos = 'bottom'
-            else:
-                leg_pos = 'none'
-            
-            p1 = (ggplot(dat) +
-                    aes(x = 'plate_x*-1', y = 'plate_z_norm') +
-                    stat_density_2d(aes(fill = 'stat(..level..)'), geom = "polygon", levels = 30) +
-                    geom_rect(aes(xmin = -0.83, xmax = 0.83, ymin = 1.574895560522476, ymax = 3.394016229859721), alpha = 0, color = 'white') +
-                    coord_cartesian(ylim = [1, 4], xlim = [-1.66, 1.66]) +
-                    labs(title = i, fill='           Density') +
-                    theme_minimal() +
-                    theme(legend_position = leg_pos,
-                          panel_background = element_rect(fill = '#440154FF', color = '#440154FF'),
-                          panel_grid_major = element_blank(),
-                          panel_grid_minor = element_blank(),
-                          axis_title_y = element_text(angle = 0, margin = dict([('r', 40)])),
-                          axis_title_x = element_text(angle = 0, margin = dict([('t', 15)])),
-                          axis_ticks = element_blank(),
-                          axis_text = element_blank(),
-                          figure_size = (10, 5)))
+                colorbar = fig.colorbar(contours, ax = ax, orientation = 'horizontal', pad = 0.15)
+                colorbar.set_label('Density')
         else:
-            p1 = (ggplot(dat) +
-                    aes(x = 'plate_x*-1', y = 'plate_z_norm') +
-                    geom_point(alpha=.3) +
-                    geom_rect(aes(xmin = -0.83, xmax = 0.83, ymin = 1.574895560522476, ymax = 3.394016229859721), alpha = 0, color = 'grey') +
-                    coord_cartesian(ylim = [1, 4], xlim = [-1.66, 1.66]) +
-                    labs(title = i) +
-                    theme_minimal() +
-                    theme(legend_position = 'none',
-                          panel_grid_major = element_blank(),
-                          panel_grid_minor = element_blank(),
-                          axis_title_y = element_text(angle = 0, margin = dict([('r', 40)])),
-                          axis_title_x = element_text(angle = 0, margin = dict([('t', 15)])),
-                          axis_ticks = element_blank(),
-                          axis_text = element_blank(),
-                          figure_size = (10, 5)))
-
-        # append plot to list
-        plots.append(p1)
-
-    # create empty figure for subplots to be added
-    fig = (ggplot() + 
-              geom_blank(data = statcast_df_filtered) + 
-              theme_void() + 
-              theme(figure_size = (5*len(categories), 5))).draw()
-
-    # create grid specification
-    gs = gridspec.GridSpec(1, len(categories))
-
-    # initialise a blank list for the subplots
-    ax = list()
-
-    # for each level of the category assign subplot to grid
-    for i in range(len(categories)):
-        ax.append(fig.add_subplot(gs[0, i]))
-        ax[i].set_title(categories[i])
-
-        # add subplot to figure
-        _ = plots[i]._draw_using_figure(fig, [ax[i]])
+            dat = statcast_df_filtered[breakdown == i]
+            ax.scatter(dat['plate_x']*-1, dat['plate_z_norm'], color = 'black', alpha = .3)
+            zone_color = 'grey'
+
+        # draw the strike zone
+        ax.add_patch(plt.Rectangle((-0.83, 1.574895560522476), 1.66, 3.394016229859721 - 1.574895560522476,
+                                   fill = False, edgecolor = zone_color))
+
+        ax.set_xlim(LOCATION_X_LIMITS)
+        ax.set_ylim(LOCATION_Z_LIMITS)
+        ax.set_title(i)
+        ax.set_xlabel('plate_x*-1')
+        ax.set_ylabel('plate_z_norm', rotation = 0, labelpad = 40)
+        ax.set_xticks([])
+        ax.set_yticks([])
+        for spine in ax.spines.values():
+            spine.set_visible(False)
 
     # show figure
     fig.show()
     
     
+'''
+Define a function to start a scatter plot of the given x and y expressions colored by
+pitch type. Above SCATTER_MAX_POINTS pitches, the pitches of each type are binned into
+square tiles shaded by their share of the type's fullest tile, with a point at the
+centroid of each type, so drawing time does not grow with the number of pitches.
+'''
+def pitch_scatter(statcast_df_filtered, x, y, x_limits, y_limits, cell_size):
+
+    use_plotnine()
+
+    # few enough pitches are drawn exactly
+    if len(statcast_df_filtered) <= SCATTER_MAX_POINTS:
+        return (ggplot(statcast_df_filtered) +
+                  aes(x = x, y = y, color = 'pitch_name') +
+                  geom_point())
+
+    x_values = statcast_df_filtered.eval(x).to_numpy(dtype = float)
+    y_values = statcast_df_filtered.eval(y).to_numpy(dtype = float)
+
+    # bin over the plotted window, or the range of the pitches if the axis is not limited
+    if y_limits is None:
+        y_limits = [np.floor(np.nanmin(y_values)), np.ceil(np.nanmax(y_values))]
+
+    cells, centroids = binned_scatter(x_values, y_values, statcast_df_filtered['pitch_name'], x_limits, y_limits, cell_size)
+    cells['alpha'] = 0.15 + 0.85 * cells['share']
+
+    return (ggplot(cells) +
+              aes(x = 'x', y = 'y', fill = 'pitch_name', alpha = 'alpha') +
+              geom_tile(width = cell_size, height = cell_size) +
+              geom_point(data = centroids, mapping = aes(x = 'x', y = 'y', fill = 'pitch_name'), inherit_aes = False,
+                         color = 'black', size = 4) +
+              scale_alpha_identity())
+
+
 '''
 Define a function to plot scatterplot of pitch movement by pitch type given dashboard filters
 '''
+@cached_figure
 def pitch_movement_scatter(data,
                            pitcher_name_filter,
                            pitch_name_filter,
@@ -531,11 +900,10 @@ def pitch_movement_scatter(data,
                                               run_differential_filter)
 
     # plot the pitch movement by pitch name
-    (ggplot(statcast_df_filtered) +
-       aes(x = 'pfx_x*-12', y = 'pfx_z*12', color = 'pitch_name') +
-       geom_point() +
+    mark('build')
+    (pitch_scatter(statcast_df_filtered, 'pfx_x*-12', 'pfx_z*12', [-36, 36], None, MOVEMENT_CELL_SIZE) +
        scale_x_continuous(limits = [-36, 36], breaks = list(range(-36, 48, 12))) +
-       labs(x = "Horizontal Movement", y = "Vertical \nMovement", title = "Pitch Movement (inches) by Pitch Type", color = "Pitch Type") +
+       labs(x = "Horizontal Movement", y = "Vertical \nMovement", title = "Pitch Movement (inches) by Pitch Type", color = "Pitch Type", fill = "Pitch Type") +
        theme_minimal() +
        theme(panel_grid_major = element_blank(),
              panel_grid_minor = element_blank(),
@@ -547,6 +915,7 @@ def pitch_movement_scatter(data,
 '''
 Define a function to plot scatterplot of pitch release point by pitch type given dashboard filters
 '''
+@cached_figure
 def pitch_release_scatter(data,
                           pitcher_name_filter,
                           pitch_name_filter,
@@ -573,12 +942,11 @@ def pitch_release_scatter(data,
                                               run_differential_filter)
 
     # plot the pitch release position by pitch type
-    (ggplot(statcast_df_filtered) +
-       aes(x = 'release_pos_x', y = 'release_pos_z', color = 'pitch_name') +
-       geom_point() +
+    mark('build')
+    (pitch_scatter(statcast_df_filtered, 'release_pos_x', 'release_pos_z', [-5, 5], [0, 7], RELEASE_CELL_SIZE) +
        scale_x_continuous(limits = [-5, 5]) +
        scale_y_continuous(limits = [0, 7]) +
-       labs(x = "Horizontal Release Point", y = "Vertical \nRelease\nPoint", title = "Pitch Release Point (feet) by Pitch Type", color = "Pitch Type") +
+       labs(x = "Horizontal Release Point", y = "Vertical \nRelease\nPoint", title = "Pitch Release Point (feet) by Pitch Type", color = "Pitch Type", fill = "Pitch Type") +
        theme_minimal() +
        theme(panel_grid_major = element_blank(),
              panel_grid_minor = element_blank(),
@@ -590,6 +958,7 @@ def pitch_release_scatter(data,
 '''
 Define a function to plot bar plot of pitch event results given dashboard filters
 '''
+@cached_figure
 def pitch_result_bar(data,
                      pitcher_name_filter,
                      pitch_name_filter,
@@ -602,21 +971,23 @@ def pitch_result_bar(data,
                      runners_on_base_filter,
                      run_differential_filter):
     
-    # filter data
-    statcast_df_filtered = statcast_df_filter(data,
-                                              pitcher_name_filter,
-                                              pitch_name_filter,
-                                              stand_filter,
-                                              batter_name_filter, 
-                                              count_filter,
-                                              count_advantage_filter,
-                                              outs_when_up_filter,
-                                              inning_filter,
-                                              runners_on_base_filter,
-                                              run_differential_filter)
+    # count pitches by event given dashboard filters
+    events_counts = statcast_count_filter(data,
+                                          ['events'],
+                                          pitcher_name_filter,
+                                          pitch_name_filter,
+                                          stand_filter,
+                                          batter_name_filter, 
+                                          count_filter,
+                                          count_advantage_filter,
+                                          outs_when_up_filter,
+                                          inning_filter,
+                                          runners_on_base_filter,
+                                          run_differential_filter)
 
     # create a dataframe with counts and relative frequency of event
-    temp_df1 = pd.DataFrame(statcast_df_filtered.groupby(['events'])['events'].count())
+    mark('aggregate')
+    temp_df1 = pd.DataFrame(events_counts)
     temp_df1 = pd.DataFrame(temp_df1['events'] / temp_df1.groupby([True]*len(temp_df1))['events'].transform('sum')).add_suffix('_percent').reset_index()
 
     # order and create a categorical variable of event
@@ -627,6 +998,8 @@ def pitch_result_bar(data,
     temp_df1 = temp_df1.assign(events_cat = events_cat)
 
     # plot a bar chart of the relative frequency of at bat event
+    mark('build')
+    use_plotnine()
     (ggplot(temp_df1) +
       aes(x = 'events_cat', y = 'events_percent', fill = 'events') +
       geom_bar(size = 20, stat = 'identity') +
@@ -646,6 +1019,7 @@ def pitch_result_bar(data,
 '''
 Define a function to plot bar plot of batted ball type given dashboard filters
 '''
+@cached_figure
 def pitch_bb_type_bar(data,
                       pitcher_name_filter,
                       pitch_name_filter,
@@ -658,21 +1032,23 @@ def pitch_bb_type_bar(data,
                       runners_on_base_filter,
                       run_differential_filter):
     
-    # filter data
-    statcast_df_filtered = statcast_df_filter(data,
-                                              pitcher_name_filter,
-                                              pitch_name_filter,
-                                              stand_filter,
-                                              batter_name_filter, 
-                                              count_filter,
-                                              count_advantage_filter,
-                                              outs_when_up_filter,
-                                              inning_filter,
-                                              runners_on_base_filter,
-                                              run_differential_filter)
+    # count pitches by batted ball type given dashboard filters
+    batted_ball_type_counts = statcast_count_filter(data,
+                                                    ['batted_ball_type'],
+                                                    pitcher_name_filter,
+                                                    pitch_name_filter,
+                                                    stand_filter,
+                                                    batter_name_filter, 
+                                                    count_filter,
+                                                    count_advantage_filter,
+                                                    outs_when_up_filter,
+                                                    inning_filter,
+                                                    runners_on_base_filter,
+                                                    run_differential_filter)
     
     # create a dataframe with counts and relative frequency of batted ball type
-    temp_df1 = pd.DataFrame(statcast_df_filtered[statcast_df_filtered['batted_ball_type'] != "nan"].groupby(['batted_ball_type'])['batted_ball_type'].count())
+    mark('aggregate')
+    temp_df1 = pd.DataFrame(batted_ball_type_counts[batted_ball_type_counts.index != "nan"])
     temp_df1 = pd.DataFrame(temp_df1['batted_ball_type'] / temp_df1.groupby([True]*len(temp_df1))['batted_ball_type'].transform('sum')).add_suffix('_percent').reset_index()
 
     # order and create a categorical variable of batted ball type
@@ -683,6 +1059,8 @@ def pitch_bb_type_bar(data,
     temp_df1 = temp_df1.assign(batted_ball_type_cat = batted_ball_type_cat)
 
     # plot a bar chart of the relative frequency of batted ball type
+    mark('build')
+    use_plotnine()
     (ggplot(temp_df1) +
       aes(x = 'batted_ball_type_cat', y = 'batted_ball_type_percent', fill = 'batted_ball_type') +
       geom_bar(size = 20, stat = 'identity') +
@@ -700,8 +1078,10 @@ def pitch_bb_type_bar(data,
     
     
 '''
-Define a function to plot scatterplot of batted balls given dashboard filters
+Define a function to plot scatterplot of batted balls given dashboard filters, over
+the outline of the chosen park
 '''
+@cached_figure
 def pitch_bb_location(data,
                       pitcher_name_filter,
                       pitch_name_filter,
@@ -712,7 +1092,8 @@ def pitch_bb_location(data,
                       outs_when_up_filter,
                       inning_filter,
                       runners_on_base_filter,
-                      run_differential_filter):
+                      run_differential_filter,
+                      park_filter = DEFAULT_PARK):
     
     # filter data
     statcast_df_filtered = statcast_df_filter(data,
@@ -727,13 +1108,104 @@ def pitch_bb_location(data,
                                               runners_on_base_filter,
                                               run_differential_filter)
     
-    # plot a scatterplot of batted ball location
-    pyb.spraychart(statcast_df_filtered, 'dodgers', title = 'Batted Ball Spray Chart', size = 50)
+    # plot a scatterplot of batted ball location, aggregated when there are many batted balls
+    mark('build')
+    spray_chart(statcast_df_filtered, park_filter, title = 'Batted Ball Spray Chart', size = 50)
+    plt.show()
+    
+
+'''
+Define a function to summarise pitcher performance by times through order (tto) given
+dashboard filters. Means are taken from the sums and non-missing counts of each statistic,
+summed from the stat cube or out-of-core for on-disk data. The batter filter falls back
+to the filtered rows. Results are shared through the filter cache.
+'''
+@cached_filter
+def statcast_tto_summary_filter(data,
+                                pitcher_name_filter,
+                                pitch_name_filter,
+                                stand_filter,
+                                batter_name_filter, 
+                                count_filter,
+                                count_advantage_filter,
+                                outs_when_up_filter,
+                                inning_filter,
+                                runners_on_base_filter,
+                                run_differential_filter):
+    
+    # sum the statistics of the matching pitches of on-disk data batch by batch
+    if is_query_backend(data):
+        stat_sums, stat_counts, _ = data.stat_totals(['pitcher_name', 'tto'],
+                                                     ['game_pk'] + COMPARE_STATS,
+                                                     pitcher_name_filter,
+                                                     pitch_name_filter,
+                                                     stand_filter,
+                                                     batter_name_filter, 
+                                                     count_filter,
+                                                     count_advantage_filter,
+                                                     outs_when_up_filter,
+                                                     inning_filter,
+                                                     runners_on_base_filter,
+                                                     run_differential_filter)
+    
+    # the cube does not hold the batter, summarise the filtered rows instead
+    elif batter_name_filter != 'All':
+        statcast_df_filtered = statcast_df_filter(data,
+                                                  pitcher_name_filter,
+                                                  pitch_name_filter,
+                                                  stand_filter,
+                                                  batter_name_filter, 
+                                                  count_filter,
+                                                  count_advantage_filter,
+                                                  outs_when_up_filter,
+                                                  inning_filter,
+                                                  runners_on_base_filter,
+                                                  run_differential_filter)
+        
+        # group the data frame by pitcher and times through order and calculate a number of stats from each group
+        tto_summary = statcast_df_filtered.groupby(
+            ['pitcher_name', 'tto'], observed = True
+        ).agg(
+            {
+                'game_pk':'count',
+                'strike_ind': "mean",
+                'whiff_ind': "mean",
+                'woba_value':"mean",
+                'launch_speed':'mean',
+                'release_spin_rate':'mean'
+            }
+        ).reset_index()
+        
+        return tto_summary
+    
+    # build the code lookups of the filters and sum the matching cells of the stat cube
+    else:
+        filters = filter_lookups(get_filter_index(data),
+                                 pitcher_name_filter,
+                                 pitch_name_filter,
+                                 stand_filter,
+                                 batter_name_filter, 
+                                 count_filter,
+                                 count_advantage_filter,
+                                 outs_when_up_filter,
+                                 inning_filter,
+                                 runners_on_base_filter)
+        
+        stat_sums, stat_counts, _ = get_stat_cube(data).stat_totals(['pitcher_name', 'tto'],
+                                                                    filters,
+                                                                    (run_differential_filter[0], run_differential_filter[1]))
     
+    # the pitch count is the number of game ids, the statistics are means over non-missing values
+    tto_summary = (stat_sums / stat_counts)
+    tto_summary['game_pk'] = stat_counts['game_pk']
+
+    return tto_summary[['game_pk'] + COMPARE_STATS].reset_index()
+
 
 '''
 Define a function to plot pitcher performance by times through order (tto) given dashboard filters
 '''
+@cached_figure
 def pitcher_tto_line(data,
                      pitcher_name_filter,
                      pitch_name_filter,
@@ -747,8 +1219,9 @@ def pitcher_tto_line(data,
                      run_differential_filter,
                      breakdown_tto_var_filter):
     
-    # filter data
-    statcast_df_filtered = statcast_df_filter(data,
+    # summarise the pitcher's statistics by times through order
+    mark('aggregate')
+    tto_summary = statcast_tto_summary_filter(data,
                                               pitcher_name_filter,
                                               pitch_name_filter,
                                               stand_filter,
@@ -759,22 +1232,9 @@ def pitcher_tto_line(data,
                                               inning_filter,
                                               runners_on_base_filter,
                                               run_differential_filter)
-    
-    # group the data frame by pitcher and times through order and calculate a number of stats from each group
-    tto_summary = statcast_df_filtered.groupby(
-        ['pitcher_name', 'tto']
-    ).agg(
-        {
-            'game_pk':'count',
-            'strike_ind': "mean",
-            'whiff_ind': "mean",
-            'woba_value':"mean",
-            'launch_speed':'mean',
-            'release_spin_rate':'mean'
-        }
-    ).reset_index()
 
-    # reformat output
+    # reformat output, on a copy of the cached summary
+    tto_summary = tto_summary.copy()
     tto_summary['Strike %'] = round(tto_summary['strike_ind']*100, 1)
     tto_summary['Whiff %'] = round(tto_summary['whiff_ind']*100, 1)
     tto_summary['wOBA'] = tto_summary['woba_value']
@@ -782,6 +1242,8 @@ def pitcher_tto_line(data,
     tto_summary['Spin Rate'] = tto_summary['release_spin_rate']
     
     # plot the statistic summary by times through order
+    mark('build')
+    use_plotnine()
     (ggplot(tto_summary) +
       aes(x = 'tto', y = breakdown_tto_var_filter) +
       geom_point(stat = 'identity') +
@@ -798,10 +1260,82 @@ def pitcher_tto_line(data,
             figure_size = (8, 5))).draw();
     
 
+'''
+Define a function to summarise the statistics of every MLB pitcher given dashboard filters.
+The summary does not depend on the pitcher filter, so it is cached across pitchers.
+'''
+@cached_filter(ignore = ('pitcher_name_filter',))
+def statcast_pitcher_summary_filter(data,
+                                    pitcher_name_filter,
+                                    pitch_name_filter,
+                                    stand_filter,
+                                    batter_name_filter, 
+                                    count_filter,
+                                    count_advantage_filter,
+                                    outs_when_up_filter,
+                                    inning_filter,
+                                    runners_on_base_filter,
+                                    run_differential_filter):
+    
+    # sum the stats of every mlb pitcher batch by batch for on-disk data
+    if is_query_backend(data):
+        stat_sums, stat_counts, pitches = data.stat_totals(['pitcher_name'],
+                                                           COMPARE_STATS,
+                                                           pitcher_name_filter,
+                                                           pitch_name_filter,
+                                                           stand_filter,
+                                                           batter_name_filter, 
+                                                           count_filter,
+                                                           count_advantage_filter,
+                                                           outs_when_up_filter,
+                                                           inning_filter,
+                                                           runners_on_base_filter,
+                                                           run_differential_filter,
+                                                           filter_pitcher = False)
+    else:
+        
+        # filter data to all mlb pitchers
+        statcast_df_non_pitcher_filtered = statcast_df_non_pitcher_filter(data,
+                                                                          pitcher_name_filter,
+                                                                          pitch_name_filter,
+                                                                          stand_filter,
+                                                                          batter_name_filter, 
+                                                                          count_filter,
+                                                                          count_advantage_filter,
+                                                                          outs_when_up_filter,
+                                                                          inning_filter,
+                                                                          runners_on_base_filter,
+                                                                          run_differential_filter)
+        
+        # group the data frame by pitcher and keep the sums and non-missing counts of each stat
+        grouped = statcast_df_non_pitcher_filtered[COMPARE_STATS].astype(float).groupby(statcast_df_non_pitcher_filtered['pitcher_name'], observed = True)
+        stat_sums = grouped.sum()
+        stat_counts = grouped.count()
+        pitches = grouped.size()
+    
+    # calculate the mean of each stat from the sums and counts, rounded so pitchers with
+    # the same mean tie in the percentiles whatever order the sums were added in
+    statcast_pitcher_summary = (stat_sums / stat_counts).round(10)
+    statcast_pitcher_summary = pd.concat([statcast_pitcher_summary,
+                                          stat_sums.add_suffix('_sum'),
+                                          stat_counts.add_suffix('_n'),
+                                          pitches.rename('pitches')], axis = 1).reset_index()
+    
+    # calculate pitcher percentile for all statistics
+    statcast_pitcher_summary['strike_ind_pct'] = statcast_pitcher_summary.strike_ind.rank(pct = True)*100
+    statcast_pitcher_summary['whiff_ind_pct'] = statcast_pitcher_summary.whiff_ind.rank(pct = True)*100
+    statcast_pitcher_summary['woba_value_pct'] = (1 - statcast_pitcher_summary.woba_value.rank(pct = True))*100
+    statcast_pitcher_summary['launch_speed_pct'] = (1 - statcast_pitcher_summary.launch_speed.rank(pct = True))*100
+    statcast_pitcher_summary['release_spin_rate_pct'] = statcast_pitcher_summary.release_spin_rate.rank(pct = True)*100
+    
+    return statcast_pitcher_summary
+
+
 '''
 Define a function to print table of pitcher statistics vs. MLB and
 plot radar chart with MLB pitcher percentiles given dashboard filters
 '''
+@cached_figure
 def pitcher_compare(data,
                     pitcher_name_filter,
                     pitch_name_filter,
@@ -814,57 +1348,37 @@ def pitcher_compare(data,
                     runners_on_base_filter,
                     run_differential_filter):
     
-    # filter data to all mlb pitchers
-    statcast_df_non_pitcher_filtered = statcast_df_non_pitcher_filter(data,
-                                                                      pitcher_name_filter,
-                                                                      pitch_name_filter,
-                                                                      stand_filter,
-                                                                      batter_name_filter, 
-                                                                      count_filter,
-                                                                      count_advantage_filter,
-                                                                      outs_when_up_filter,
-                                                                      inning_filter,
-                                                                      runners_on_base_filter,
-                                                                      run_differential_filter)
-    
-    # group the data frame by pitcher and calculate a number of stats from each group
-    statcast_pitcher_summary = statcast_df_non_pitcher_filtered.groupby(
-        ['pitcher_name']
-    ).agg(
-        {
-            'strike_ind': "mean",
-            'whiff_ind': "mean",
-            'woba_value':"mean",
-            'launch_speed':'mean',
-            'release_spin_rate':'mean'
-        }
-    ).reset_index()
-    
-    # calculate pitcher percentile for all statistics
-    statcast_pitcher_summary['strike_ind_pct'] = statcast_pitcher_summary.strike_ind.rank(pct = True)*100
-    statcast_pitcher_summary['whiff_ind_pct'] = statcast_pitcher_summary.whiff_ind.rank(pct = True)*100
-    statcast_pitcher_summary['woba_value_pct'] = (1 - statcast_pitcher_summary.woba_value.rank(pct = True))*100
-    statcast_pitcher_summary['launch_speed_pct'] = (1 - statcast_pitcher_summary.launch_speed.rank(pct = True))*100
-    statcast_pitcher_summary['release_spin_rate_pct'] = statcast_pitcher_summary.release_spin_rate.rank(pct = True)*100
+    # get the cached summary of every mlb pitcher
+    statcast_pitcher_summary = statcast_pitcher_summary_filter(data,
+                                                               pitcher_name_filter,
+                                                               pitch_name_filter,
+                                                               stand_filter,
+                                                               batter_name_filter, 
+                                                               count_filter,
+                                                               count_advantage_filter,
+                                                               outs_when_up_filter,
+                                                               inning_filter,
+                                                               runners_on_base_filter,
+                                                               run_differential_filter)
     
     # filter to pitcher of interest
+    mark('aggregate')
     statcast_pitcher_summary_filtered = statcast_pitcher_summary[statcast_pitcher_summary['pitcher_name'] == pitcher_name_filter]
     
-    # group all other pitchers outside of pitcher of interest to same group
-    statcast_df_non_pitcher_filtered['pitcher_ind'] = np.where(statcast_df_non_pitcher_filtered['pitcher_name'] == pitcher_name_filter, pitcher_name_filter, 'Rest of MLB')
-
-    # group the data frame by pitcher category and extract a number of stats from each group
-    compare_df = statcast_df_non_pitcher_filtered.groupby(
-        ['pitcher_ind']
-    ).agg(
-        {
-            'strike_ind': "mean",
-            'whiff_ind': "mean",
-            'woba_value':"mean",
-            'launch_speed':'mean',
-            'release_spin_rate':'mean'
-        }
-    ).reset_index()
+    # get the totals of the pitcher and of all other pitchers by subtracting from the league totals
+    total_cols = [stat + '_sum' for stat in COMPARE_STATS] + [stat + '_n' for stat in COMPARE_STATS] + ['pitches']
+    pitcher_totals = statcast_pitcher_summary_filtered[total_cols].sum()
+    rest_totals = statcast_pitcher_summary[total_cols].sum() - pitcher_totals
+    
+    # calculate the stats of the pitcher and of the rest of mlb from the totals
+    compare_df = pd.DataFrame([pitcher_totals, rest_totals])
+    compare_df.insert(0, 'pitcher_ind', [pitcher_name_filter, 'Rest of MLB'])
+    for stat in COMPARE_STATS:
+        compare_df[stat] = compare_df[stat + '_sum'] / compare_df[stat + '_n']
+    
+    # keep groups with pitches in the same order as grouping by pitcher category
+    compare_df = compare_df[compare_df['pitches'] > 0].sort_values('pitcher_ind')
+    compare_df = compare_df[['pitcher_ind'] + COMPARE_STATS].reset_index(drop = True)
     
     # reformat output
     compare_df['strike_ind'] = round(compare_df['strike_ind']*100, 1).astype(str)
@@ -877,6 +1391,7 @@ def pitcher_compare(data,
     compare_df.columns = [" ", 'Strike %', 'Whiff %', 'wOBA', 'Avg. Exit Velocity', 'Avg. Spin Rate']
     
     # display statistics table
+    mark('build')
     display(compare_df)
     
     # set variables to select from summary data
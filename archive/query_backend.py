@@ -0,0 +1,512 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+import itertools
+import os
+
+# backend interface
+from abc import ABC, abstractmethod
+
+# columnar storage
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+# pitch data storage, compact schema and the stat cube stored with the pitch data
+from storage import (PARTITION_COLUMNS, open_pitch_dataset, open_summary_dataset, partition_filter, replace_summary,
+                     summary_write_path, unified_schema, write_summary_partitions)
+from schema import CATEGORY_ORDERS, INDICATOR_COLUMNS, INTEGER_TYPES, apply_pitch_schema
+from filter_index import filter_lookups
+from count_cube import CUBE_FILTER_COLUMNS
+from stat_cube import CUBE_GROUP_COLUMNS, CUBE_STAT_COLUMNS, read_stat_cube
+
+
+##### Global Options -----
+
+# rows read per batch, bounds the memory of a scan whatever the size of the data
+BATCH_ROWS = 256 * 1024
+
+# partial aggregates held before they are combined
+MAX_PARTIALS = 16
+
+# directory of the stored profile inside the pitch data, skipped when the pitch data is read
+PROFILE_DIR_NAME = '_profile'
+
+# columns whose distinct values are kept for the filter widgets
+DISTINCT_COLUMNS = ['pitcher_name', 'pitch_name', 'stand', 'batter_name', 'count', 'count_advantage',
+                    'outs_when_up', 'inning', 'runners_on_base']
+
+
+##### Define Classes -----
+
+'''
+Define a base class for the query backends the dashboard filter and aggregation
+functions run against in place of a data frame. A backend filters with the ten
+dashboard filters and groups the matching pitches without holding all of them.
+'''
+class QueryBackend(ABC):
+
+    '''
+    Define a function returning the pitches matching the dashboard filters, given in
+    dashboard order, as a data frame
+    '''
+    @abstractmethod
+    def filter_rows(self, *filters, filter_pitcher = True):
+        raise NotImplementedError
+
+    '''
+    Define a function returning the number of matching pitches by the given columns,
+    as a series named after the first column
+    '''
+    @abstractmethod
+    def count_rows(self, by, *filters):
+        raise NotImplementedError
+
+    '''
+    Define a function returning the sums and non-missing counts of the given columns
+    and the number of matching pitches, by the given columns
+    '''
+    @abstractmethod
+    def stat_totals(self, by, stats, *filters, filter_pitcher = True):
+        raise NotImplementedError
+
+
+'''
+Define a class querying pitch data stored as a columnar dataset on disk.
+
+The dashboard filters are pushed down to the scan as predicates, and the selected
+pitcher is also mapped to the pitcher id partitions so only that pitcher's files are
+opened. Aggregations read the matching pitches in batches and combine the partial
+group sums, so memory stays bounded by the batch size and the number of groups as
+seasons are added. Batches get the dtypes and categories loading the whole data with
+the pitch schema would give, so results match the in-memory path.
+
+Opening reads the profile and the stat cube stored with the pitch data at preparation
+time rather than scanning the pitches, so it does not slow down as seasons are added.
+'''
+class PitchDataset(QueryBackend):
+
+    def __init__(self, in_path, columns = None, seasons = None, pitchers = None, batch_rows = BATCH_ROWS):
+
+        self.in_path = in_path
+        self.dataset = open_pitch_dataset(in_path)
+        self.batch_rows = batch_rows
+        self.seasons = seasons
+        self.pitchers = pitchers
+        self.partitions = partition_filter(seasons, pitchers)
+
+        # the stored stat cube is read on first use
+        self.cube = None
+
+        # keep the requested columns in dataset order, skipping ones not stored
+        names = self.dataset.schema.names
+        self.columns = names if columns is None else [col for col in names if col in set(columns)]
+
+        self.profile()
+
+    def __len__(self):
+        return self.dataset.count_rows(filter = self.partitions)
+
+    '''
+    Define a function returning the distinct values of a filter column, so the filter
+    widgets can be built as from a data frame
+    '''
+    def __getitem__(self, col):
+        return pd.Series(self.distinct[col], name = col)
+
+    '''
+    Define a function to read the dtypes and categories of the data and the pitcher ids
+    of each pitcher name from the profile stored with the pitch data, or from profiles of
+    the scanned batches if none is stored. Labels stored as dictionaries keep the
+    categories of the stored dictionaries in the order reading the whole data would give.
+    A small frame holding the other distinct labels and the range and missing values of
+    every other column gets the pitch schema, which gives the dtypes the whole data would get.
+    '''
+    def profile(self):
+
+        schema_cols = [col for col in self.columns
+                       if col in CATEGORY_ORDERS or col in INTEGER_TYPES or col in INDICATOR_COLUMNS]
+        read_cols = profile_columns(self.columns)
+
+        # the stored profile holds every column the profile is read from
+        dataset = open_summary_dataset(profile_path(self.in_path)) if os.path.isdir(self.in_path) else None
+        if dataset is not None and set(read_cols) <= set(dataset.schema.names):
+            table = dataset.to_table(columns = read_cols, filter = self.partitions)
+        else:
+            scanner = self.dataset.scanner(columns = read_cols, filter = self.partitions, batch_size = self.batch_rows)
+            table = pa.concat_tables([profile_table(pa.Table.from_batches([batch]), read_cols)
+                                      for batch in scanner.to_batches() if batch.num_rows] or
+                                     [self.dataset.schema.empty_table().select(read_cols)])
+
+        df = table.to_pandas()
+
+        values = dict()
+        categories = dict()
+        for col in read_cols:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                categories[col] = df[col].cat.categories
+                values[col] = df[col].dropna().astype(object).drop_duplicates()
+            elif col in CATEGORY_ORDERS or col in DISTINCT_COLUMNS:
+                values[col] = df[col].drop_duplicates()
+            else:
+                values[col] = pd.concat([df[col].agg(['min', 'max']), pd.Series([np.nan] if df[col].isna().any() else [])],
+                                        ignore_index = True).drop_duplicates()
+
+        # pad every column to the same length with one of its own values
+        length = max([len(v) for v in values.values()] + [1])
+        proto = pd.DataFrame({col: pd.concat([v, v.iloc[:1].repeat(length - len(v))], ignore_index = True) if len(v) else
+                              pd.Series([np.nan] * length) for col, v in values.items()})
+        proto = apply_pitch_schema(proto.astype({col: object for col in categories}))
+
+        self.dtypes = {col: pd.CategoricalDtype(list(categories[col])) if col in categories else proto[col].dtype
+                       for col in schema_cols}
+        self.distinct = {col: values[col].dropna().to_numpy() if col in CATEGORY_ORDERS else values[col].dropna().sort_values().to_numpy()
+                         for col in DISTINCT_COLUMNS if col in values}
+
+        # pitcher ids of each pitcher name, as integers whatever type the partition keys come back as
+        if 'pitcher' in df.columns and 'pitcher_name' in df.columns:
+            pitchers = df[['pitcher_name', 'pitcher']].astype({'pitcher_name': object, 'pitcher': np.int64}).drop_duplicates()
+            self.pitcher_ids = pitchers.dropna().groupby('pitcher_name')['pitcher'].agg(list).to_dict()
+        else:
+            self.pitcher_ids = dict()
+
+    '''
+    Define a function to give a batch the dtypes and categories of the whole data
+    '''
+    def conform(self, df):
+
+        columns = dict()
+        for col, dtype in self.dtypes.items():
+            if col not in df.columns:
+                continue
+            if isinstance(dtype, pd.CategoricalDtype):
+                series = df[col]
+
+                # labels stored as text hold the string 'nan' for missing values, as in the schema
+                if not isinstance(series.dtype, pd.CategoricalDtype):
+                    series = series.astype(object)
+                    series = series.mask(series == 'nan')
+
+                columns[col] = pd.Categorical(series, dtype = dtype)
+            else:
+                columns[col] = df[col].astype(dtype)
+
+        return df.assign(**columns)
+
+    '''
+    Define a function returning an empty group index of the given columns
+    '''
+    def empty_index(self, by):
+
+        index = pd.MultiIndex.from_arrays([pd.Series([], dtype = self.dtypes.get(col, np.float64)) for col in by], names = by)
+
+        return index.get_level_values(0) if len(by) == 1 else index
+
+    '''
+    Define a function to scan the columns of the pitches matching a filter expression,
+    yielding one data frame per batch
+    '''
+    def batches(self, columns, expression, conform = True):
+
+        scanner = self.dataset.scanner(columns = columns, filter = expression, batch_size = self.batch_rows)
+
+        for batch in scanner.to_batches():
+            if batch.num_rows == 0:
+                continue
+
+            df = batch.to_pandas()
+
+            # partition keys may come back as dictionary columns, restore their integer type
+            for col in PARTITION_COLUMNS:
+                if col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype):
+                    df[col] = df[col].astype(np.int64)
+
+            yield self.conform(df) if conform else df
+
+    '''
+    Define a function to build the filter expression of a column allowed to take the
+    given values, matching missing values when the values hold one
+    '''
+    def isin_expression(self, col, values):
+
+        values = list(values)
+        present = [v for v in values if not pd.isna(v)]
+        field_type = self.dataset.schema.field(col).type
+        if pa.types.is_dictionary(field_type):
+            field_type = field_type.value_type
+
+        expression = ds.field(col).isin(pa.array(present).cast(field_type)) if present else ds.scalar(False)
+        if len(present) < len(values):
+            expression = expression | ds.field(col).is_null()
+
+        return expression
+
+    '''
+    Define a function to build the predicate of the dashboard filters pushed down to the scan
+    '''
+    def filter_expression(self,
+                          pitcher_name_filter,
+                          pitch_name_filter,
+                          stand_filter,
+                          batter_name_filter,
+                          count_filter,
+                          count_advantage_filter,
+                          outs_when_up_filter,
+                          inning_filter,
+                          runners_on_base_filter,
+                          run_differential_filter,
+                          filter_pitcher = True):
+
+        expressions = [] if self.partitions is None else [self.partitions]
+
+        # the pitcher is also matched on its id partitions so other pitchers' files are skipped
+        if filter_pitcher:
+            expressions.append(ds.field('pitcher_name') == pitcher_name_filter)
+            if 'pitcher' in self.columns:
+                expressions.append(self.isin_expression('pitcher', self.pitcher_ids.get(pitcher_name_filter, [])))
+
+        if batter_name_filter != 'All':
+            expressions.append(ds.field('batter_name') == batter_name_filter)
+
+        for col, values in [('pitch_name', pitch_name_filter),
+                            ('stand', stand_filter),
+                            ('count', count_filter),
+                            ('count_advantage', count_advantage_filter),
+                            ('outs_when_up', outs_when_up_filter),
+                            ('inning', inning_filter),
+                            ('runners_on_base', runners_on_base_filter)]:
+            expressions.append(self.isin_expression(col, values))
+
+        expressions.append((ds.field('run_differential') >= run_differential_filter[0]) &
+                           (ds.field('run_differential') <= run_differential_filter[1]))
+
+        expression = expressions[0]
+        for condition in expressions[1:]:
+            expression = expression & condition
+
+        return expression
+
+    '''
+    Define a function returning the pitches matching the dashboard filters, given in
+    dashboard order, as a data frame
+    '''
+    def filter_rows(self, *filters, filter_pitcher = True):
+
+        frames = list(self.batches(self.columns, self.filter_expression(*filters, filter_pitcher = filter_pitcher)))
+
+        if not frames:
+            return self.conform(self.dataset.schema.empty_table().select(self.columns).to_pandas())
+
+        return pd.concat(frames, ignore_index = True)
+
+    '''
+    Define a function returning the number of matching pitches by the given columns,
+    as a series named after the first column. Pitches missing a column are left out.
+    '''
+    def count_rows(self, by, *filters):
+
+        partials = []
+        for df in self.batches(list(by), self.filter_expression(*filters)):
+            partials.append(df.groupby(list(by), observed = True).size())
+            if len(partials) > MAX_PARTIALS:
+                partials = [combine(partials)]
+
+        counts = combine(partials) if partials else pd.Series([], index = self.empty_index(by), dtype = np.int64)
+
+        return counts[counts > 0].rename(by[0])
+
+    '''
+    Define a function returning the stat cube stored with the pitch data for the seasons
+    and pitchers of the backend, read on first use, or None if none is stored
+    '''
+    def stat_cube(self):
+
+        if self.cube is None and os.path.isdir(self.in_path):
+            self.cube = read_stat_cube(self.in_path, self.seasons, self.pitchers)
+
+        return self.cube
+
+    '''
+    Define a function returning the totals of stat_totals summed from the stored stat
+    cube, or None if the cube does not hold the batter filter, the grouping columns or
+    the statistics. Groups get the dtypes of the scanned batches and the order of groupby.
+    '''
+    def cube_totals(self,
+                    by,
+                    stats,
+                    pitcher_name_filter,
+                    pitch_name_filter,
+                    stand_filter,
+                    batter_name_filter,
+                    count_filter,
+                    count_advantage_filter,
+                    outs_when_up_filter,
+                    inning_filter,
+                    runners_on_base_filter,
+                    run_differential_filter,
+                    filter_pitcher = True):
+
+        if (batter_name_filter != 'All' or not set(by) <= set(CUBE_FILTER_COLUMNS + CUBE_GROUP_COLUMNS) or
+                not set(stats) <= set(CUBE_STAT_COLUMNS) or self.stat_cube() is None):
+            return None
+
+        filters = filter_lookups(self.cube,
+                                 pitcher_name_filter,
+                                 pitch_name_filter,
+                                 stand_filter,
+                                 batter_name_filter,
+                                 count_filter,
+                                 count_advantage_filter,
+                                 outs_when_up_filter,
+                                 inning_filter,
+                                 runners_on_base_filter,
+                                 filter_pitcher = filter_pitcher)
+
+        sums, counts, pitches = self.cube.stat_totals(list(by), filters, (run_differential_filter[0], run_differential_filter[1]))
+
+        keys = self.conform(sums.index.to_frame(index = False))
+        index = pd.Index(keys[by[0]]) if len(by) == 1 else pd.MultiIndex.from_frame(keys)
+
+        return (sums[stats].set_axis(index, axis = 0).sort_index(),
+                counts[stats].set_axis(index, axis = 0).sort_index(),
+                pitches.set_axis(index, axis = 0).sort_index())
+
+    '''
+    Define a function returning the sums and non-missing counts of the given columns
+    and the number of matching pitches, by the given columns. Means taken as sums over
+    counts skip missing values as the pandas mean does. Without a batter filter the
+    totals are summed from the stored stat cube when it holds the columns.
+    '''
+    def stat_totals(self, by, stats, *filters, filter_pitcher = True):
+
+        totals = self.cube_totals(by, stats, *filters, filter_pitcher = filter_pitcher)
+        if totals is not None:
+            return totals
+
+        partials = []
+        expression = self.filter_expression(*filters, filter_pitcher = filter_pitcher)
+
+        for df in self.batches(list(dict.fromkeys(list(by) + list(stats))), expression):
+            grouped = df[stats].astype(float).groupby([df[col] for col in by], observed = True)
+            partials.append(pd.concat([grouped.sum().add_suffix('_sum'),
+                                       grouped.count().add_suffix('_n'),
+                                       grouped.size().rename('pitches')], axis = 1))
+            if len(partials) > MAX_PARTIALS:
+                partials = [combine(partials)]
+
+        if partials:
+            totals = combine(partials)
+        else:
+            totals = pd.DataFrame(0, index = self.empty_index(by), columns = [stat + '_sum' for stat in stats] +
+                                  [stat + '_n' for stat in stats] + ['pitches'])
+
+        sums = totals[[stat + '_sum' for stat in stats]].set_axis(stats, axis = 1)
+        counts = totals[[stat + '_n' for stat in stats]].set_axis(stats, axis = 1).astype(np.int64)
+
+        return sums, counts, totals['pitches'].astype(np.int64)
+
+
+##### Define Functions -----
+
+'''
+Define a function to combine partial group totals computed on separate batches
+'''
+def combine(partials):
+
+    combined = pd.concat(partials)
+
+    return combined.groupby(level = list(range(combined.index.nlevels)), observed = True).sum()
+
+
+'''
+Define a function returning the columns a profile is read from: the columns the pitch
+schema converts, the filter columns and the pitcher ids
+'''
+def profile_columns(columns):
+
+    schema_cols = [col for col in columns if col in CATEGORY_ORDERS or col in INTEGER_TYPES or col in INDICATOR_COLUMNS]
+
+    return list(dict.fromkeys(schema_cols + [col for col in DISTINCT_COLUMNS + ['pitcher'] if col in columns]))
+
+
+'''
+Define a function to profile the pitches of a table: the distinct values of the label
+and filter columns, the range and a missing value of the other columns, and the distinct
+pairs of pitcher names and ids. Columns are padded to the same length with one of their
+own values and labels keep the dictionaries they are stored with.
+'''
+def profile_table(table, columns):
+
+    # widen the dictionary indexes so the dictionaries of every chunk can be combined
+    table = table.select(columns)
+    table = table.cast(unified_schema(table.schema)).unify_dictionaries().combine_chunks()
+    arrays = dict()
+
+    # pitcher names are kept next to each of their ids
+    if 'pitcher' in columns and 'pitcher_name' in columns:
+        positions = table.select(['pitcher_name', 'pitcher']).to_pandas().drop_duplicates().index.to_numpy()
+        arrays['pitcher_name'] = table['pitcher_name'].take(positions)
+        arrays['pitcher'] = table['pitcher'].take(positions)
+
+    for col in columns:
+        if col in arrays:
+            continue
+
+        column = table[col]
+        if col in CATEGORY_ORDERS or col in DISTINCT_COLUMNS:
+            arrays[col] = pc.unique(column)
+        else:
+            min_max = pc.min_max(column)
+            values = [min_max['min'].as_py(), min_max['max'].as_py()] + ([None] if column.null_count else [])
+            arrays[col] = pa.array(values, type = column.type)
+
+    # pad every column to the same length with its first value
+    length = max(len(values) for values in arrays.values())
+    positions = np.arange(length)
+
+    return pa.table({col: arrays[col].take(pa.array(np.where(positions < len(arrays[col]), positions, 0))) for col in columns})
+
+
+'''
+Define a function to get the directory of the stored profile of pitch data
+'''
+def profile_path(pitch_path):
+    return os.path.join(pitch_path, PROFILE_DIR_NAME)
+
+
+'''
+Define a function to store the profile of every season and pitcher of the stored pitch
+data, partitioned as the pitch data, so opening the data on disk does not scan it. Each
+partition is profiled from its files in order, so the stored dictionaries read back in
+the order reading the whole data gives. Seasons and pitchers are updated or rebuilt as
+the stored transitions are.
+'''
+def write_profile(pitch_path, seasons = None, pitchers = None):
+
+    dataset = open_pitch_dataset(pitch_path)
+    out_path = summary_write_path(profile_path(pitch_path), pitchers is None)
+    columns = profile_columns(dataset.schema.names)
+
+    # labels are stored with wide dictionary indexes so every partition shares one schema
+    schema = unified_schema(pa.schema([dataset.schema.field(col) for col in columns]))
+
+    # the batches of a partition come one after another from the files in its directory
+    scanner = dataset.scanner(columns = columns, filter = partition_filter(seasons, pitchers))
+    for _, partition in itertools.groupby(scanner.scan_batches(), key = lambda tagged: os.path.dirname(tagged.fragment.path)):
+        table = pa.Table.from_batches([tagged.record_batch for tagged in partition])
+        if table.num_rows:
+            write_summary_partitions(profile_table(table, columns).cast(schema), out_path)
+
+    # swap in the rebuilt profile, of every season or of the rebuilt seasons only
+    if pitchers is None:
+        replace_summary(out_path, profile_path(pitch_path), seasons)
+
+
+'''
+Define a function to check if the dashboard functions were given a query backend
+rather than a data frame
+'''
+def is_query_backend(data):
+    return isinstance(data, QueryBackend)
@@ -0,0 +1,121 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+
+
+##### Global Options -----
+
+# category orders of the dashboard labels, unseen values are appended at the end
+CATEGORY_ORDERS = {
+    'pitch_name': ['4-Seam Fastball', 'Sinker', 'Cutter', 'Slider', 'Curveball',
+                   'Knuckle Curve', 'Changeup', 'Split-Finger'],
+    'stand': ['L', 'R'],
+    'count': ['0-0', '0-1', '0-2', '1-0', '1-1', '1-2', '2-0', '2-1', '2-2', '3-0', '3-1', '3-2'],
+    'lead_count': ['0-0', '0-1', '0-2', '1-0', '1-1', '1-2', '2-0', '2-1', '2-2', '3-0', '3-1', '3-2'],
+    'count_advantage': ['Ahead (<2 strikes)', 'Ahead (2 strikes)', 'Even', 'Behind'],
+    'runners_on_base': ['Empty', '1B', '2B', '3B', '1B & 2B', '1B & 3B', '2B & 3B', 'Bases Loaded'],
+    'batted_ball_type': ['Weak', 'Topped', 'Under', 'Flare/Burner', 'Solid Contact', 'Barrel'],
+    'pitcher_name': [],
+    'batter_name': [],
+    'events': [],
+}
+
+# bounded integer columns and the smallest type holding them
+INTEGER_TYPES = {
+    'inning': np.int8,
+    'outs_when_up': np.int8,
+    'balls': np.int8,
+    'strikes': np.int8,
+    'tto': np.int8,
+    'pitch_number': np.int8,
+    'run_differential': np.int8,
+    'at_bat_number': np.int16,
+    'game_year': np.int16,
+}
+
+# indicator columns, whiff_ind is missing for pitches without a swing
+INDICATOR_COLUMNS = ['strike_ind', 'whiff_ind']
+
+# measurement columns stored in single precision
+FLOAT_COLUMNS = ['plate_x', 'plate_z', 'plate_z_norm', 'pfx_x', 'pfx_z',
+                 'release_pos_x', 'release_pos_y', 'release_pos_z',
+                 'launch_speed', 'launch_angle', 'release_speed', 'release_spin_rate',
+                 'hc_x', 'hc_y']
+
+
+##### Define Functions -----
+
+'''
+Define a function to get the memory used by a data frame in megabytes
+'''
+def memory_usage_mb(df):
+    return df.memory_usage(index = True, deep = True).sum() / 1024**2
+
+
+'''
+Define a function to convert a label column to a categorical with a fixed category order
+'''
+def to_category(series, categories):
+
+    # labels built with np.where hold the string 'nan' for missing values
+    if series.dtype == object:
+        series = series.mask(series == 'nan')
+
+    observed = pd.Series(series.dropna().unique()).astype(str)
+    extra = sorted(set(observed) - set(categories))
+
+    return pd.Categorical(series, categories = list(categories) + extra)
+
+
+'''
+Define a function to convert an integer valued column to a compact type.
+Columns with missing values keep single precision floats.
+'''
+def to_integer(series, dtype):
+
+    if series.isna().any():
+        return series.astype(np.float32)
+
+    info = np.iinfo(dtype)
+    if series.min() < info.min or series.max() > info.max:
+        return series.astype(np.int32)
+
+    return series.astype(dtype)
+
+
+'''
+Define a function to apply the compact pitch data schema to a data frame.
+Columns not in the schema are left as they are.
+'''
+def apply_pitch_schema(df, report = False):
+
+    if report:
+        memory_before = memory_usage_mb(df)
+
+    columns = dict()
+
+    for col, categories in CATEGORY_ORDERS.items():
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            columns[col] = to_category(df[col], categories)
+
+    for col, dtype in INTEGER_TYPES.items():
+        if col in df.columns:
+            columns[col] = to_integer(df[col], dtype)
+
+    for col in INDICATOR_COLUMNS:
+        if col in df.columns:
+            columns[col] = df[col].astype(bool) if df[col].notna().all() else df[col].astype(np.float32)
+
+    for col in FLOAT_COLUMNS:
+        if col in df.columns:
+            columns[col] = df[col].astype(np.float32)
+
+    df = df.assign(**columns)
+
+    if report:
+        memory_after = memory_usage_mb(df)
+        print(f"memory before: {memory_before:.1f} MB, after: {memory_after:.1f} MB ({memory_before / memory_after:.1f}x smaller)")
+
+    return df
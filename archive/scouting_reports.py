@@ -0,0 +1,340 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+import argparse
+import base64
+import hashlib
+import html
+import io
+import json
+import os
+import re
+import sys
+
+# worker processes
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# plotting, drawn off screen
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+
+# display outputs are recorded through an ipython shell as in the notebook
+from IPython.core.interactiveshell import InteractiveShell
+
+# dashboard panels and rendered outputs
+import plotting
+from plotting import COMPARE_STATS, DASHBOARD_COLUMNS, load_data, statcast_pitcher_summary_filter
+from figure_cache import render_panel
+from schema import CATEGORY_ORDERS
+
+
+##### Global Options -----
+
+# sections of the report: title, panel and the panel's extra arguments
+REPORT_PANELS = [('Number of Pitches', 'number_of_pitches', {}),
+                 ('Pitch Selection', 'pitch_selection_bar', {}),
+                 ('Pitch Count Flow', 'pitch_count_sankey', {}),
+                 ('Pitch Selection by Count', 'pitch_count_stacked_bar', {}),
+                 ('Pitch Selection by Count Advantage', 'pitch_count_advantage_stacked_bar', {}),
+                 ('Pitch Location', 'plot_pitch_location', {'breakdown_var_filter': 'pitch_name'}),
+                 ('Pitch Movement', 'pitch_movement_scatter', {}),
+                 ('Pitch Release Point', 'pitch_release_scatter', {}),
+                 ('At-bat Results Type', 'pitch_result_bar', {}),
+                 ('Batted Ball Type', 'pitch_bb_type_bar', {}),
+                 ('Batted Ball Location', 'pitch_bb_location', {}),
+                 ('MLB Comparison', 'pitcher_compare', {}),
+                 ('Times Through Lineup', 'pitcher_tto_line', {'breakdown_tto_var_filter': 'Strike %'})]
+
+# record of the inputs of the reports written by earlier runs
+MANIFEST_NAME = "manifest.json"
+
+# pitch data shared with the forked workers
+REPORT_DATA = None
+
+
+##### Define Functions -----
+
+'''
+Define a function to get the dashboard filters with every option selected, the
+defaults of the scouting report notebook
+'''
+def default_filters(data):
+
+    return {'pitch_name_filter': sorted(data['pitch_name'].dropna().unique()),
+            'stand_filter': sorted(data['stand'].dropna().unique()),
+            'batter_name_filter': 'All',
+            'count_filter': sorted(data['count'].dropna().unique()),
+            'count_advantage_filter': sorted(data['count_advantage'].dropna().unique()),
+            'outs_when_up_filter': sorted(data['outs_when_up'].dropna().unique()),
+            'inning_filter': sorted(data['inning'].dropna().unique()),
+            'runners_on_base_filter': CATEGORY_ORDERS['runners_on_base'],
+            'run_differential_filter': (-20, 20)}
+
+
+'''
+Define a function to get the report file name of a pitcher
+'''
+def report_name(pitcher_name):
+    return re.sub(r'[^a-z0-9]+', '_', pitcher_name.lower()).strip('_')
+
+
+'''
+Define a function to hash the report code, so reports are redrawn when a panel changes
+'''
+def code_fingerprint():
+
+    code_dir = os.path.dirname(os.path.abspath(plotting.__file__))
+    digest = hashlib.sha1()
+
+    for file in sorted(os.listdir(code_dir)):
+        if file.endswith('.py'):
+            with open(os.path.join(code_dir, file), 'rb') as f:
+                digest.update(f.read())
+
+    return digest.hexdigest()
+
+
+'''
+Define a function to fingerprint the inputs of each pitcher's report: the pitcher's
+pitches, the pitcher's league percentiles and the rest of MLB averages as shown in
+the comparison table, and the report code
+'''
+def report_fingerprints(data, pitchers, filters):
+
+    row_hashes = pd.util.hash_pandas_object(data, index = False).to_numpy()
+    pitcher_rows = data.groupby('pitcher_name', observed = True).indices
+
+    # league statistics, compared at the precision they are shown
+    summary = statcast_pitcher_summary_filter(data, pitchers[0], **filters).set_index('pitcher_name')
+    totals = summary[[stat + '_sum' for stat in COMPARE_STATS] + [stat + '_n' for stat in COMPARE_STATS]].sum()
+    percentiles = summary[[stat + '_pct' for stat in COMPARE_STATS]].round(1)
+
+    code = code_fingerprint()
+
+    fingerprints = dict()
+    for pitcher in pitchers:
+
+        # rows in any order hash the same
+        digest = hashlib.sha1(np.sort(row_hashes[pitcher_rows[pitcher]]).tobytes())
+
+        pitcher_totals = summary.loc[pitcher, totals.index]
+        rest = [(totals[stat + '_sum'] - pitcher_totals[stat + '_sum']) / max(totals[stat + '_n'] - pitcher_totals[stat + '_n'], 1)
+                for stat in COMPARE_STATS]
+
+        digest.update(json.dumps([percentiles.loc[pitcher].tolist(), np.round(rest, 3).tolist(), code]).encode('utf-8'))
+        fingerprints[pitcher] = digest.hexdigest()
+
+    return fingerprints
+
+
+'''
+Define a function to draw every panel of a pitcher's report, returning the recorded
+outputs of each section
+'''
+def render_report(data, pitcher, filters):
+
+    sections = []
+    for title, name, extra in REPORT_PANELS:
+        func = getattr(plotting, name)
+
+        # draw the panel directly, the report is drawn once
+        _, outputs = render_panel(getattr(func, '__wrapped__', func), data, pitcher_name_filter = pitcher, **filters, **extra)
+        sections.append((title, outputs))
+        plt.close('all')
+
+    return sections
+
+
+'''
+Define a function to convert recorded outputs to html
+'''
+def outputs_html(outputs):
+
+    parts = []
+    for kind, value in outputs:
+
+        if kind != 'display':
+            parts.append("<pre>{}</pre>".format(html.escape(value)))
+            continue
+
+        data = value[0]
+        if 'image/png' in data:
+            image = data['image/png']
+            image = image if isinstance(image, str) else base64.b64encode(image).decode('ascii')
+            parts.append('<img src="data:image/png;base64,{}">'.format(image))
+        elif 'text/html' in data:
+            parts.append(data['text/html'])
+        elif 'text/markdown' in data:
+            # the panels only use bold markdown around html
+            parts.append(re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', data['text/markdown']))
+        elif 'text/plain' in data:
+            parts.append("<pre>{}</pre>".format(html.escape(data['text/plain'])))
+
+    return "\n".join(parts)
+
+
+'''
+Define a function to write a report as a static html page
+'''
+def write_html(path, pitcher, sections):
+
+    body = ["<h1>{} Scouting Report</h1>".format(html.escape(pitcher))]
+    for title, outputs in sections:
+        body.append("<h2>{}</h2>\n{}".format(html.escape(title), outputs_html(outputs)))
+
+    page = ("<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n<title>{} Scouting Report</title>\n"
+            "<style>body {{font-family: sans-serif; margin: 2em;}} img {{max-width: 100%;}}</style>\n"
+            "</head>\n<body>\n{}\n</body>\n</html>\n").format(html.escape(pitcher), "\n".join(body))
+
+    with open(path + ".tmp", "w", encoding = "utf-8") as f:
+        f.write(page)
+    os.replace(path + ".tmp", path)
+
+
+'''
+Define a function to write a report as a pdf with a page for each image or table
+'''
+def write_pdf(path, pitcher, sections):
+
+    with PdfPages(path + ".tmp") as pdf:
+        for title, outputs in sections:
+            for kind, value in outputs:
+                fig = plt.figure(figsize = (8.5, 11))
+                fig.suptitle("{}: {}".format(pitcher, title))
+
+                if kind == 'display' and 'image/png' in value[0]:
+                    image = value[0]['image/png']
+                    image = base64.b64decode(image) if isinstance(image, str) else image
+                    ax = fig.add_axes([0.05, 0.05, 0.9, 0.85])
+                    ax.imshow(plt.imread(io.BytesIO(image), format = 'png'))
+                    ax.axis('off')
+                else:
+                    text = value if kind != 'display' else value[0].get('text/plain', '')
+                    fig.text(0.05, 0.9, re.sub(r'<[^>]+>|\*\*', '', text), family = 'monospace', va = 'top')
+
+                pdf.savefig(fig)
+                plt.close(fig)
+
+    os.replace(path + ".tmp", path)
+
+
+'''
+Define a function to draw and write the report of a pitcher, using the shared pitch data.
+Returns the pitcher and the paths written.
+'''
+def write_report(pitcher, out_dir, formats, filters):
+
+    sections = render_report(REPORT_DATA, pitcher, filters)
+    base = os.path.join(out_dir, report_name(pitcher))
+
+    paths = []
+    if 'html' in formats:
+        write_html(base + ".html", pitcher, sections)
+        paths.append(base + ".html")
+    if 'pdf' in formats:
+        write_pdf(base + ".pdf", pitcher, sections)
+        paths.append(base + ".pdf")
+
+    return pitcher, paths
+
+
+'''
+Define a function to write the scouting report of every pitcher, or of the given pitchers.
+
+The pitch data is loaded once and the reports are drawn in worker processes forked from
+this process, sharing the data copy-on-write. Reports whose inputs match the manifest of
+the last run are skipped. Returns the pitchers without a report, unknown or failed.
+'''
+def write_reports(in_path, out_dir, pitchers = None, formats = ('html',), workers = None,
+                  force = False, verbose = True):
+
+    global REPORT_DATA
+
+    # panels display their outputs through a shell so rich outputs are recorded
+    InteractiveShell.instance()
+
+    REPORT_DATA = load_data(in_path, "pitch_data", columns = DASHBOARD_COLUMNS)
+    filters = default_filters(REPORT_DATA)
+
+    all_pitchers = sorted(REPORT_DATA['pitcher_name'].dropna().unique())
+    unknown = [] if pitchers is None else [p for p in pitchers if p not in set(all_pitchers)]
+    pitchers = all_pitchers if pitchers is None else [p for p in pitchers if p in set(all_pitchers)]
+
+    # names not in the pitch data have no report and count as failed
+    if unknown:
+        print("Unknown pitchers: {}".format(", ".join(unknown)))
+
+    os.makedirs(out_dir, exist_ok = True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    manifest = dict()
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    # skip reports drawn from the same inputs
+    fingerprints = report_fingerprints(REPORT_DATA, pitchers, filters) if pitchers else dict()
+    todo = [p for p in pitchers if force or manifest.get(p, {}).get('fingerprint') != fingerprints[p]
+            or not all(os.path.exists(path) for path in manifest[p]['paths'])
+            or set(formats) - set(os.path.splitext(path)[1][1:] for path in manifest[p]['paths'])]
+
+    if verbose:
+        print("Writing {} reports, {} unchanged".format(len(todo), len(pitchers) - len(todo)))
+
+    # workers are forked after the data is loaded, so each one shares it
+    if workers is None:
+        workers = os.cpu_count()
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        workers = 0
+
+    def record(pitcher, paths):
+        manifest[pitcher] = {'fingerprint': fingerprints[pitcher], 'paths': paths}
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent = 1, sort_keys = True)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    failed = []
+    if workers > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(workers, mp_context = multiprocessing.get_context('fork')) as executor:
+            futures = {executor.submit(write_report, p, out_dir, formats, filters): p for p in todo}
+            for future in as_completed(futures):
+                try:
+                    record(*future.result())
+                except Exception as e:
+                    print("Report failed for {} ({})".format(futures[future], e))
+                    failed.append(futures[future])
+    else:
+        for p in todo:
+            try:
+                record(*write_report(p, out_dir, formats, filters))
+            except Exception as e:
+                print("Report failed for {} ({})".format(p, e))
+                failed.append(p)
+
+    if verbose:
+        print("Wrote {} reports to {}".format(len(todo) - len(failed), out_dir))
+
+    return unknown + failed
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description = "Write a static scouting report for every starting pitcher.")
+    parser.add_argument("in_path", help = "prepped pitch data, a parquet dataset or csv")
+    parser.add_argument("out_dir", help = "directory of the reports")
+    parser.add_argument("--pitchers", nargs = "+", default = None, help = "pitcher names, every pitcher by default")
+    parser.add_argument("--format", nargs = "+", choices = ['html', 'pdf'], default = ['html'], dest = "formats")
+    parser.add_argument("--workers", type = int, default = None, help = "worker processes, one per core by default")
+    parser.add_argument("--force", action = "store_true", help = "redraw unchanged reports")
+    args = parser.parse_args()
+
+    # the ipython shell replaces __main__, so the workers get their functions from the module
+    import scouting_reports
+    failed = scouting_reports.write_reports(args.in_path, args.out_dir, pitchers = args.pitchers, formats = args.formats,
+                                            workers = args.workers, force = args.force)
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,173 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+import threading
+
+# plotting, imported on the first chart drawn
+from lazy_imports import lazy_import, timed_import
+plt = lazy_import('matplotlib.pyplot')
+mcollections = lazy_import('matplotlib.collections')
+mpatches = lazy_import('matplotlib.patches')
+
+
+##### Global Options -----
+
+# park drawn when none is given, and the plotted window in hit coordinates
+DEFAULT_PARK = 'dodgers'
+FIELD_X_LIMITS = (0, 250)
+FIELD_Y_LIMITS = (-250, 0)
+
+# batted balls above which the chart aggregates into hexagons instead of drawing points
+SPRAY_MAX_POINTS = 2000
+
+# hexagons across the field when aggregating
+HEXBIN_GRIDSIZE = 30
+
+# home plate in hit coordinates and feet per hit coordinate unit
+HOME_PLATE = (125.42, 198.27)
+FEET_PER_UNIT = 2.5
+
+# spray angle edges (degrees, pull side of a right handed hitter negative) and distance
+# edges (feet) of the field zones
+ZONE_ANGLES = [-45, -27, -9, 9, 27, 45]
+ZONE_DISTANCES = [0, 150, 250, 450]
+
+# outline vertices of each segment of every park, loaded on the first chart drawn
+_stadiums = dict()
+_stadiums_lock = threading.Lock()
+
+
+##### Define Functions -----
+
+'''
+Define a function returning the outline of a park as a list of vertex arrays, one per
+segment. Every park is read from pybaseball's stadium coordinates on the first call
+and kept for the rest of the process, so changing park does not read anything.
+'''
+def stadium_segments(park = DEFAULT_PARK):
+
+    if not _stadiums:
+        with _stadiums_lock:
+            if not _stadiums:
+                coords = timed_import('pybaseball.plotting').STADIUM_COORDS
+                for (team, _), verts in coords.groupby(['team', 'segment'], sort = False)[['x', 'y']]:
+                    _stadiums.setdefault(team, []).append(verts.to_numpy(dtype = float))
+
+    park = park.lower()
+    if park not in _stadiums:
+        raise ValueError("unknown park '{}', choose one of {}".format(park, sorted(_stadiums)))
+
+    return _stadiums[park]
+
+
+'''
+Define a function returning the parks a spray chart can be drawn on
+'''
+def stadium_names():
+
+    stadium_segments()
+
+    return sorted(_stadiums)
+
+
+'''
+Define a function to convert the hit coordinates of the batted balls to field
+coordinates, home plate at the bottom, as the stadium outlines are drawn. Pitches
+without an event or a hit location are left out.
+'''
+def field_coordinates(df):
+
+    hit = (df['events'].notna() & df['hc_x'].notna() & df['hc_y'].notna()).to_numpy()
+
+    x = df['hc_x'].to_numpy(dtype = float)[hit]
+    y = -df['hc_y'].to_numpy(dtype = float)[hit]
+
+    return x, y, hit
+
+
+'''
+Define a function to assign each batted ball to a field zone by spray angle and
+distance from home plate. Returns the zone of each ball, -1 outside every zone.
+'''
+def field_zones(x, y):
+
+    dx = (x - HOME_PLATE[0]) * FEET_PER_UNIT
+    dy = (y + HOME_PLATE[1]) * FEET_PER_UNIT
+
+    angle = np.degrees(np.arctan2(dx, dy))
+    distance = np.hypot(dx, dy)
+
+    ia = np.searchsorted(ZONE_ANGLES, angle, side = 'right') - 1
+    ir = np.searchsorted(ZONE_DISTANCES, distance, side = 'right') - 1
+
+    valid = (ia >= 0) & (ia < len(ZONE_ANGLES) - 1) & (ir >= 0) & (ir < len(ZONE_DISTANCES) - 1)
+
+    return np.where(valid, ir * (len(ZONE_ANGLES) - 1) + ia, -1)
+
+
+'''
+Define a function to draw a spray chart of batted balls over a park outline.
+
+Up to max_points batted balls are drawn as points colored by outcome, as pybaseball's
+spraychart draws them. Above it, or when chosen with mode, the balls are aggregated
+into hexagons ('hexbin') or into field zones by spray angle and distance ('zones').
+'''
+def spray_chart(df, park = DEFAULT_PARK, title = '', size = 100, mode = 'auto',
+                max_points = SPRAY_MAX_POINTS, width = 500, height = 500):
+
+    x, y, hit = field_coordinates(df)
+    if mode == 'auto':
+        mode = 'points' if len(x) <= max_points else 'hexbin'
+
+    # park outline, every segment in one collection
+    fig = plt.figure()
+    fig.set_size_inches((width - 50) / fig.dpi, height / fig.dpi)
+    ax = fig.add_axes([0.0, 0.0, 1.0, 1.0], frameon = False, aspect = 1)
+    ax.set_xlim(*FIELD_X_LIMITS)
+    ax.set_ylim(*FIELD_Y_LIMITS)
+    ax.set_xticks([])
+    ax.set_yticks([])
+    ax.add_collection(mcollections.LineCollection(stadium_segments(park), colors = 'grey', linewidths = 2))
+    ax.set_title(title)
+
+    if mode == 'points':
+
+        # one scatter per outcome in order of appearance, labels built from the outcomes only
+        codes, outcomes = pd.factorize(df['events'].to_numpy()[hit])
+        labels = pd.Series(outcomes, dtype = object).str.replace('_', ' ').str.title()
+        scatters = [ax.scatter(x[codes == i], y[codes == i], size, label = label, alpha = 0.5)
+                    for i, label in enumerate(labels)]
+        ax.legend(handles = scatters, title = 'Outcome', bbox_to_anchor = (1.05, 1), loc = 'upper left')
+
+    elif mode == 'hexbin':
+
+        cells = ax.hexbin(x, y, gridsize = HEXBIN_GRIDSIZE, extent = FIELD_X_LIMITS + FIELD_Y_LIMITS,
+                          mincnt = 1, cmap = 'viridis', alpha = 0.8)
+        fig.colorbar(cells, ax = ax, fraction = 0.04, pad = 0.02, label = 'Batted Balls')
+
+    elif mode == 'zones':
+
+        n_angles = len(ZONE_ANGLES) - 1
+        zones = field_zones(x, y)
+        counts = np.bincount(zones[zones >= 0], minlength = n_angles * (len(ZONE_DISTANCES) - 1))
+        shares = counts / max(len(x), 1)
+
+        # wedges around home plate, matplotlib angles run counter clockwise from the right
+        center = (HOME_PLATE[0], -HOME_PLATE[1])
+        for zone, share in enumerate(shares):
+            ia, ir = zone % n_angles, zone // n_angles
+            inner, outer = ZONE_DISTANCES[ir] / FEET_PER_UNIT, ZONE_DISTANCES[ir + 1] / FEET_PER_UNIT
+            theta1, theta2 = 90 - ZONE_ANGLES[ia + 1], 90 - ZONE_ANGLES[ia]
+            ax.add_patch(mpatches.Wedge(center, outer, theta1, theta2, width = outer - inner,
+                                        facecolor = plt.cm.Blues(0.15 + 0.85 * share / max(shares.max(), 1e-9)),
+                                        edgecolor = 'white', alpha = 0.8, zorder = 0))
+            mid = np.radians((theta1 + theta2) / 2)
+            ax.text(center[0] + (inner + outer) / 2 * np.cos(mid), center[1] + (inner + outer) / 2 * np.sin(mid),
+                    '{:.0%}'.format(share), ha = 'center', va = 'center', fontsize = 8)
+
+    else:
+        raise ValueError("unknown spray chart mode '{}'".format(mode))
+
+    return ax
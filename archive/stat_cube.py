@@ -0,0 +1,366 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+import os
+
+# object registry
+import weakref
+
+# columnar storage
+import pyarrow as pa
+
+# dashboard filter index, the filter dimensions of the count cube and the pitch data storage
+from filter_index import RANGE_COLUMN, StatcastFilterIndex, get_filter_index
+from count_cube import CUBE_FILTER_COLUMNS, StatcastCountCube
+from storage import (PARTITION_COLUMNS, open_pitch_dataset, open_summary_dataset, partition_filter, read_pitch_data,
+                     replace_summary, summary_write_path, write_summary_partitions)
+
+
+##### Global Options -----
+
+# grouping dimension of the times through order summary, on top of the filter dimensions
+CUBE_GROUP_COLUMNS = ['tto']
+
+# statistics summed in every cell, the game id is only counted
+CUBE_STAT_COLUMNS = ['game_pk', 'strike_ind', 'whiff_ind', 'woba_value', 'launch_speed', 'release_spin_rate']
+
+# directory of the stored cells inside the pitch data, skipped when the pitch data is read
+STAT_CUBE_DIR_NAME = '_stat_cube'
+
+# dimensions of the stored cells, partitioned as the pitch data
+STAT_CUBE_KEY_COLUMNS = PARTITION_COLUMNS + CUBE_FILTER_COLUMNS + CUBE_GROUP_COLUMNS + [RANGE_COLUMN]
+
+# pitchers whose pitches are read at once when storing the cells
+STAT_CUBE_PITCHER_GROUP = 50
+
+# registry of built cubes keyed by the id of the data frame they summarise
+_STAT_CUBES = {}
+
+
+##### Define Classes -----
+
+'''
+Define a class holding the sufficient statistics of the times through order summary in
+every observed combination of the dashboard filter dimensions and times through order:
+the number of pitches and the sum and non-missing count of each statistic.
+
+Means taken as summed sums over summed counts skip missing values as the pandas mean
+does, so any filter selection gives the grouped means of the filtered rows. Cells of
+cubes built on separate data add up, so cubes merge into the cube of the combined data.
+Cells are selected as in the count cube and keyed by the codes of the filter index.
+'''
+class StatcastStatCube(StatcastCountCube):
+
+    # the filter code lookups of the cube are built as the filter index builds them
+    allowed_codes = StatcastFilterIndex.allowed_codes
+
+    def __init__(self, data, index = None):
+
+        self.index = index
+        self.uniques = dict()
+        codes = dict()
+
+        # reuse the codes of the filter index, factorize the other columns, missing values get the last code
+        for col in CUBE_FILTER_COLUMNS + CUBE_GROUP_COLUMNS:
+            if index is not None and col in index.codes:
+                codes[col] = index.codes[col]
+                self.uniques[col] = index.uniques[col]
+            else:
+                col_codes, uniques = pd.factorize(data[col])
+                col_codes = col_codes.astype(np.int32)
+                col_codes[col_codes < 0] = len(uniques)
+                codes[col] = col_codes
+                self.uniques[col] = pd.Index(uniques)
+
+        # factorize the run differential so it can be grouped on with the codes
+        range_values = index.range_values if index is not None else data[RANGE_COLUMN].to_numpy(dtype = float)
+        range_codes, range_uniques = pd.factorize(range_values)
+        range_codes[range_codes < 0] = len(range_uniques)
+        codes[RANGE_COLUMN] = range_codes.astype(np.int32)
+        range_uniques = np.append(np.asarray(range_uniques, dtype = float), np.nan)
+
+        # number every observed combination, sorted by pitcher first
+        grouped = pd.DataFrame(codes).groupby(list(codes), sort = True)
+        cell_ids = grouped.ngroup().to_numpy()
+        cells = grouped.size().reset_index(name = 'n')
+
+        # sum each statistic and count its non-missing values by cell
+        sums = np.empty((len(cells), len(CUBE_STAT_COLUMNS)))
+        counts = np.empty((len(cells), len(CUBE_STAT_COLUMNS)), dtype = np.int64)
+        for i, col in enumerate(CUBE_STAT_COLUMNS):
+            values = data[col].to_numpy(dtype = float, na_value = np.nan)
+            present = ~np.isnan(values)
+            sums[:, i] = np.bincount(cell_ids, weights = np.where(present, values, 0), minlength = len(cells))
+            counts[:, i] = np.bincount(cell_ids, weights = present, minlength = len(cells))
+
+        self.set_cells({col: cells[col].to_numpy(dtype = np.int32) for col in codes},
+                       cells['n'].to_numpy(dtype = np.int64), sums, counts, range_uniques)
+
+    '''
+    Define a function to store the cells of the cube, sorted by their codes
+    '''
+    def set_cells(self, cell_codes, cell_counts, cell_sums, cell_stat_counts, range_uniques):
+
+        self.n_cells = len(cell_counts)
+        self.cell_codes = cell_codes
+        self.cell_counts = cell_counts
+        self.cell_sums = cell_sums
+        self.cell_stat_counts = cell_stat_counts
+        self.range_uniques = range_uniques
+        self.cell_range_values = range_uniques[cell_codes[RANGE_COLUMN]]
+
+        # cell offsets of each pitcher code
+        pitcher_codes = self.cell_codes['pitcher_name']
+        self.pitcher_offsets = np.searchsorted(pitcher_codes, np.arange(len(self.uniques['pitcher_name']) + 2))
+
+    '''
+    Define a function returning the sums and non-missing counts of the statistics and the
+    number of pitches by the given columns for the matching cells, as the query backend
+    returns them. Pitches missing any of the columns are left out, like groupby.
+    '''
+    def stat_totals(self, by, filters, value_range = None):
+
+        cells = self.cells(filters, value_range)
+
+        # drop cells where a grouping column is missing
+        for col in by:
+            cells = cells[self.cell_codes[col][cells] < len(self.uniques[col])]
+
+        # number the groups by the codes of the grouping columns
+        keys = np.zeros(len(cells), dtype = np.int64)
+        for col in by:
+            keys = keys * len(self.uniques[col]) + self.cell_codes[col][cells]
+        groups, group_ids = np.unique(keys, return_inverse = True)
+
+        # sum the cells of each group
+        sums = np.column_stack([np.bincount(group_ids, weights = column, minlength = len(groups))
+                                for column in self.cell_sums[cells].T])
+        counts = np.column_stack([np.bincount(group_ids, weights = column, minlength = len(groups))
+                                  for column in self.cell_stat_counts[cells].T])
+        pitches = np.bincount(group_ids, weights = self.cell_counts[cells], minlength = len(groups))
+
+        # convert the codes back to labels
+        labels = []
+        for col in reversed(by):
+            groups, col_codes = np.divmod(groups, len(self.uniques[col]))
+            labels.insert(0, self.uniques[col].take(col_codes))
+        index = labels[0].rename(by[0]) if len(by) == 1 else pd.MultiIndex.from_arrays(labels, names = by)
+
+        # order the groups by their labels, as groupby does
+        order = index.argsort()
+
+        return (pd.DataFrame(sums[order], index = index[order], columns = CUBE_STAT_COLUMNS),
+                pd.DataFrame(counts[order].astype(np.int64), index = index[order], columns = CUBE_STAT_COLUMNS),
+                pd.Series(pitches[order].astype(np.int64), index = index[order], name = 'pitches'))
+
+    '''
+    Define a function returning the cube of the data of this cube and another one. The
+    codes of the other cube are mapped onto the labels of this one, so cubes built on
+    separate data, such as separate seasons, can be merged.
+    '''
+    def merge(self, other):
+
+        merged = object.__new__(StatcastStatCube)
+        merged.index = None
+        merged.uniques = dict()
+
+        codes = dict()
+        for col in CUBE_FILTER_COLUMNS + CUBE_GROUP_COLUMNS:
+            uniques = self.uniques[col].append(other.uniques[col].difference(self.uniques[col], sort = False))
+            merged.uniques[col] = uniques
+
+            # missing values move to the last code of the merged labels
+            other_codes = np.append(uniques.get_indexer(other.uniques[col]), len(uniques)).astype(np.int32)
+            self_codes = self.cell_codes[col].copy()
+            self_codes[self_codes == len(self.uniques[col])] = len(uniques)
+            codes[col] = np.concatenate([self_codes, other_codes[other.cell_codes[col]]])
+
+        range_values = np.concatenate([self.cell_range_values, other.cell_range_values])
+        range_codes, range_uniques = pd.factorize(range_values)
+        range_codes[range_codes < 0] = len(range_uniques)
+        codes[RANGE_COLUMN] = range_codes.astype(np.int32)
+        range_uniques = np.append(np.asarray(range_uniques, dtype = float), np.nan)
+
+        # add up the cells found in both cubes
+        merged.add_cells(codes,
+                         np.concatenate([self.cell_counts, other.cell_counts]),
+                         np.concatenate([self.cell_sums, other.cell_sums]),
+                         np.concatenate([self.cell_stat_counts, other.cell_stat_counts]),
+                         range_uniques)
+
+        return merged
+
+    '''
+    Define a function to store cells given by their codes, adding up the cells of the
+    same combination
+    '''
+    def add_cells(self, codes, cell_counts, cell_sums, cell_stat_counts, range_uniques):
+
+        grouped = pd.DataFrame(codes).groupby(list(codes), sort = True)
+        cell_ids = grouped.ngroup().to_numpy()
+        cells = grouped.size().reset_index(name = 'n')
+        n_cells = len(cells)
+
+        cell_counts = np.bincount(cell_ids, weights = cell_counts, minlength = n_cells)
+        cell_sums = np.column_stack([np.bincount(cell_ids, weights = column, minlength = n_cells)
+                                     for column in np.asarray(cell_sums, dtype = float).T])
+        cell_stat_counts = np.column_stack([np.bincount(cell_ids, weights = column, minlength = n_cells)
+                                            for column in np.asarray(cell_stat_counts, dtype = float).T])
+
+        self.set_cells({col: cells[col].to_numpy(dtype = np.int32) for col in codes}, cell_counts.astype(np.int64),
+                       cell_sums, cell_stat_counts.astype(np.int64), range_uniques)
+
+
+##### Define Functions -----
+
+'''
+Define a function to build the stat cube for a data frame and register it
+'''
+def build_stat_cube(data):
+
+    cube = StatcastStatCube(data, get_filter_index(data))
+    _STAT_CUBES[id(data)] = (weakref.ref(data), cube)
+
+    return cube
+
+
+'''
+Define a function to return the registered stat cube of a data frame,
+building it on first use
+'''
+def get_stat_cube(data):
+
+    entry = _STAT_CUBES.get(id(data))
+
+    # rebuild if the id was reused by another frame or its filter index was rebuilt
+    if entry is None or entry[0]() is not data or entry[1].index is not get_filter_index(data):
+        return build_stat_cube(data)
+
+    return entry[1]
+
+
+'''
+Define a function to sum the statistics of prepped pitch data by season, pitcher, filter
+dimensions, times through order and run differential, with the number of pitches and the
+non-missing count of each statistic
+'''
+def stat_cube_cells(df):
+
+    keys = df[STAT_CUBE_KEY_COLUMNS]
+
+    # group on integer codes, so missing labels form their own cells
+    codes = dict()
+    uniques = dict()
+    for col in keys.columns:
+        codes[col], uniques[col] = pd.factorize(keys[col])
+
+    grouped = pd.DataFrame(codes).groupby(list(codes), sort = False)
+    cell_ids = grouped.ngroup().to_numpy()
+    cells = grouped.size().reset_index(name = 'n')
+
+    # sum each statistic and count its non-missing values by cell
+    for col in CUBE_STAT_COLUMNS:
+        values = df[col].to_numpy(dtype = float, na_value = np.nan)
+        present = ~np.isnan(values)
+        cells[col + '_sum'] = np.bincount(cell_ids, weights = np.where(present, values, 0), minlength = len(cells))
+        cells[col + '_n'] = np.bincount(cell_ids, weights = present, minlength = len(cells)).astype(np.int64)
+
+    # convert the codes back to labels, missing codes give missing values
+    for col in keys.columns:
+        cells[col] = pd.Series(uniques[col]).reindex(cells[col]).to_numpy()
+
+    return cells
+
+
+'''
+Define a function to build a stat cube from stored cells, adding up the cells of the
+same combination stored for separate seasons and pitcher ids
+'''
+def stat_cube_from_cells(cells):
+
+    cube = object.__new__(StatcastStatCube)
+    cube.index = None
+    cube.uniques = dict()
+    codes = dict()
+
+    # factorize the filter dimensions and times through order, missing values get the last code
+    for col in CUBE_FILTER_COLUMNS + CUBE_GROUP_COLUMNS:
+        col_codes, uniques = pd.factorize(cells[col])
+        col_codes = col_codes.astype(np.int32)
+        col_codes[col_codes < 0] = len(uniques)
+        codes[col] = col_codes
+        cube.uniques[col] = pd.Index(uniques)
+
+    # factorize the run differential so it can be grouped on with the codes
+    range_codes, range_uniques = pd.factorize(cells[RANGE_COLUMN].to_numpy(dtype = float))
+    range_codes[range_codes < 0] = len(range_uniques)
+    codes[RANGE_COLUMN] = range_codes.astype(np.int32)
+    range_uniques = np.append(np.asarray(range_uniques, dtype = float), np.nan)
+
+    cube.add_cells(codes,
+                   cells['n'].to_numpy(dtype = float),
+                   cells[[col + '_sum' for col in CUBE_STAT_COLUMNS]].to_numpy(dtype = float),
+                   cells[[col + '_n' for col in CUBE_STAT_COLUMNS]].to_numpy(dtype = float),
+                   range_uniques)
+
+    return cube
+
+
+'''
+Define a function to get the directory of the stored stat cube cells of pitch data
+'''
+def stat_cube_path(pitch_path):
+    return os.path.join(pitch_path, STAT_CUBE_DIR_NAME)
+
+
+'''
+Define a function to store the stat cube cells of the stored pitch data, partitioned by
+season and pitcher as the pitch data, so a query backend sums the statistics of every
+pitcher without reading the pitches. Seasons and pitchers are updated or rebuilt as the
+stored transitions are.
+'''
+def write_stat_cube(pitch_path, seasons = None, pitchers = None, group_size = STAT_CUBE_PITCHER_GROUP):
+
+    dataset = open_pitch_dataset(pitch_path)
+    cube_path = stat_cube_path(pitch_path)
+
+    # a full rebuild of the seasons is written next to the stored cells
+    rebuild = pitchers is None
+    if rebuild:
+        pitchers = dataset.to_table(columns = ['pitcher'], filter = partition_filter(seasons, None))['pitcher'].unique().to_pylist()
+    out_path = summary_write_path(cube_path, rebuild)
+
+    # every write uses the column types of the stored pitch data
+    fields = []
+    for col in STAT_CUBE_KEY_COLUMNS:
+        field_type = dataset.schema.field(col).type
+        fields.append(pa.field(col, field_type.value_type if pa.types.is_dictionary(field_type) else field_type))
+    fields.append(pa.field('n', pa.int64()))
+    for col in CUBE_STAT_COLUMNS:
+        fields += [pa.field(col + '_sum', pa.float64()), pa.field(col + '_n', pa.int64())]
+    schema = pa.schema(fields)
+
+    for start in range(0, len(pitchers), group_size):
+        df = read_pitch_data(pitch_path, columns = STAT_CUBE_KEY_COLUMNS + CUBE_STAT_COLUMNS, seasons = seasons,
+                             pitchers = list(pitchers[start:start + group_size]))
+
+        write_summary_partitions(pa.Table.from_pandas(stat_cube_cells(df), schema = schema, preserve_index = False), out_path)
+
+    # swap in the rebuilt cells, of every season or of the rebuilt seasons only
+    if rebuild:
+        replace_summary(out_path, cube_path, seasons)
+
+
+'''
+Define a function to read the stat cube of the requested seasons and pitchers from the
+stored cells, or None if the pitch data has no stored cells
+'''
+def read_stat_cube(pitch_path, seasons = None, pitchers = None):
+
+    dataset = open_summary_dataset(stat_cube_path(pitch_path))
+    if dataset is None:
+        return None
+
+    return stat_cube_from_cells(dataset.to_table(filter = partition_filter(seasons, pitchers)).to_pandas())
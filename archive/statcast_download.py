@@ -0,0 +1,380 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+import datetime
+import io
+import os
+import re
+import time
+
+# http
+import requests
+from requests.adapters import HTTPAdapter
+
+# concurrency
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+##### Global Options -----
+
+# baseball savant statcast search endpoint
+STATCAST_URL = "https://baseballsavant.mlb.com/statcast_search/csv"
+
+# query string of a pitch level search between two dates, same as small_request
+STATCAST_QUERY = ("all=true&hfPT=&hfAB=&hfBBT=&hfPR=&hfZ=&stadium=&hfBBL=&hfNewZones=&hfGT=R%7CPO%7CS%7C=&hfSea=&hfSit="
+                  "&player_type=pitcher&hfOuts=&opponent=&pitcher_throws=&batter_stands=&hfSA=&game_date_gt={}&game_date_lt={}"
+                  "&team=&position=&hfRO=&home_road=&hfFlag=&metric_1=&hfInn=&min_pitches=0&min_results=0&group_by=name"
+                  "&sort_col=pitches&player_event_sort=h_launch_speed&sort_order=desc&min_abs=0&type=details&")
+
+# query string of a single game search, same as single_game_request
+GAME_QUERY = "all=true&type=details&game_pk={}"
+
+# columns every statcast csv holds, even without pitches
+REQUIRED_COLUMNS = ['game_date', 'game_pk']
+
+# message returned in place of the data when a query is too large
+QUERY_TIMEOUT_MESSAGE = b"Error: Query Timeout"
+
+# (connect, read) timeouts in seconds, savant can take minutes to answer a large query
+REQUEST_TIMEOUT = (10, 300)
+
+# columns of the raw data converted to numeric
+NUMERIC_COLUMNS = ['release_speed','release_pos_x','release_pos_z','batter','pitcher','zone','hit_location','balls',
+                   'strikes','game_year','pfx_x','pfx_z','plate_x','plate_z','on_3b','on_2b','on_1b','outs_when_up','inning',
+                   'hc_x','hc_y','fielder_2','vx0','vy0','vz0','ax','ay','az','sz_top','sz_bot',
+                   'hit_distance_sc','launch_speed','launch_angle','effective_speed','release_spin_rate','release_extension',
+                   'game_pk','pitcher.1','fielder_2.1','fielder_3','fielder_4','fielder_5',
+                   'fielder_6','fielder_7','fielder_8','fielder_9','release_pos_y',
+                   'estimated_ba_using_speedangle','estimated_woba_using_speedangle','woba_value','woba_denom','babip_value',
+                   'iso_value','launch_speed_angle','at_bat_number','pitch_number','home_score','away_score','bat_score',
+                   'fld_score','post_away_score','post_home_score','post_bat_score','post_fld_score']
+
+# team abbreviations accepted by postprocessing
+VALID_TEAMS = ['MIN', 'PHI', 'BAL', 'NYY', 'LAD', 'OAK', 'SEA', 'TB', 'MIL', 'MIA',
+               'KC', 'TEX', 'CHC', 'ATL', 'COL', 'HOU', 'CIN', 'LAA', 'DET', 'TOR',
+               'PIT', 'NYM', 'CLE', 'CWS', 'STL', 'WSH', 'SF', 'SD', 'BOS','ARI','ANA','WAS']
+
+# checkpoint file names hold the window they cover
+CHECKPOINT_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2})_(\d{4}-\d{2}-\d{2})\.csv$")
+
+
+##### Define Classes -----
+
+'''
+Define an error raised when baseball savant answers a query with a timeout message
+'''
+class QueryTimeoutError(Exception):
+    pass
+
+
+'''
+Define an error raised when a window is answered with content that is not statcast csv
+'''
+class InvalidResponseError(Exception):
+    pass
+
+
+##### Define Functions -----
+
+'''
+Define a function to create an http session sharing a connection pool across workers
+'''
+def make_session(pool_size = 8):
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections = pool_size, pool_maxsize = pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
+
+
+'''
+Define a function to check if a date falls in the offseason (before 3/15 or after 11/14)
+'''
+def is_offseason(d):
+    return d.month < 3 or (d.month == 3 and d.day < 15) or d.month > 11 or (d.month == 11 and d.day > 14)
+
+
+'''
+Define a function to split the season dates between two dates into windows of step days,
+leaving out offseason dates and dates already covered
+'''
+def plan_windows(d1, d2, step, covered = frozenset()):
+
+    windows = []
+    window = []
+
+    d = d1
+    while d <= d2:
+
+        # close the current window at a gap in the dates to download
+        if is_offseason(d) or d in covered:
+            if window:
+                windows.append((window[0], window[-1]))
+                window = []
+        else:
+            window.append(d)
+            if len(window) == step:
+                windows.append((window[0], window[-1]))
+                window = []
+
+        d = d + datetime.timedelta(days = 1)
+
+    if window:
+        windows.append((window[0], window[-1]))
+
+    return windows
+
+
+'''
+Define a function to get the dates covered by the checkpoint files of completed windows
+'''
+def checkpointed_dates(checkpoint_dir):
+
+    covered = set()
+
+    if checkpoint_dir is None or not os.path.isdir(checkpoint_dir):
+        return covered
+
+    for file_name in os.listdir(checkpoint_dir):
+        match = CHECKPOINT_PATTERN.match(file_name)
+        if match is None:
+            continue
+
+        d = datetime.datetime.strptime(match.group(1), "%Y-%m-%d")
+        d_end = datetime.datetime.strptime(match.group(2), "%Y-%m-%d")
+        while d <= d_end:
+            covered.add(d)
+            d = d + datetime.timedelta(days = 1)
+
+    return covered
+
+
+'''
+Define a function to request a statcast csv, retrying failed requests with
+exponential backoff. Returns the raw csv content.
+'''
+def request_csv(session, url, timeout = REQUEST_TIMEOUT, retries = 3, backoff = 2.0):
+
+    for attempt in range(retries + 1):
+        try:
+            response = session.get(url, timeout = timeout)
+
+            # retry server errors and rate limiting, other errors fail right away
+            if response.status_code < 500 and response.status_code != 429:
+                response.raise_for_status()
+                break
+
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+
+        if attempt == retries:
+            response.raise_for_status()
+
+        time.sleep(backoff * 2**attempt)
+
+    # a timed out query is not retried as is, the caller splits the window
+    content = response.content
+    if QUERY_TIMEOUT_MESSAGE in content[:1000]:
+        raise QueryTimeoutError("Query timeout for {}".format(url))
+
+    return content
+
+
+'''
+Define a function to check that content parses as statcast csv, so an empty or broken
+answer is never saved as the checkpoint of a window
+'''
+def check_csv(content, url):
+
+    try:
+        data = pd.read_csv(io.BytesIO(content))
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise InvalidResponseError("Invalid csv for {} ({})".format(url, e))
+
+    missing = [col for col in REQUIRED_COLUMNS if col not in data.columns]
+    if missing:
+        raise InvalidResponseError("Invalid csv for {} (missing columns {})".format(url, missing))
+
+    return content
+
+
+'''
+Define a function to request the statcast data of a window of dates, checking that
+the content parses as statcast csv
+'''
+def request_window(session, start_dt, end_dt, base_url = STATCAST_URL, timeout = REQUEST_TIMEOUT,
+                   retries = 3, backoff = 2.0):
+
+    url = "{}?{}".format(base_url, STATCAST_QUERY.format(start_dt, end_dt))
+
+    return check_csv(request_csv(session, url, timeout, retries, backoff), url)
+
+
+'''
+Define a function to request the statcast data of a single game as a data frame
+'''
+def request_game(session, game_pk, base_url = STATCAST_URL, timeout = REQUEST_TIMEOUT,
+                 retries = 3, backoff = 2.0):
+
+    url = "{}?{}".format(base_url, GAME_QUERY.format(game_pk))
+    content = request_csv(session, url, timeout, retries, backoff)
+
+    return pd.read_csv(io.StringIO(content.decode('utf-8')))
+
+
+'''
+Define a function to write the content of a completed window to its checkpoint file
+'''
+def write_checkpoint(checkpoint_dir, start_dt, end_dt, content):
+
+    path = os.path.join(checkpoint_dir, "{}_{}.csv".format(start_dt, end_dt))
+
+    # write to a temporary file first so an interrupted run never leaves a partial checkpoint
+    with open(path + ".tmp", "wb") as f:
+        f.write(content)
+    os.replace(path + ".tmp", path)
+
+    return path
+
+
+'''
+Define a function to download statcast data between two dates with a pool of workers.
+
+The dates are split into windows of step days which are requested concurrently over a
+shared session. Windows answered with a query timeout are split in half and requested
+again. Windows answered with content that is not statcast csv fail without a checkpoint.
+Each completed window is written to the checkpoint directory, so a rerun only
+requests the dates not downloaded yet, skip_dates are left out as well. base_url can
+point at a local server serving canned csv files.
+'''
+def download_statcast(start_dt, end_dt, checkpoint_dir, step = 5, max_workers = 8,
+                      base_url = STATCAST_URL, timeout = REQUEST_TIMEOUT, retries = 3, backoff = 2.0,
+                      session = None, verbose = True, skip_dates = ()):
+
+    date_format = "%Y-%m-%d"
+    d1 = datetime.datetime.strptime(start_dt, date_format)
+    d2 = datetime.datetime.strptime(end_dt, date_format)
+
+    os.makedirs(checkpoint_dir, exist_ok = True)
+
+    # only plan windows for dates without a checkpoint or stored elsewhere
+    windows = plan_windows(d1, d2, step, checkpointed_dates(checkpoint_dir) | set(skip_dates))
+
+    if verbose and windows:
+        print("Requesting {} windows with {} workers".format(len(windows), max_workers))
+
+    session = make_session(max_workers) if session is None else session
+    failed = []
+
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+
+        def submit(window):
+            start, end = (d.strftime(date_format) for d in window)
+            future = executor.submit(request_window, session, start, end, base_url, timeout, retries, backoff)
+            pending[future] = window
+
+        pending = dict()
+        for window in windows:
+            submit(window)
+
+        while pending:
+            done, _ = wait(list(pending), return_when = FIRST_COMPLETED)
+
+            for future in done:
+                window = pending.pop(future)
+                start, end = (d.strftime(date_format) for d in window)
+
+                try:
+                    content = future.result()
+
+                except QueryTimeoutError:
+                    # the window is too large, request each half separately
+                    days = (window[1] - window[0]).days
+                    if days == 0:
+                        failed.append((start, end))
+                        print("Query unsuccessful for data from {} to {}. Skipping these dates.".format(start, end))
+                        continue
+
+                    middle = window[0] + datetime.timedelta(days = days // 2)
+                    submit((window[0], middle))
+                    submit((middle + datetime.timedelta(days = 1), window[1]))
+                    continue
+
+                except (requests.RequestException, OSError, InvalidResponseError) as e:
+                    failed.append((start, end))
+                    print("Query unsuccessful for data from {} to {} ({}). Skipping these dates.".format(start, end, e))
+                    continue
+
+                write_checkpoint(checkpoint_dir, start, end, content)
+
+                if verbose:
+                    print("Completed sub-query from {} to {}".format(start, end))
+
+    if failed:
+        print("{} windows failed, rerun to retry them".format(len(failed)))
+
+    return read_checkpoints(checkpoint_dir, d1, d2)
+
+
+'''
+Define a function to combine the checkpoint files of the windows between two dates.
+Windows of an earlier download can extend past the dates, so only the pitches
+between the dates are returned.
+'''
+def read_checkpoints(checkpoint_dir, d1, d2):
+
+    dataframe_list = []
+
+    for file_name in sorted(os.listdir(checkpoint_dir)):
+        match = CHECKPOINT_PATTERN.match(file_name)
+        if match is None:
+            continue
+
+        start = datetime.datetime.strptime(match.group(1), "%Y-%m-%d")
+        end = datetime.datetime.strptime(match.group(2), "%Y-%m-%d")
+        if end < d1 or start > d2:
+            continue
+
+        data = pd.read_csv(os.path.join(checkpoint_dir, file_name))
+        if len(data):
+            dataframe_list.append(data)
+
+    if not dataframe_list:
+        return pd.DataFrame()
+
+    data = pd.concat(dataframe_list, axis = 0, ignore_index = True)
+
+    # keep the pitches of the requested dates only
+    game_dates = pd.to_datetime(data['game_date']).dt.normalize()
+
+    return data[game_dates.between(d1, d2).to_numpy()].reset_index(drop = True)
+
+
+'''
+Define a function to clean the raw statcast data, from the pybaseball github repo
+'''
+def postprocessing(data, team = None):
+
+    # replace empty entries and 'null' strings with np.NaN
+    data.replace(r'^\s*$', np.nan, regex=True, inplace = True)
+    data.replace(r'^null$', np.nan, regex=True, inplace = True)
+
+    # convert columns to numeric
+    data[NUMERIC_COLUMNS] = data[NUMERIC_COLUMNS].astype(float)
+
+    # convert date col to datetime data type and sort so that this returns in an order that makes sense (by date and game)
+    data['game_date'] = pd.to_datetime(data['game_date'], format='%Y-%m-%d')
+    data = data.sort_values(['game_date', 'game_pk', 'at_bat_number', 'pitch_number'], ascending=False)
+
+    # select only pitches from a particular team
+    if(team in VALID_TEAMS):
+        data = data.loc[(data['home_team']==team)|(data['away_team']==team)]
+    elif(team != None):
+        raise ValueError('Error: invalid team abbreviation. Valid team names are: {}'.format(VALID_TEAMS))
+    data = data.reset_index()
+    return data
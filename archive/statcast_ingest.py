@@ -0,0 +1,415 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+import datetime
+import hashlib
+import json
+import os
+import shutil
+
+# concurrency
+from concurrent.futures import ThreadPoolExecutor
+
+# statcast downloader
+from statcast_download import (STATCAST_URL, checkpointed_dates, download_statcast, make_session,
+                               postprocessing, request_game)
+
+
+##### Global Options -----
+
+# manifest of the dates and games stored in the raw data directory
+MANIFEST_NAME = "manifest.json"
+
+# directory of the windows downloaded by a run, removed once they are stored
+CHECKPOINT_NAME = "_checkpoints"
+
+# directory of the recheck window downloaded by a run, removed once it is compared
+RECHECK_NAME = "_recheck"
+
+# pitches a starting pitcher needs over the season to be kept, same as the data preparation
+MIN_PITCHES = 100
+
+# version of the game hash, games hashed with another version are hashed again from the stored pitches
+HASH_VERSION = 2
+
+# decimals numeric values are rounded to before hashing
+HASH_DECIMALS = 9
+
+
+##### Define Functions -----
+
+'''
+Define a function to get the path of the raw data file of a date
+'''
+def raw_date_path(raw_dir, game_date):
+    return os.path.join(raw_dir, "game_date={}.csv".format(game_date))
+
+
+'''
+Define a function to read the manifest of the raw data directory
+'''
+def read_manifest(raw_dir):
+
+    path = os.path.join(raw_dir, MANIFEST_NAME)
+
+    if not os.path.exists(path):
+        return {'dates': dict(), 'last_delta': {'dates': [], 'game_pks': []}}
+
+    with open(path) as f:
+        return json.load(f)
+
+
+'''
+Define a function to write the manifest of the raw data directory
+'''
+def write_manifest(raw_dir, manifest):
+
+    path = os.path.join(raw_dir, MANIFEST_NAME)
+
+    # write to a temporary file first so an interrupted run keeps the previous manifest
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent = 1, sort_keys = True)
+    os.replace(path + ".tmp", path)
+
+
+'''
+Define a function to hash the pitches of a game independently of the column types
+read_csv inferred for them: columns are hashed in name order, numeric columns as double
+precision values rounded to HASH_DECIMALS and the others as text, with dates written
+as days.
+'''
+def game_hash(game_df):
+
+    # the index column depends on the query the game came from, leave it out of the hash
+    game_df = game_df.drop(columns = ['index'], errors = 'ignore').sort_values(by = ['at_bat_number', 'pitch_number'])
+
+    digest = hashlib.sha1()
+    for col in sorted(game_df.columns):
+        values = game_df[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = values.dt.strftime('%Y-%m-%d')
+
+        # a column is numeric when every value it holds converts to a number
+        numeric = values.astype(float) if pd.api.types.is_bool_dtype(values) else pd.to_numeric(values, errors = 'coerce')
+        digest.update(col.encode('utf-8'))
+        if (numeric.notna() == values.notna()).all():
+            # rounded so values written to csv and read back hash the same, adding zero turns -0.0 into 0.0
+            numbers = np.round(numeric.to_numpy(dtype = float, na_value = np.nan), HASH_DECIMALS) + 0.0
+            digest.update(b'f' + np.ascontiguousarray(numbers).tobytes())
+        else:
+            digest.update(b's' + '\x1f'.join(values.astype(object).where(values.notna(), '\x00').astype(str)).encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+'''
+Define a function to summarise a game for the manifest: number of pitches, a hash of the
+pitch data to detect corrections, the starting pitchers and pitches thrown by each pitcher
+in the first 9 innings
+'''
+def summarize_game(game_df):
+
+    game_df = game_df.sort_values(by = ['at_bat_number', 'pitch_number'])
+
+    # starters pitch to the first at bat with 0 outs in the first inning, same as the data preparation
+    first_inning_df = game_df[(game_df['inning'] == 1) & (game_df['outs_when_up'] == 0)]
+    starters = first_inning_df.loc[first_inning_df.groupby('inning_topbot')['at_bat_number'].idxmin(), 'pitcher']
+
+    pitcher_counts = game_df[game_df['inning'] <= 9.0].groupby('pitcher').size()
+
+    return {'pitches': len(game_df),
+            'hash': game_hash(game_df),
+            'hash_version': HASH_VERSION,
+            'starters': sorted(int(i) for i in starters.unique()),
+            'pitchers': {str(int(i)): int(n) for i, n in pitcher_counts.items()}}
+
+
+'''
+Define a function to get the stored hash of a game, hashing the stored pitches again
+when the game was summarised with another version of the hash
+'''
+def stored_game_hash(raw_dir, game_date, game_pk, manifest):
+
+    game = manifest['dates'][game_date]['games'][str(int(game_pk))]
+    if game.get('hash_version') == HASH_VERSION:
+        return game['hash']
+
+    stored = pd.read_csv(raw_date_path(raw_dir, game_date), sep = ';')
+
+    return game_hash(stored[stored['game_pk'] == game_pk])
+
+
+'''
+Define a function to store the pitches of a date, replacing the given games if the date
+is already stored. Returns the manifest entry of the date.
+'''
+def write_raw_date(raw_dir, game_date, data, manifest, replace_games = None):
+
+    path = raw_date_path(raw_dir, game_date)
+    entry = manifest['dates'].get(game_date, {'games': dict()})
+
+    # store the game date as text like the stored files
+    data = data.assign(game_date = pd.to_datetime(data['game_date']).dt.strftime('%Y-%m-%d'))
+
+    # keep the stored games that are not being replaced
+    if replace_games is not None and os.path.exists(path):
+        stored = pd.read_csv(path, sep = ';')
+        data = pd.concat([stored[~stored['game_pk'].isin(replace_games)], data], axis = 0, ignore_index = True)
+    else:
+        entry = {'games': dict()}
+
+    data = data.sort_values(by = ['game_pk', 'at_bat_number', 'pitch_number'], ascending = False)
+    data.to_csv(path + ".tmp", sep = ';', index = None, header = True)
+    os.replace(path + ".tmp", path)
+
+    for game_pk, game_df in data.groupby('game_pk'):
+        if replace_games is None or game_pk in replace_games:
+            entry['games'][str(int(game_pk))] = summarize_game(game_df)
+
+    entry['ingested'] = datetime.datetime.now().isoformat(timespec = 'seconds')
+    manifest['dates'][game_date] = entry
+
+    return entry
+
+
+'''
+Define a function to fetch single games concurrently, returning the cleaned data of each game
+'''
+def fetch_games(session, game_pks, max_workers = 8, base_url = STATCAST_URL, verbose = True):
+
+    games = dict()
+
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        futures = {game_pk: executor.submit(request_game, session, game_pk, base_url) for game_pk in game_pks}
+
+        for game_pk, future in futures.items():
+            try:
+                data = future.result()
+            except Exception as e:
+                print("Query unsuccessful for game {} ({}). Skipping this game.".format(game_pk, e))
+                continue
+
+            if len(data):
+                games[game_pk] = postprocessing(data)
+
+    if verbose:
+        print("Fetched {} of {} games".format(len(games), len(game_pks)))
+
+    return games
+
+
+'''
+Define a function to bring the raw statcast data up to date.
+
+Only the season dates between start_dt and end_dt that are not in the manifest are
+downloaded. The last recheck_days stored dates are requested again so games posted
+after their date was stored are added, and their stored games and the games listed in
+corrections are fetched one at a time and replaced when their data changed. The new
+and changed pitches are returned and recorded in the manifest as the last delta.
+'''
+def ingest_statcast(raw_dir, start_dt, end_dt = None, recheck_days = 1, corrections = (),
+                    step = 5, max_workers = 8, base_url = STATCAST_URL, verbose = True):
+
+    # default to the data through yesterday
+    if end_dt is None:
+        end_dt = (datetime.datetime.today() - datetime.timedelta(1)).strftime("%Y-%m-%d")
+
+    os.makedirs(raw_dir, exist_ok = True)
+    manifest = read_manifest(raw_dir)
+    session = make_session(max_workers)
+
+    stored_dates = sorted(manifest['dates'])
+    delta_list = []
+    delta_dates = []
+    delta_games = []
+
+    ##### download the missing dates -----
+
+    # windows finished by an interrupted run are kept in the checkpoint directory until stored
+    checkpoint_dir = os.path.join(raw_dir, CHECKPOINT_NAME)
+    skip_dates = [datetime.datetime.strptime(d, "%Y-%m-%d") for d in stored_dates]
+
+    data = download_statcast(start_dt, end_dt, checkpoint_dir, step = step, max_workers = max_workers,
+                             base_url = base_url, session = session, verbose = verbose, skip_dates = skip_dates)
+
+    # dates of the windows that came back, including dates without games
+    d1 = datetime.datetime.strptime(start_dt, "%Y-%m-%d")
+    d2 = datetime.datetime.strptime(end_dt, "%Y-%m-%d")
+    new_dates = sorted(d.strftime("%Y-%m-%d") for d in checkpointed_dates(checkpoint_dir)
+                       if d1 <= d <= d2 and d.strftime("%Y-%m-%d") not in manifest['dates'])
+
+    if len(data):
+        data = postprocessing(data)
+        data = data[data['game_date'].dt.strftime("%Y-%m-%d").isin(new_dates)]
+        date_groups = dict(tuple(data.groupby(data['game_date'].dt.strftime("%Y-%m-%d"))))
+    else:
+        date_groups = dict()
+
+    for game_date in new_dates:
+
+        # dates without games are recorded so they are not requested again
+        if game_date not in date_groups:
+            manifest['dates'][game_date] = {'games': dict(), 'ingested': datetime.datetime.now().isoformat(timespec = 'seconds')}
+            continue
+
+        date_df = date_groups[game_date]
+        write_raw_date(raw_dir, game_date, date_df, manifest)
+        delta_list.append(date_df)
+        delta_dates.append(game_date)
+        delta_games.extend(int(i) for i in date_df['game_pk'].unique())
+
+    write_manifest(raw_dir, manifest)
+    shutil.rmtree(checkpoint_dir)
+
+    if verbose:
+        print("Stored {} new dates with {} pitches".format(len(new_dates), sum(len(df) for df in delta_list)))
+
+    ##### refetch recent and corrected games -----
+
+    # the last recheck_days stored dates with games and the stored dates after them
+    recheck_dates = []
+    if recheck_days and stored_dates:
+        game_days = [d for d in stored_dates if manifest['dates'][d]['games']] or stored_dates
+        recheck_dates = [d for d in stored_dates if d >= game_days[-recheck_days:][0]]
+    game_dates = {int(game_pk): d for d in recheck_dates for game_pk in manifest['dates'][d]['games']}
+
+    # games posted after their date was stored are found by requesting the recheck dates again
+    posted = dict()
+    if recheck_dates:
+        recheck_dir = os.path.join(raw_dir, RECHECK_NAME)
+        if os.path.isdir(recheck_dir):
+            shutil.rmtree(recheck_dir)
+
+        data = download_statcast(recheck_dates[0], recheck_dates[-1], recheck_dir, step = step, max_workers = max_workers,
+                                 base_url = base_url, session = session, verbose = verbose)
+        shutil.rmtree(recheck_dir)
+
+        if len(data):
+            data = postprocessing(data)
+            for game_pk, game_df in data.groupby('game_pk'):
+                game_date = game_df['game_date'].dt.strftime("%Y-%m-%d").iloc[0]
+                if game_date in recheck_dates and str(int(game_pk)) not in manifest['dates'][game_date]['games']:
+                    posted[int(game_pk)] = game_df
+
+        if verbose:
+            print("Found {} games posted after their date was stored".format(len(posted)))
+
+    # corrections can point at any stored date
+    unstored = []
+    for game_pk in corrections:
+        for d, entry in manifest['dates'].items():
+            if str(int(game_pk)) in entry['games']:
+                game_dates[int(game_pk)] = d
+        if int(game_pk) not in game_dates and int(game_pk) not in posted:
+            unstored.append(int(game_pk))
+
+    games = fetch_games(session, list(game_dates) + unstored, max_workers = max_workers, base_url = base_url, verbose = verbose)
+
+    # keep the games whose data changed
+    changed = dict()
+    for game_pk, game_date in game_dates.items():
+        if game_pk in games and game_hash(games[game_pk]) != stored_game_hash(raw_dir, game_date, game_pk, manifest):
+            changed.setdefault(game_date, []).append(game_pk)
+
+    # games posted late are added to their date
+    for game_pk, game_df in posted.items():
+        games[game_pk] = game_df
+        changed.setdefault(game_df['game_date'].dt.strftime("%Y-%m-%d").iloc[0], []).append(game_pk)
+
+    # corrections missing from a stored date are added to it, the games of other dates come with their date
+    for game_pk in unstored:
+        if game_pk not in games:
+            print("Game {} is not stored and was not found, skipping it".format(game_pk))
+            continue
+        game_date = games[game_pk]['game_date'].dt.strftime("%Y-%m-%d").iloc[0]
+        if game_date in manifest['dates']:
+            changed.setdefault(game_date, []).append(game_pk)
+        else:
+            print("Game {} is on {} which is not stored yet, it is stored when the date is downloaded".format(game_pk, game_date))
+
+    for game_date, game_pks in changed.items():
+        date_df = pd.concat([games[game_pk] for game_pk in game_pks], axis = 0, ignore_index = True)
+        write_raw_date(raw_dir, game_date, date_df, manifest, replace_games = game_pks)
+        delta_list.append(date_df)
+        delta_games.extend(game_pks)
+
+    if verbose:
+        print("Replaced or added {} corrected or late games".format(sum(len(game_pks) for game_pks in changed.values())))
+
+    # record the delta for the data preparation
+    manifest['last_delta'] = {'dates': sorted(set(delta_dates) | set(changed)), 'game_pks': sorted(set(delta_games))}
+    write_manifest(raw_dir, manifest)
+
+    if not delta_list:
+        return pd.DataFrame()
+
+    return pd.concat(delta_list, axis = 0, ignore_index = True)
+
+
+'''
+Define a function to read the stored raw data, optionally only the given dates or games
+'''
+def load_raw_data(raw_dir, dates = None, game_pks = None):
+
+    manifest = read_manifest(raw_dir)
+
+    # only read the dates holding the requested games
+    if game_pks is not None:
+        game_pks = set(str(int(i)) for i in game_pks)
+        dates = [d for d, entry in manifest['dates'].items() if game_pks & set(entry['games'])]
+
+    dates = sorted(manifest['dates'] if dates is None else dates)
+
+    dataframe_list = []
+    for game_date in dates:
+        path = raw_date_path(raw_dir, game_date)
+        if os.path.exists(path) and manifest['dates'][game_date]['games']:
+            dataframe_list.append(pd.read_csv(path, sep = ';'))
+
+    if not dataframe_list:
+        return pd.DataFrame()
+
+    data = pd.concat(dataframe_list, axis = 0, ignore_index = True)
+
+    if game_pks is not None:
+        data = data[data['game_pk'].astype(int).astype(str).isin(game_pks)]
+
+    return data
+
+
+'''
+Define a function to get the starting pitchers who threw at least min_pitches in the
+first 9 innings over the stored season
+'''
+def season_starters(manifest, min_pitches = MIN_PITCHES):
+
+    starters = set()
+    pitch_counts = dict()
+
+    for entry in manifest['dates'].values():
+        for game in entry['games'].values():
+            starters.update(game['starters'])
+            for pitcher, n in game['pitchers'].items():
+                pitch_counts[int(pitcher)] = pitch_counts.get(int(pitcher), 0) + n
+
+    return sorted(i for i in starters if pitch_counts.get(i, 0) >= min_pitches)
+
+
+'''
+Define a function to get the games the data preparation needs to process: the games of
+the last delta and every game of starters who newly reached min_pitches
+'''
+def prep_game_pks(manifest, stored_pitchers = (), min_pitches = MIN_PITCHES):
+
+    game_pks = set(manifest['last_delta']['game_pks'])
+
+    new_pitchers = set(str(i) for i in season_starters(manifest, min_pitches)) - set(str(int(i)) for i in stored_pitchers)
+
+    for entry in manifest['dates'].values():
+        for game_pk, game in entry['games'].items():
+            if new_pitchers & set(game['pitchers']):
+                game_pks.add(int(game_pk))
+
+    return sorted(game_pks)
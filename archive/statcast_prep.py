@@ -0,0 +1,404 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+import argparse
+import os
+import shutil
+
+# columnar storage
+import pyarrow as pa
+
+# columnar pitch data storage and compact schema
+from storage import read_pitch_data, unified_schema, update_pitch_data, write_pitch_data
+from schema import apply_pitch_schema
+
+# lookup table feature derivation
+from pitch_features import batted_ball_type, count_features, runner_features
+
+# single pass game state reconstruction
+from game_state import GAME_STATE_COLUMNS, game_state, starting_pitchers
+
+# count transitions, profile and stat cube stored with the pitch data
+from count_flow import write_count_flow
+from query_backend import write_profile
+from stat_cube import write_stat_cube
+
+# raw data stored by the daily refresh
+from statcast_ingest import load_raw_data, prep_game_pks, raw_date_path, read_manifest, season_starters
+
+# persistent player name registry
+from player_names import PlayerNameRegistry
+
+
+##### Global Options -----
+
+# pitches a starting pitcher needs over the season to be kept
+MIN_PITCHES = 100
+
+# rarely thrown pitch types left out of the scouting report
+RARE_PITCH_TYPES = ['CS', 'EP', 'FA']
+
+# memory used while prepping a chunk as a multiple of the raw chunk size
+MEMORY_OVERHEAD = 6
+
+# columns read for the season wide pass
+CONTEXT_COLUMNS = GAME_STATE_COLUMNS + ['pitch_type', 'sz_bot', 'sz_top']
+
+# pitch descriptions counted as strikes and as swings with and without a whiff
+STRIKE_DESCRIPTIONS = ['called_strike', 'foul', 'foul_tip', 'swinging_strike', 'hit_into_play', 'hit_into_play', 'foul', 'foul_bunt', 'missed_bunt', 'bunt_foul_tip']
+WHIFF_DESCRIPTIONS = ['swinging_strike', 'swinging_strike_blocked', 'foul_tip']
+CONTACT_DESCRIPTIONS = ['hit_into_play', 'foul', 'foul_bunt', 'missed_bunt', 'bunt_foul_tip']
+
+
+##### Define Functions -----
+
+'''
+Define a function to list the raw csv files of a source, either a single csv or the
+raw data directory of the daily refresh
+'''
+def raw_files(source):
+
+    if not os.path.isdir(source):
+        return [source]
+
+    manifest = read_manifest(source)
+
+    return [raw_date_path(source, game_date) for game_date, entry in sorted(manifest['dates'].items()) if entry['games']]
+
+
+'''
+Define a function to read the raw data in chunks of about chunk_rows pitches, keeping
+the pitches of a game in the same chunk. The pitches of a game must be stored together.
+'''
+def read_raw_chunks(source, chunk_rows, columns = None):
+
+    usecols = None if columns is None else (lambda col: col in set(columns))
+    carry = None
+    seen_games = set()
+
+    for path in raw_files(source):
+        for piece in pd.read_csv(path, sep = ';', usecols = usecols, chunksize = chunk_rows):
+
+            if carry is not None:
+                piece = pd.concat([carry, piece], axis = 0, ignore_index = True)
+
+            # hold back the last game, its pitches may continue in the next piece
+            last_game = piece['game_pk'].iloc[-1]
+            is_last = (piece['game_pk'] == last_game).to_numpy()
+            carry = piece[is_last]
+            chunk = piece[~is_last]
+
+            if len(chunk):
+                games = set(chunk['game_pk'].unique())
+                if games & seen_games:
+                    raise ValueError("the pitches of a game are not stored together in {}".format(path))
+                seen_games |= games
+                yield chunk
+
+    if carry is not None and len(carry):
+        yield carry
+
+
+'''
+Define a function to pick the chunk size keeping the prep of a chunk under a memory ceiling
+'''
+def chunk_rows_for_memory(source, max_memory_mb):
+
+    # measure the memory of a raw pitch from a sample
+    sample = pd.read_csv(raw_files(source)[0], sep = ';', nrows = 1000)
+    bytes_per_row = sample.memory_usage(index = True, deep = True).sum() / max(len(sample), 1)
+
+    return max(1000, int(max_memory_mb * 1024**2 / (bytes_per_row * MEMORY_OVERHEAD)))
+
+
+'''
+Define a function to compute the season wide inputs of the prep in one pass over a few
+columns: the starting pitchers with at least min_pitches and the league average strike zone
+'''
+def season_context(source, chunk_rows, min_pitches = MIN_PITCHES):
+    return chunk_context(read_raw_chunks(source, chunk_rows, columns = CONTEXT_COLUMNS), min_pitches)
+
+
+'''
+Define a function to compute the season wide inputs of the prep from chunks of raw pitches
+'''
+def chunk_context(chunks, min_pitches = MIN_PITCHES):
+
+    starters = set()
+    pitch_counts = []
+    zone_sums = []
+
+    for chunk in chunks:
+
+        # only the first 9 innings are kept
+        chunk = chunk[chunk['inning'] <= 9.0]
+
+        # starting pitchers throw the first pitch with 0 outs in the first inning, flagged by the game state
+        starters.update(starting_pitchers(chunk))
+
+        pitch_counts.append(chunk.groupby('pitcher')['pitcher'].count())
+
+        # strike zone sums and counts of the pitches kept by the prep, by pitcher
+        zone_df = chunk[~chunk['pitch_type'].isin(RARE_PITCH_TYPES)]
+        zone_df = zone_df.assign(sz_mid = (zone_df['sz_bot'] + zone_df['sz_top'])/2)
+        zone_sums.append(zone_df.groupby('pitcher')[['sz_bot', 'sz_top', 'sz_mid']].agg(['sum', 'count']))
+
+    # starters who threw at least min_pitches over the season
+    pitch_counts = pd.concat(pitch_counts).groupby(level = 0).sum()
+    qualified = sorted(i for i in starters if pitch_counts.get(i, 0) >= min_pitches)
+
+    # league average strike zone over the pitches of the qualified starters
+    zone_sums = pd.concat(zone_sums).groupby(level = 0).sum()
+    zone_sums = zone_sums[zone_sums.index.isin(qualified)].sum()
+
+    context = {'starters': qualified}
+    for col in ['sz_bot', 'sz_top', 'sz_mid']:
+        context[col + '_avg'] = zone_sums[(col, 'sum')] / zone_sums[(col, 'count')]
+
+    return context
+
+
+'''
+Define a function to compute the season wide inputs of the prep of a delta of games:
+the season starters from the manifest and the league average strike zone over the kept
+pitches of the delta and the stored pitches of the other games
+'''
+def delta_context(manifest, delta_df, out_path, min_pitches = MIN_PITCHES):
+
+    starters = season_starters(manifest, min_pitches)
+    kept = pd.concat(list(filter_pitch_types(filter_starters([delta_df], starters))), axis = 0, ignore_index = True)
+
+    # the stored pitches of the delta's games are replaced by the delta
+    zone_df = kept[['sz_bot', 'sz_top']]
+    if os.path.isdir(out_path):
+        stored = read_pitch_data(out_path, columns = ['game_pk', 'sz_bot', 'sz_top'])
+        stored = stored[~stored['game_pk'].isin(kept['game_pk'].unique())]
+        zone_df = pd.concat([stored[['sz_bot', 'sz_top']].astype(float), zone_df], axis = 0, ignore_index = True)
+    zone_df = zone_df.assign(sz_mid = (zone_df['sz_bot'] + zone_df['sz_top'])/2)
+
+    context = {'starters': starters}
+    for col in ['sz_bot', 'sz_top', 'sz_mid']:
+        context[col + '_avg'] = zone_df[col].mean()
+
+    return context
+
+
+'''
+Define a generator stage keeping the first 9 innings of the starting pitchers
+'''
+def filter_starters(chunks, starters):
+
+    for chunk in chunks:
+        chunk = chunk[chunk['inning'] <= 9.0]
+        yield chunk[chunk['pitcher'].isin(starters)]
+
+
+'''
+Define a generator stage joining pitcher and batter names, name_lookup maps a list of ids
+to a dict of names and is only called with ids not seen in earlier chunks
+'''
+def join_names(chunks, name_lookup):
+
+    names = dict()
+
+    for chunk in chunks:
+        ids = pd.concat([chunk['pitcher'], chunk['batter']]).unique()
+        new_ids = [i for i in ids if i not in names]
+        if new_ids:
+            names.update(name_lookup(new_ids))
+
+        yield chunk.assign(pitcher_name = chunk['pitcher'].map(names), batter_name = chunk['batter'].map(names))
+
+
+'''
+Define a generator stage dropping the rarely thrown pitch types
+'''
+def filter_pitch_types(chunks):
+
+    for chunk in chunks:
+        yield chunk[~chunk['pitch_type'].isin(RARE_PITCH_TYPES)]
+
+
+'''
+Define a generator stage deriving the report features, the same features as the data
+preparation notebook. The strike zone averages come from the season context.
+'''
+def derive_features(chunks, context):
+
+    for df in chunks:
+        df = df.copy()
+
+        # replace four balls with three and encode the count and count advantage from balls * 3 + strikes
+        df.loc[df['balls'] == 4, 'balls'] = 3
+        df['count'], df['count_advantage'] = count_features(df['balls'], df['strikes'])
+
+        # on base indicators and runners on base category from the base state mask
+        indicators, df['runners_on_base'] = runner_features(df)
+        for col, values in indicators.items():
+            df[col] = values
+
+        # strike and whiff indicators
+        df['strike_ind'] = df['description'].isin(STRIKE_DESCRIPTIONS)
+        df['whiff_ind'] = np.where(df['description'].isin(WHIFF_DESCRIPTIONS), 1,
+                          np.where(df['description'].isin(CONTACT_DESCRIPTIONS), 0, np.nan))
+
+        # reconstruct the game state in one pass over the pitches sorted by game, at bat and pitch number
+        state = game_state(df)
+
+        # times the pitcher has faced the batter in the game
+        df['tto'] = state['tto']
+
+        # pitching team's score minus the batting team's score
+        df['run_differential'] = df['fld_score'] - df['bat_score']
+
+        # pitch height normalized to the league average strike zone
+        df['sz_mid'] = (df['sz_bot'] + df['sz_top'])/2
+        df['plate_z_norm'] = (df['plate_z'] - df['sz_mid']) / (df['sz_mid'] - df['sz_bot']) * \
+                             (context['sz_mid_avg'] - context['sz_bot_avg']) + context['sz_mid_avg']
+
+        # batted ball type label from the launch_speed_angle code
+        df['batted_ball_type'] = batted_ball_type(df['launch_speed_angle'])
+
+        # reformat the event names
+        df['events'] = df['events'].str.replace("_", " ").str.capitalize()
+
+        # next count in the at bat
+        df['lead_count'] = state['lead_count']
+
+        yield df
+
+
+'''
+Define a function to chain the prep stages over the raw data chunks
+'''
+def prep_chunks(source, context, chunk_rows, name_lookup):
+
+    chunks = read_raw_chunks(source, chunk_rows)
+    chunks = filter_starters(chunks, context['starters'])
+    chunks = join_names(chunks, name_lookup)
+    chunks = filter_pitch_types(chunks)
+    chunks = derive_features(chunks, context)
+
+    return chunks
+
+
+'''
+Define a function to run the streaming prep, writing each prepped chunk to the
+partitioned pitch data as it is done. Peak memory follows the chunk size, which is
+picked from max_memory_mb unless chunk_rows is given. Player names are kept in the
+registry at names_path.
+'''
+def run_prep(source, out_path, max_memory_mb = 512, chunk_rows = None, names_path = None, name_lookup = None,
+             min_pitches = MIN_PITCHES, verbose = True):
+
+    # names come from the registry unless another lookup is given
+    if name_lookup is None:
+        name_lookup = PlayerNameRegistry(names_path).lookup
+
+    if chunk_rows is None:
+        chunk_rows = chunk_rows_for_memory(source, max_memory_mb)
+
+    context = season_context(source, chunk_rows, min_pitches)
+
+    if verbose:
+        print(f"{len(context['starters'])} starting pitchers, chunks of {chunk_rows} pitches")
+
+    # the prepped data is rebuilt from scratch
+    if os.path.isdir(out_path):
+        shutil.rmtree(out_path)
+
+    schema = None
+    n_rows = 0
+
+    for i, df in enumerate(prep_chunks(source, context, chunk_rows, name_lookup)):
+        if not len(df):
+            continue
+
+        df = apply_pitch_schema(df)
+
+        # every chunk is written with the column types of the first one
+        if schema is None:
+            schema = unified_schema(pa.Table.from_pandas(df, preserve_index = False).schema)
+
+        write_pitch_data(df, out_path, basename_template = f'chunk-{i}-{{i}}.parquet', schema = schema)
+        n_rows += len(df)
+
+        if verbose:
+            print(f"chunk {i}: wrote {len(df)} pitches")
+
+    # store the count transitions of every pitcher for the count flow chart, and the
+    # profile and stat cube the data is queried with on disk
+    if n_rows:
+        write_count_flow(out_path)
+        write_profile(out_path)
+        write_stat_cube(out_path)
+
+    return n_rows
+
+
+'''
+Define a function to prep only the games added or corrected by the last daily refresh,
+plus every game of starters who newly reached min_pitches, and update the stored pitch
+data with them. Only the count transitions, profile and stat cube of the pitchers in the
+delta are rebuilt.
+'''
+def run_delta_prep(raw_dir, out_path, names_path = None, name_lookup = None, min_pitches = MIN_PITCHES, verbose = True):
+
+    # names come from the registry unless another lookup is given
+    if name_lookup is None:
+        name_lookup = PlayerNameRegistry(names_path).lookup
+
+    # the manifest holds the starters and pitch counts of the whole stored season
+    manifest = read_manifest(raw_dir)
+    stored_pitchers = read_pitch_data(out_path, columns = ['pitcher'])['pitcher'].unique() if os.path.isdir(out_path) else []
+    delta_df = load_raw_data(raw_dir, game_pks = prep_game_pks(manifest, stored_pitchers, min_pitches))
+
+    if not len(delta_df):
+        return 0
+
+    context = delta_context(manifest, delta_df, out_path, min_pitches)
+
+    chunks = filter_starters([delta_df], context['starters'])
+    chunks = join_names(chunks, name_lookup)
+    chunks = filter_pitch_types(chunks)
+    chunks = derive_features(chunks, context)
+    df = apply_pitch_schema(pd.concat(list(chunks), axis = 0, ignore_index = True))
+
+    if verbose:
+        print(f"delta of {len(delta_df)} pitches, {len(df)} kept")
+
+    if not len(df):
+        return 0
+
+    # only the partitions of the delta's pitchers are rewritten, and their summaries rebuilt
+    update_pitch_data(df, out_path)
+
+    delta_pitchers = df['pitcher'].unique().tolist()
+    write_count_flow(out_path, pitchers = delta_pitchers)
+    write_profile(out_path, pitchers = delta_pitchers)
+    write_stat_cube(out_path, pitchers = delta_pitchers)
+
+    return len(df)
+
+
+##### Run Prep -----
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description = "Prep the raw statcast data in game chunks with bounded memory")
+    parser.add_argument("source", help = "raw csv file or raw data directory of the daily refresh")
+    parser.add_argument("out_path", help = "directory of the partitioned prepped pitch data")
+    parser.add_argument("--max-memory-mb", type = float, default = 512, help = "memory ceiling of a chunk")
+    parser.add_argument("--chunk-rows", type = int, default = None, help = "pitches per chunk, overrides the memory ceiling")
+    parser.add_argument("--names-path", default = None, help = "csv registry of player names by id")
+    parser.add_argument("--delta", action = "store_true", help = "only prep the last delta of the raw data directory")
+    args = parser.parse_args()
+
+    if args.delta:
+        n_rows = run_delta_prep(args.source, args.out_path, names_path = args.names_path)
+    else:
+        n_rows = run_prep(args.source, args.out_path, max_memory_mb = args.max_memory_mb, chunk_rows = args.chunk_rows,
+                          names_path = args.names_path)
+    print(f"prepped {n_rows} pitches")
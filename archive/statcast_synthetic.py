@@ -0,0 +1,466 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+
+# teams of the statcast downloader
+from statcast_download import VALID_TEAMS
+
+# data preparation stages and compact schema
+from statcast_prep import (CONTEXT_COLUMNS, chunk_context, derive_features, filter_pitch_types,
+                           filter_starters, join_names)
+from schema import apply_pitch_schema
+
+
+##### Global Options -----
+
+# one season: 30 teams, 2430 games from April through September
+TEAMS = [team for team in VALID_TEAMS if team not in ['ANA', 'WAS']]
+GAMES_PER_SEASON = 2430
+SEASON_START = "2021-04-01"
+SEASON_DAYS = 183
+
+# roster of each team: 5 starters make 150 starters, 33 batters make about 1000 batters
+STARTERS_PER_TEAM = 5
+RELIEVERS_PER_TEAM = 8
+BATTERS_PER_TEAM = 33
+
+# player id ranges of the starters, relievers and batters
+STARTER_ID = 500000
+RELIEVER_ID = 510000
+BATTER_ID = 520000
+
+# at bat slots simulated for each half of a game, enough for 27 outs
+AT_BAT_SLOTS = 55
+
+# longest at bat simulated in pitches
+MAX_PITCHES = 15
+
+# pitch outcomes and their probabilities
+PITCH_OUTCOMES = ['ball', 'called_strike', 'swinging_strike', 'foul', 'hit_into_play', 'hit_by_pitch']
+PITCH_OUTCOME_PROBS = [0.365, 0.17, 0.11, 0.18, 0.172, 0.003]
+
+# results of balls in play and their probabilities, and the woba value of each result
+IN_PLAY_EVENTS = ['field_out', 'single', 'double', 'triple', 'home_run']
+IN_PLAY_PROBS = [0.68, 0.2, 0.065, 0.006, 0.049]
+WOBA_VALUES = {'field_out': 0.0, 'strikeout': 0.0, 'walk': 0.69, 'hit_by_pitch': 0.72, 'single': 0.89,
+               'double': 1.27, 'triple': 1.62, 'home_run': 2.1}
+
+# launch_speed_angle codes of balls in play and their probabilities
+LAUNCH_SPEED_ANGLE_PROBS = [0.05, 0.33, 0.25, 0.25, 0.05, 0.07]
+
+# pitch types: name, speed (mph), spin rate (rpm), horizontal and vertical movement (ft)
+PITCH_TYPES = {'FF': ('4-Seam Fastball', 94, 2300, -0.6, 1.3),
+               'SI': ('Sinker', 93, 2150, -1.2, 0.7),
+               'FC': ('Cutter', 89, 2400, 0.2, 0.7),
+               'SL': ('Slider', 85, 2450, 0.5, 0.1),
+               'CU': ('Curveball', 79, 2550, 0.8, -0.8),
+               'KC': ('Knuckle Curve', 82, 2450, 0.7, -0.6),
+               'CH': ('Changeup', 85, 1750, -1.2, 0.5),
+               'FS': ('Split-Finger', 86, 1400, -0.8, 0.2)}
+
+# rare pitch types, thrown on a small share of pitches and dropped by the prep
+RARE_PITCH_TYPES = {'EP': ('Eephus', 60, 1200, 0.3, 0.2),
+                    'CS': ('Slow Curve', 67, 2100, 0.7, -0.9),
+                    'FA': ('Other', 70, 1500, 0.0, 0.5)}
+RARE_PITCH_SHARE = 0.002
+
+
+##### Define Functions -----
+
+'''
+Define a function to get the synthetic name of a player id
+'''
+def synthetic_name(player_id):
+
+    player_id = int(player_id)
+
+    if player_id >= BATTER_ID:
+        return "Batter {}".format(player_id - BATTER_ID)
+    if player_id >= RELIEVER_ID:
+        return "Reliever {}".format(player_id - RELIEVER_ID)
+
+    return "Starter {}".format(player_id - STARTER_ID)
+
+
+'''
+Define a function to look up the synthetic names of a list of ids, a stand in for the
+player name registry
+'''
+def synthetic_names(ids):
+    return {i: synthetic_name(i) for i in ids}
+
+
+'''
+Define a function to simulate the pitch sequences of n at bats. Returns the at bat,
+pitch number, balls, strikes and outcome code of every pitch, ordered by at bat and
+pitch, and the code of the last outcome of each at bat.
+'''
+def simulate_at_bats(n, rng):
+
+    balls = np.zeros(n, dtype = np.int8)
+    strikes = np.zeros(n, dtype = np.int8)
+    alive = np.arange(n)
+    last_outcome = np.zeros(n, dtype = np.int8)
+    pitches = []
+
+    for pitch_number in range(1, MAX_PITCHES + 1):
+
+        outcome = rng.choice(len(PITCH_OUTCOMES), size = len(alive), p = PITCH_OUTCOME_PROBS).astype(np.int8)
+
+        # the last pitch of a long at bat is put in play
+        if pitch_number == MAX_PITCHES:
+            outcome[:] = PITCH_OUTCOMES.index('hit_into_play')
+
+        pitches.append((alive, np.full(len(alive), pitch_number, dtype = np.int8), balls[alive], strikes[alive], outcome))
+
+        # balls, strikes and fouls before two strikes move the count
+        balls[alive] += outcome == 0
+        strikes[alive] += (outcome == 1) | (outcome == 2) | ((outcome == 3) & (strikes[alive] < 2))
+
+        # at bats end with a walk, a strikeout, a ball in play or a hit batter
+        done = (balls[alive] == 4) | (strikes[alive] == 3) | (outcome >= 4)
+        last_outcome[alive[done]] = outcome[done]
+        alive = alive[~done]
+
+        if not len(alive):
+            break
+
+    at_bat, pitch_number, balls_before, strikes_before, outcome = [np.concatenate(arrays) for arrays in zip(*pitches)]
+    order = np.lexsort((pitch_number, at_bat))
+
+    pitches = {'at_bat': at_bat[order], 'pitch_number': pitch_number[order], 'balls': balls_before[order],
+               'strikes': strikes_before[order], 'outcome': outcome[order]}
+
+    return pitches, balls, strikes, last_outcome
+
+
+'''
+Define a function to play the at bat slots of each half of a game through 9 innings:
+outs, runners and runs scored follow from the result of each at bat. Returns the
+inning, outs, runners on base and runs scored before each at bat, which at bats were
+played, and the runs scored by inning of each half.
+'''
+def play_halves(results, n_halves):
+
+    results = results.reshape(n_halves, AT_BAT_SLOTS)
+    shape = results.shape
+
+    inning = np.zeros(shape, dtype = np.int8)
+    outs = np.zeros(shape, dtype = np.int8)
+    bases = np.zeros(shape, dtype = np.int8)
+    runs_before = np.zeros(shape, dtype = np.int16)
+    played = np.zeros(shape, dtype = bool)
+    runs_by_inning = np.zeros((n_halves, 9), dtype = np.int16)
+
+    state_inning = np.ones(n_halves, dtype = np.int8)
+    state_outs = np.zeros(n_halves, dtype = np.int8)
+    state_bases = np.zeros(n_halves, dtype = np.int8)
+    state_runs = np.zeros(n_halves, dtype = np.int16)
+    halves = np.arange(n_halves)
+
+    for slot in range(AT_BAT_SLOTS):
+
+        result = results[:, slot]
+        active = state_inning <= 9
+
+        inning[:, slot] = state_inning
+        outs[:, slot] = state_outs
+        bases[:, slot] = state_bases
+        runs_before[:, slot] = state_runs
+        played[:, slot] = active
+
+        b1, b2, b3 = state_bases & 1, (state_bases >> 1) & 1, (state_bases >> 2) & 1
+        runners = b1 + b2 + b3
+
+        # runners advance on each result, walks and hit batters only force runners
+        walk = (result == 'walk') | (result == 'hit_by_pitch')
+        forced_bases = np.where(b1 == 0, state_bases | 1, np.where(b2 == 0, state_bases | 3, 7))
+        new_bases = np.select([walk, result == 'single', result == 'double', result == 'triple', result == 'home_run'],
+                              [forced_bases, ((state_bases << 1) & 7) | 1, ((state_bases << 2) & 7) | 2, 4, 0], state_bases)
+        runs = np.select([walk, result == 'single', result == 'double', result == 'triple', result == 'home_run'],
+                         [b1 & b2 & b3, b3, b2 + b3, runners, runners + 1], 0).astype(np.int16)
+        is_out = (result == 'field_out') | (result == 'strikeout')
+
+        runs = np.where(active, runs, 0)
+        state_runs = state_runs + runs
+        np.add.at(runs_by_inning, (halves[active], state_inning[active] - 1), runs[active])
+
+        # the third out ends the inning and clears the bases
+        state_bases = np.where(is_out, state_bases, new_bases).astype(np.int8)
+        state_outs = state_outs + is_out
+        inning_over = state_outs == 3
+        state_inning = np.where(inning_over, state_inning + 1, state_inning).astype(np.int8)
+        state_outs = np.where(inning_over, 0, state_outs).astype(np.int8)
+        state_bases = np.where(inning_over, 0, state_bases).astype(np.int8)
+
+    return inning.ravel(), outs.ravel(), bases.ravel(), runs_before.ravel(), played.ravel(), runs_by_inning
+
+
+'''
+Define a function to generate the pitchers of the league: the pitch mix, movement,
+release point and handedness of every starter and reliever
+'''
+def league_pitchers(rng):
+
+    ids = np.concatenate([STARTER_ID + np.arange(len(TEAMS) * STARTERS_PER_TEAM),
+                          RELIEVER_ID + np.arange(len(TEAMS) * RELIEVERS_PER_TEAM)])
+    n = len(ids)
+
+    pitch_types = list(PITCH_TYPES) + list(RARE_PITCH_TYPES)
+    n_types = len(pitch_types)
+
+    # each pitcher throws a fastball and two to four other pitches
+    mix = np.zeros((n, n_types))
+    mix[:, 0] = rng.uniform(0.3, 0.6, n)
+    for i in range(n):
+        others = rng.choice(np.arange(1, len(PITCH_TYPES)), size = rng.integers(2, 5), replace = False)
+        mix[i, others] = rng.dirichlet(np.ones(len(others))) * (1 - mix[i, 0])
+    mix[:, len(PITCH_TYPES):] = RARE_PITCH_SHARE / len(RARE_PITCH_TYPES)
+    mix /= mix.sum(axis = 1, keepdims = True)
+
+    throws = np.where(rng.random(n) < 0.7, 'R', 'L')
+    side = np.where(throws == 'R', -1, 1)
+
+    return {'ids': ids,
+            'index': {player_id: i for i, player_id in enumerate(ids)},
+            'pitch_types': np.array(pitch_types),
+            'mix_cumsum': np.cumsum(mix, axis = 1),
+            'throws': throws,
+            'release_x': side * rng.normal(1.9, 0.5, n),
+            'release_z': rng.normal(5.8, 0.35, n),
+            'speed_offset': rng.normal(0, 1.5, n),
+            'spin_offset': rng.normal(0, 120, n),
+            'movement_offset': rng.normal(0, 0.15, (n, 2)),
+            'side': side}
+
+
+'''
+Define a function to generate one season of raw statcast pitches for a share of the
+full season's games, in the columns of the downloaded data used by the prep
+'''
+def synthetic_season(season = 2021, share = 1.0, seed = 0):
+
+    rng = np.random.default_rng([seed, season])
+    pitchers = league_pitchers(np.random.default_rng(seed))
+    n_teams = len(TEAMS)
+
+    ##### schedule -----
+
+    n_games = max(1, int(round(GAMES_PER_SEASON * share)))
+    game_pk = (season - 2000) * 100000 + np.arange(n_games)
+    start = pd.Timestamp(SEASON_START.replace("2021", str(season)))
+    game_date = start + pd.to_timedelta((np.arange(n_games) * SEASON_DAYS) // GAMES_PER_SEASON, unit = 'D')
+
+    away = rng.integers(0, n_teams, n_games)
+    home = (away + rng.integers(1, n_teams, n_games)) % n_teams
+
+    # starters take turns through each team's rotation
+    team_games = pd.DataFrame({'game': np.repeat(np.arange(n_games), 2), 'team': np.column_stack([away, home]).ravel()})
+    rotation = team_games.groupby('team').cumcount().to_numpy() % STARTERS_PER_TEAM
+    starter = (STARTER_ID + team_games['team'].to_numpy() * STARTERS_PER_TEAM + rotation).reshape(n_games, 2)
+
+    ##### at bats -----
+
+    # half 0 is the top of the inning with the away team batting, half 1 the bottom
+    n_halves = n_games * 2
+    batting_team = np.column_stack([away, home]).ravel()
+    fielding_team = np.column_stack([home, away]).ravel()
+    half_starter = starter[:, ::-1].ravel()
+
+    pitches, balls, strikes, last_outcome = simulate_at_bats(n_halves * AT_BAT_SLOTS, rng)
+
+    result = np.select([balls == 4, strikes == 3, last_outcome == PITCH_OUTCOMES.index('hit_by_pitch')],
+                       ['walk', 'strikeout', 'hit_by_pitch'], '')
+    in_play = result == ''
+    result[in_play] = rng.choice(IN_PLAY_EVENTS, size = in_play.sum(), p = IN_PLAY_PROBS)
+
+    inning, outs, bases, runs_before, played, runs_by_inning = play_halves(result, n_halves)
+
+    half = np.repeat(np.arange(n_halves), AT_BAT_SLOTS)
+    slot = np.tile(np.arange(AT_BAT_SLOTS), n_halves)
+
+    # batters come up in lineup order, 9 of the team's batters each game
+    lineups = rng.random((n_halves, BATTERS_PER_TEAM)).argsort(axis = 1)[:, :9]
+    batter = BATTER_ID + batting_team[half] * BATTERS_PER_TEAM + lineups[half, slot % 9]
+
+    # starters pitch five to seven innings, relievers one inning each
+    exit_inning = rng.integers(5, 8, n_halves)
+    relievers = RELIEVER_ID + fielding_team[:, None] * RELIEVERS_PER_TEAM + rng.integers(0, RELIEVERS_PER_TEAM, (n_halves, 9))
+    pitcher = np.where(inning <= exit_inning[half], half_starter[half], relievers[half, np.minimum(inning, 9) - 1])
+
+    # the fielding team's score, runs of the other half through the previous inning or this one
+    other_runs = np.cumsum(runs_by_inning.reshape(n_games, 2, 9)[:, ::-1, :], axis = 2).reshape(n_halves, 9)
+    top = half % 2 == 0
+    innings_done = np.clip(np.where(top, inning - 1, inning), 0, 9)
+    fld_score = np.where(innings_done > 0, other_runs[half, np.maximum(innings_done, 1) - 1], 0)
+
+    at_bats = pd.DataFrame({'game': half // 2, 'half': half % 2, 'slot': slot, 'inning': inning, 'outs_when_up': outs,
+                            'bases': bases, 'bat_score': runs_before, 'fld_score': fld_score, 'batter': batter,
+                            'pitcher': pitcher, 'result': result, 'at_bat': np.arange(len(half))})[played]
+
+    # at bats are numbered through the game in the order they were played
+    at_bats = at_bats.sort_values(['game', 'inning', 'half', 'slot'])
+    at_bats['at_bat_number'] = at_bats.groupby('game').cumcount() + 1
+
+    ##### pitches -----
+
+    keep = np.zeros(n_halves * AT_BAT_SLOTS, dtype = bool)
+    keep[at_bats['at_bat'].to_numpy()] = True
+    keep = keep[pitches['at_bat']]
+    pitches = {col: values[keep] for col, values in pitches.items()}
+
+    df = at_bats.set_index('at_bat').loc[pitches['at_bat']].reset_index(drop = True)
+    n = len(df)
+
+    outcome = pitches['outcome']
+    is_last = np.append(pitches['at_bat'][1:] != pitches['at_bat'][:-1], True)
+
+    # pitch type from the pitcher's mix
+    pitcher_index = df['pitcher'].map(pitchers['index']).to_numpy()
+    type_index = (rng.random(n)[:, None] > pitchers['mix_cumsum'][pitcher_index]).sum(axis = 1)
+    type_index = np.minimum(type_index, len(pitchers['pitch_types']) - 1)
+    pitch_type = pitchers['pitch_types'][type_index]
+    type_table = pd.DataFrame.from_dict({**PITCH_TYPES, **RARE_PITCH_TYPES}, orient = 'index',
+                                        columns = ['pitch_name', 'speed', 'spin', 'pfx_x', 'pfx_z']).loc[pitch_type]
+
+    # batters keep their stance and strike zone
+    batter_index = df['batter'].to_numpy() - BATTER_ID
+    batter_rng = np.random.default_rng(seed + 1)
+    stands = np.where(batter_rng.random(n_teams * BATTERS_PER_TEAM) < 0.6, 'R', 'L')
+    sz_tops = batter_rng.normal(3.4, 0.12, n_teams * BATTERS_PER_TEAM)
+    sz_bots = batter_rng.normal(1.6, 0.08, n_teams * BATTERS_PER_TEAM)
+
+    # some pitches are blocked balls and blocked swinging strikes
+    description = np.array(PITCH_OUTCOMES, dtype = object)[outcome]
+    blocked = rng.random(n) < 0.08
+    description[(outcome == 0) & blocked] = 'blocked_ball'
+    description[(outcome == 2) & blocked] = 'swinging_strike_blocked'
+
+    # the result of the at bat is recorded on its last pitch
+    events = np.where(is_last, df['result'].to_numpy(), None)
+    ball_in_play = is_last & (outcome == PITCH_OUTCOMES.index('hit_into_play'))
+    woba_value = np.where(is_last, pd.Series(events).map(WOBA_VALUES).to_numpy(dtype = float), np.nan)
+
+    side = pitchers['side'][pitcher_index]
+    movement = pitchers['movement_offset'][pitcher_index]
+
+    raw = pd.DataFrame({
+        'game_date': game_date[df['game'].to_numpy()],
+        'game_pk': game_pk[df['game'].to_numpy()].astype(float),
+        'game_year': float(season),
+        'home_team': np.array(TEAMS)[home[df['game'].to_numpy()]],
+        'away_team': np.array(TEAMS)[away[df['game'].to_numpy()]],
+        'inning': df['inning'].to_numpy().astype(float),
+        'inning_topbot': np.where(df['half'].to_numpy() == 0, 'Top', 'Bot'),
+        'outs_when_up': df['outs_when_up'].to_numpy().astype(float),
+        'at_bat_number': df['at_bat_number'].to_numpy(),
+        'pitch_number': pitches['pitch_number'].astype(int),
+        'pitcher': df['pitcher'].to_numpy().astype(float),
+        'batter': df['batter'].to_numpy().astype(float),
+        'stand': stands[batter_index],
+        'p_throws': pitchers['throws'][pitcher_index],
+        'pitch_type': pitch_type,
+        'pitch_name': type_table['pitch_name'].to_numpy(),
+        'description': description,
+        'events': events,
+        'balls': pitches['balls'].astype(float),
+        'strikes': pitches['strikes'].astype(float),
+        'on_1b': np.where(df['bases'].to_numpy() & 1, 1.0, np.nan),
+        'on_2b': np.where(df['bases'].to_numpy() & 2, 1.0, np.nan),
+        'on_3b': np.where(df['bases'].to_numpy() & 4, 1.0, np.nan),
+        'bat_score': df['bat_score'].to_numpy(),
+        'fld_score': df['fld_score'].to_numpy(),
+        'sz_top': sz_tops[batter_index] + rng.normal(0, 0.05, n),
+        'sz_bot': sz_bots[batter_index] + rng.normal(0, 0.05, n),
+        'plate_x': rng.normal(0, 0.85, n),
+        'plate_z': rng.normal(2.4, 0.9, n),
+        'pfx_x': side * type_table['pfx_x'].to_numpy() + movement[:, 0] + rng.normal(0, 0.15, n),
+        'pfx_z': type_table['pfx_z'].to_numpy() + movement[:, 1] + rng.normal(0, 0.15, n),
+        'release_pos_x': pitchers['release_x'][pitcher_index] + rng.normal(0, 0.12, n),
+        'release_pos_y': rng.normal(54, 0.4, n),
+        'release_pos_z': pitchers['release_z'][pitcher_index] + rng.normal(0, 0.1, n),
+        'release_speed': type_table['speed'].to_numpy() + pitchers['speed_offset'][pitcher_index] + rng.normal(0, 0.8, n),
+        'release_spin_rate': type_table['spin'].to_numpy() + pitchers['spin_offset'][pitcher_index] + rng.normal(0, 60, n),
+        'launch_speed': np.where(ball_in_play, rng.normal(89, 14, n), np.nan),
+        'launch_angle': np.where(ball_in_play, rng.normal(12, 25, n), np.nan),
+        'launch_speed_angle': np.where(ball_in_play, rng.choice(np.arange(1, 7), size = n, p = LAUNCH_SPEED_ANGLE_PROBS), np.nan),
+        'hc_x': np.where(ball_in_play, rng.normal(125, 35, n), np.nan),
+        'hc_y': np.where(ball_in_play, rng.normal(130, 40, n), np.nan),
+        'woba_value': woba_value,
+        'woba_denom': np.where(is_last, 1.0, np.nan),
+    })
+
+    # a few pitches miss their tracking measurements
+    for col in ['plate_x', 'plate_z', 'release_spin_rate']:
+        raw.loc[rng.random(n) < 0.002, col] = np.nan
+
+    # newest first, the order of the downloaded data
+    raw = raw.sort_values(['game_date', 'game_pk', 'at_bat_number', 'pitch_number'], ascending = False)
+
+    return raw.reset_index()
+
+
+'''
+Define a function to list the seasons and share of a season's games of a data scale,
+where 1 is one full season
+'''
+def scale_seasons(scale, first_season = 2021):
+
+    seasons = []
+    remaining = scale
+    season = first_season
+
+    while remaining > 1e-9:
+        seasons.append((season, min(remaining, 1.0)))
+        remaining -= 1.0
+        season += 1
+
+    return seasons
+
+
+'''
+Define a function to prep one season of raw pitches into the pitch data of the
+scouting report, with the stages of the data preparation
+'''
+def prep_season(raw):
+
+    context = chunk_context([raw[CONTEXT_COLUMNS]])
+
+    chunks = filter_starters([raw], context['starters'])
+    chunks = join_names(chunks, synthetic_names)
+    chunks = filter_pitch_types(chunks)
+    chunks = derive_features(chunks, context)
+
+    return apply_pitch_schema(pd.concat(list(chunks), axis = 0, ignore_index = True))
+
+
+'''
+Define a function to concatenate pitch data frames, keeping categorical columns categorical
+'''
+def concat_pitch_data(dfs):
+
+    if len(dfs) == 1:
+        return dfs[0]
+
+    columns = dict()
+    for col in dfs[0].columns:
+        if isinstance(dfs[0][col].dtype, pd.CategoricalDtype):
+            categories = list(dict.fromkeys(c for df in dfs for c in df[col].cat.categories))
+            columns[col] = pd.Categorical(pd.concat([df[col].astype(object) for df in dfs], ignore_index = True), categories = categories)
+
+    data = pd.concat(dfs, axis = 0, ignore_index = True)
+
+    return data.assign(**columns)
+
+
+'''
+Define a function to generate prepped pitch data with the schema of pitch_data at a
+data scale, where 1 is one full season of about 150 starting pitchers
+'''
+def synthetic_pitch_data(scale = 1.0, seed = 0):
+
+    dfs = [prep_season(synthetic_season(season, share, seed)) for season, share in scale_seasons(scale)]
+
+    return concat_pitch_data(dfs)
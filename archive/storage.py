@@ -0,0 +1,256 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+import os
+import shutil
+
+# columnar storage
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+# compact pitch data schema
+from schema import apply_pitch_schema
+
+
+##### Global Options -----
+
+# columns the pitch data is partitioned on, one directory level each
+PARTITION_COLUMNS = ['game_year', 'pitcher']
+
+
+##### Define Functions -----
+
+'''
+Define a function to check if a path points to columnar pitch data rather than a csv
+'''
+def is_columnar_path(in_path):
+    return os.path.isdir(in_path) or in_path.endswith(('.parquet', '.arrow', '.feather'))
+
+
+'''
+Define a function to widen the dictionary indexes of a schema so label columns with
+any number of categories share one type across chunks
+'''
+def unified_schema(schema):
+
+    fields = [pa.field(field.name, pa.dictionary(pa.int32(), field.type.value_type)) if pa.types.is_dictionary(field.type) else field
+              for field in schema]
+
+    return pa.schema(fields)
+
+
+'''
+Define a function to write the prepped pitch data as a parquet dataset partitioned
+by season and pitcher, replacing any partitions already written for the same keys.
+Chunks of one dataset are written with their own basename and a shared schema,
+keeping the files already written.
+'''
+def write_pitch_data(df, out_path, partition_cols = PARTITION_COLUMNS, basename_template = None, schema = None):
+
+    # derive the season from the game date if the raw season column was dropped
+    if 'game_year' in partition_cols and 'game_year' not in df.columns:
+        df = df.assign(game_year = pd.to_datetime(df['game_date']).dt.year)
+
+    # labels built with np.where hold the string 'nan', store them as missing like the csv did
+    text_cols = df.select_dtypes(include = 'object').columns
+    df = df.assign(**{col: df[col].mask(df[col] == 'nan') for col in text_cols})
+
+    table = pa.Table.from_pandas(df, schema = schema, preserve_index = False)
+
+    partitioning = ds.partitioning(pa.schema([table.schema.field(col) for col in partition_cols]), flavor = 'hive')
+
+    ds.write_dataset(table,
+                     out_path,
+                     format = 'parquet',
+                     partitioning = partitioning,
+                     basename_template = 'part-{i}.parquet' if basename_template is None else basename_template,
+                     existing_data_behavior = 'delete_matching' if basename_template is None else 'overwrite_or_ignore')
+
+
+'''
+Define a function to replace a directory with a newly written one. The previous
+directory is moved aside before the new one takes its place and removed after, so
+nothing of it is left behind.
+'''
+def replace_directory(new_path, out_path):
+
+    out_path = os.path.normpath(out_path)
+    old_path = out_path + '.old'
+
+    if os.path.isdir(old_path):
+        shutil.rmtree(old_path)
+    if os.path.isdir(out_path):
+        os.rename(out_path, old_path)
+
+    os.rename(new_path, out_path)
+
+    if os.path.isdir(old_path):
+        shutil.rmtree(old_path)
+
+
+'''
+Define a function to write a summary table of the pitch data, partitioned by season and
+pitcher as the pitch data, replacing the partitions already written for the same keys
+'''
+def write_summary_partitions(table, out_path):
+
+    partitioning = ds.partitioning(pa.schema([table.schema.field(col) for col in PARTITION_COLUMNS]), flavor = 'hive')
+
+    ds.write_dataset(table,
+                     out_path,
+                     format = 'parquet',
+                     partitioning = partitioning,
+                     basename_template = 'part-{i}.parquet',
+                     existing_data_behavior = 'delete_matching')
+
+
+'''
+Define a function to get the directory a summary stored with the pitch data is written
+to: the summary itself when only some pitchers are updated, or an empty directory next
+to it when the summary is rebuilt
+'''
+def summary_write_path(summary_path, rebuild):
+
+    if not rebuild:
+        return summary_path
+
+    out_path = summary_path + '.new'
+    if os.path.isdir(out_path):
+        shutil.rmtree(out_path)
+    os.makedirs(out_path)
+
+    return out_path
+
+
+'''
+Define a function to swap a rebuilt summary in, of every season or of the rebuilt
+seasons only, so the summaries of pitchers no longer stored are removed
+'''
+def replace_summary(new_path, summary_path, seasons = None):
+
+    if seasons is None:
+        replace_directory(new_path, summary_path)
+        return
+
+    os.makedirs(summary_path, exist_ok = True)
+    for season in seasons:
+        season_dir = 'game_year={}'.format(season)
+        if os.path.isdir(os.path.join(new_path, season_dir)):
+            replace_directory(os.path.join(new_path, season_dir), os.path.join(summary_path, season_dir))
+        elif os.path.isdir(os.path.join(summary_path, season_dir)):
+            shutil.rmtree(os.path.join(summary_path, season_dir))
+
+    shutil.rmtree(new_path)
+
+
+'''
+Define a function to open a summary stored with the pitch data, or None if the pitch
+data has none
+'''
+def open_summary_dataset(summary_path):
+
+    if not os.path.isdir(summary_path):
+        return None
+
+    return ds.dataset(summary_path, format = 'parquet', partitioning = 'hive')
+
+
+'''
+Define a function to replace the whole prepped pitch data with a full prep. The data is
+written next to the stored data and swapped in, so partitions of pitchers no longer
+kept are removed rather than served alongside the new ones.
+'''
+def replace_pitch_data(df, out_path, partition_cols = PARTITION_COLUMNS):
+
+    new_path = os.path.normpath(out_path) + '.new'
+    if os.path.isdir(new_path):
+        shutil.rmtree(new_path)
+
+    write_pitch_data(df, new_path, partition_cols)
+    replace_directory(new_path, out_path)
+
+
+'''
+Define a function to update the prepped pitch data with newly prepped games. Only the
+partitions of the seasons and pitchers in the new data are read and rewritten, stored
+pitches of the same games are replaced.
+'''
+def update_pitch_data(df, out_path, partition_cols = PARTITION_COLUMNS, key = 'game_pk'):
+
+    if not os.path.isdir(out_path):
+        return write_pitch_data(df, out_path, partition_cols)
+
+    if 'game_year' in partition_cols and 'game_year' not in df.columns:
+        df = df.assign(game_year = pd.to_datetime(df['game_date']).dt.year)
+
+    # read the stored partitions the new games fall in and drop the games being replaced
+    stored = read_pitch_data(out_path, seasons = df['game_year'].unique().tolist(), pitchers = df['pitcher'].unique().tolist())
+    stored = stored[~stored[key].isin(df[key].unique())]
+
+    # align the label categories of the stored and new pitches before combining them
+    combined = pd.concat([stored, df], axis = 0, ignore_index = True)
+    combined = apply_pitch_schema(combined)
+
+    write_pitch_data(combined, out_path, partition_cols)
+
+
+'''
+Define a function to open the pitch data as a memory mapped dataset
+'''
+def open_pitch_dataset(in_path):
+
+    # memory map the files rather than reading them into buffers
+    filesystem = fs.LocalFileSystem(use_mmap = True)
+
+    if os.path.isdir(in_path):
+        dataset = ds.dataset(in_path, format = 'parquet', partitioning = 'hive', filesystem = filesystem)
+    else:
+        file_format = 'parquet' if in_path.endswith('.parquet') else 'ipc'
+        dataset = ds.dataset(in_path, format = file_format, filesystem = filesystem)
+
+    # files written apart may store labels with narrower dictionary indexes than others
+    return ds.FileSystemDataset(list(dataset.get_fragments()), unified_schema(dataset.schema), dataset.format, filesystem)
+
+
+'''
+Define a function to build the partition filter for the selected seasons and pitchers
+'''
+def partition_filter(seasons = None, pitchers = None):
+
+    expression = None
+
+    for col, values in [('game_year', seasons), ('pitcher', pitchers)]:
+        if values is None:
+            continue
+
+        condition = ds.field(col).isin(list(values))
+        expression = condition if expression is None else expression & condition
+
+    return expression
+
+
+'''
+Define a function to read the pitch data, loading only the requested columns
+and only the partitions of the requested seasons and pitchers
+'''
+def read_pitch_data(in_path, columns = None, seasons = None, pitchers = None):
+
+    dataset = open_pitch_dataset(in_path)
+
+    # keep the requested columns in dataset order, skipping ones not stored
+    if columns is not None:
+        columns = [col for col in dataset.schema.names if col in set(columns)]
+
+    table = dataset.to_table(columns = columns, filter = partition_filter(seasons, pitchers))
+
+    df = table.to_pandas()
+
+    # partition keys come back as dictionary columns, restore their integer type
+    for col in PARTITION_COLUMNS:
+        if col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(np.int64)
+
+    return df
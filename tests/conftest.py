@@ -0,0 +1,107 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+import datetime
+import os
+import sys
+
+# local stand-in server
+import http.server
+import threading
+import urllib.parse
+
+import pytest
+
+
+##### Global Options -----
+
+# the modules live flat in archive and import each other by name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'archive'))
+
+from statcast_download import NUMERIC_COLUMNS, QUERY_TIMEOUT_MESSAGE
+
+
+##### Define Functions -----
+
+'''
+Define a function to build raw statcast pitches for a few games a day between two dates,
+two pitchers a side and a few pitches to each at bat
+'''
+def make_raw(start_dt, end_dt, games = 2, innings = 3, seed = 0):
+
+    rng = np.random.default_rng(seed)
+    rows = []
+    game_pk = 600000
+
+    for day in pd.date_range(start_dt, end_dt):
+        for game in range(games):
+            game_pk += 1
+            for half, (starter, reliever) in enumerate([(100 + game, 200 + game), (300 + game, 400 + game)]):
+                for inning in range(1, innings + 1):
+                    for outs in range(3):
+                        at_bat_number = (inning - 1) * 6 + half * 3 + outs + 1
+                        for pitch_number in range(1, 4):
+                            rows.append(dict(game_date = day.strftime('%Y-%m-%d'), game_pk = game_pk, inning = inning,
+                                             outs_when_up = outs, inning_topbot = ['Top', 'Bot'][half],
+                                             at_bat_number = at_bat_number, pitch_number = pitch_number,
+                                             pitcher = starter if inning < innings else reliever, batter = 1000 + outs,
+                                             description = 'ball', pitch_type = 'FF', home_team = 'MIN', away_team = 'NYY'))
+
+    raw = pd.DataFrame(rows)
+    for col in NUMERIC_COLUMNS:
+        if col not in raw.columns:
+            raw[col] = rng.normal(size = len(raw)).round(3)
+
+    return raw
+
+
+'''
+Define a fixture serving raw pitches as baseball savant does, by window of dates or by
+game. Windows longer than timeout_days are answered with the timeout message, and windows
+starting on a date in broken are answered with that body. Every query is recorded in calls.
+'''
+@pytest.fixture
+def savant_server():
+
+    state = dict(raw = make_raw('2021-04-01', '2021-04-12'), timeout_days = None, broken = dict(), calls = [])
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            raw = state['raw']
+
+            if 'game_pk' in query:
+                state['calls'].append(('game', int(query['game_pk'][0])))
+                body = raw[raw['game_pk'] == int(query['game_pk'][0])].to_csv(index = False).encode()
+
+            else:
+                start, end = query['game_date_gt'][0], query['game_date_lt'][0]
+                state['calls'].append((start, end))
+                days = (datetime.date.fromisoformat(end) - datetime.date.fromisoformat(start)).days
+
+                if start in state['broken']:
+                    body = state['broken'][start]
+                elif state['timeout_days'] is not None and days > state['timeout_days']:
+                    body = QUERY_TIMEOUT_MESSAGE
+                else:
+                    body = raw[(raw['game_date'] >= start) & (raw['game_date'] <= end)].to_csv(index = False).encode()
+
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(body)
+
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target = httpd.serve_forever, daemon = True)
+    thread.start()
+
+    state['url'] = 'http://127.0.0.1:{}/statcast_search/csv'.format(httpd.server_port)
+    yield state
+
+    httpd.shutdown()
+    httpd.server_close()
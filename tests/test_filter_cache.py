@@ -0,0 +1,100 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+
+# object registry
+import weakref
+
+from filter_cache import LRUCache, cached_filter, filter_cache_key
+
+
+##### Define Functions -----
+
+'''
+Define a function to build a cache with a filter function counting its calls
+'''
+def counted_filter(max_bytes = 1024**2):
+
+    cache = LRUCache(max_bytes)
+    calls = []
+
+    @cached_filter(cache = cache)
+    def pitches_over(data, speed_filter):
+        calls.append(speed_filter)
+        return data[data['release_speed'] > speed_filter]
+
+    return cache, pitches_over, calls
+
+
+##### Tests -----
+
+def test_lru_evicts_least_recently_used():
+
+    cache = LRUCache(300)
+    cache.put('a', 'A', 100)
+    cache.put('b', 'B', 100)
+    cache.put('c', 'C', 100)
+    assert cache.get('a') == 'A'
+
+    cache.put('d', 'D', 100)
+
+    assert 'b' not in cache and 'a' in cache
+    assert cache.nbytes == 300
+    assert cache.stats()['evictions'] == 1
+
+
+def test_put_of_oversize_value_drops_the_previous_value():
+
+    cache = LRUCache(300)
+    cache.put('a', 'small', 100)
+    cache.put('a', 'large', 400)
+
+    assert 'a' not in cache
+    assert cache.get('a') is None
+    assert cache.nbytes == 0
+
+
+def test_get_counts_invalid_values_as_misses():
+
+    cache = LRUCache(300)
+    cache.put('a', 'A', 100)
+
+    assert cache.get('a', valid = lambda value: value == 'B') is None
+    assert 'a' not in cache and cache.nbytes == 0
+    assert cache.get('a') is None
+
+    cache.put('a', 'A', 100)
+    assert cache.get('a', valid = lambda value: value == 'A') == 'A'
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_cached_filter_counts_hits_and_misses():
+
+    cache, pitches_over, calls = counted_filter()
+    df = pd.DataFrame({'release_speed': np.arange(90.0, 100.0)})
+
+    first = pitches_over(df, 95)
+    assert pitches_over(df, speed_filter = 95) is first
+    pitches_over(df, 97)
+
+    assert calls == [95, 97]
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_cached_filter_misses_on_a_replaced_frame():
+
+    cache, pitches_over, calls = counted_filter()
+    df = pd.DataFrame({'release_speed': np.arange(90.0, 100.0)})
+
+    # an entry left by another frame under the same id is not served
+    other = pd.DataFrame({'release_speed': np.arange(80.0, 90.0)})
+    cache.put(filter_cache_key('pitches_over', df, {'speed_filter': 95}), (weakref.ref(other), other), 100)
+
+    result = pitches_over(df, 95)
+
+    assert calls == [95]
+    assert len(result) == 4
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert pitches_over(df, 95) is result
@@ -0,0 +1,72 @@
+##### Import Libraries -----
+
+from collections import deque
+
+import pytest
+
+import instrumentation
+
+
+##### Define Functions -----
+
+'''
+Define a fixture recording calls into a record keeping only the last five calls
+'''
+@pytest.fixture
+def small_record(monkeypatch):
+
+    monkeypatch.setattr(instrumentation, 'events', deque(maxlen = 5))
+    instrumentation.enable()
+    yield
+    instrumentation.disable()
+
+
+'''
+Define a function to record calls of a function
+'''
+def record_calls(name, n):
+    for _ in range(n):
+        with instrumentation.span(name, 'filter', cache = 'hit'):
+            pass
+
+
+##### Tests -----
+
+def test_summary_since_a_full_record(small_record):
+
+    record_calls('first', 5)
+    since = instrumentation.recorded
+
+    # the record is full, the new calls replace the oldest ones
+    record_calls('second', 2)
+    table = instrumentation.summary(since)
+
+    assert table['name'].tolist() == ['second']
+    assert table['calls'].tolist() == [2]
+    assert table['cache_hits'].tolist() == [2]
+
+
+def test_summary_since_after_clear(small_record):
+
+    record_calls('first', 3)
+    instrumentation.clear()
+    since = instrumentation.recorded
+
+    assert instrumentation.summary(since).empty
+
+    record_calls('second', 1)
+    assert instrumentation.summary(since)['calls'].tolist() == [1]
+    assert instrumentation.summary()['calls'].tolist() == [1]
+
+
+def test_worker_calls_are_numbered_on_arrival(small_record):
+
+    record_calls('first', 5)
+    since = instrumentation.recorded
+
+    # calls recorded in a worker process keep their fields and get numbers of this record
+    worker_events = [dict(event, name = 'worker') for event in list(instrumentation.events)[:2]]
+    instrumentation.record_events(worker_events)
+
+    assert instrumentation.summary(since)['calls'].tolist() == [2]
+    assert [event['seq'] for event in instrumentation.events][-2:] == [since, since + 1]
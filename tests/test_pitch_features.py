@@ -0,0 +1,120 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+
+import pytest
+
+from pitch_features import batted_ball_type, count_features, runner_features
+
+
+##### Define Functions -----
+
+'''
+Define a function to build raw pitches with every count including four balls, runners
+on base as ids or missing, and batted balls with missing launch_speed_angle
+'''
+def make_pitches(n = 5000, seed = 0):
+
+    rng = np.random.default_rng(seed)
+
+    def runner_ids():
+        return np.where(rng.random(n) < 0.4, rng.integers(100000, 700000, n).astype(float), np.nan)
+
+    return pd.DataFrame(dict(balls = rng.integers(0, 5, n), strikes = rng.integers(0, 3, n),
+                             on_1b = runner_ids(), on_2b = runner_ids(), on_3b = runner_ids(),
+                             launch_speed_angle = np.where(rng.random(n) < 0.6, np.nan, rng.integers(1, 7, n).astype(float))))
+
+
+'''
+Define a function to derive the features with the nested np.where and string
+concatenation of the original data preparation notebook. The numpy the notebook ran on
+promoted the float fallbacks to strings, newer numpy needs them as strings up front.
+'''
+def notebook_features(df):
+
+    df = df.copy()
+
+    df.loc[df["balls"] == 4, "balls"] = 3
+
+    df["count"] = df["balls"].astype(int).astype(str) + "-" + df["strikes"].astype(int).astype(str)
+
+    df['count_advantage'] = np.where(df['count'].isin(['1-0', '2-1', '3-2']), 'Even',
+                            np.where(df['count'].isin(['0-0', '0-1', '1-1']), 'Ahead (<2 strikes)',
+                            np.where(df['count'].isin(['0-2', '1-2', '2-2']), 'Ahead (2 strikes)',
+                            np.where(df['count'].isin(['2-0', '3-0', '3-1']), 'Behind', 'NA'))))
+
+    df['on_1b'] = np.where(df['on_1b'].isna(), 0, 1)
+    df['on_2b'] = np.where(df['on_2b'].isna(), 0, 1)
+    df['on_3b'] = np.where(df['on_3b'].isna(), 0, 1)
+
+    df['runners_on_base'] = np.where((df['on_1b'] == 0) & (df['on_2b'] == 0) & (df['on_3b'] == 0), 'Empty',
+                            np.where((df['on_1b'] == 1) & (df['on_2b'] == 0) & (df['on_3b'] == 0), '1B',
+                            np.where((df['on_1b'] == 0) & (df['on_2b'] == 1) & (df['on_3b'] == 0), '2B',
+                            np.where((df['on_1b'] == 0) & (df['on_2b'] == 0) & (df['on_3b'] == 1), '3B',
+                            np.where((df['on_1b'] == 1) & (df['on_2b'] == 1) & (df['on_3b'] == 0), '1B & 2B',
+                            np.where((df['on_1b'] == 1) & (df['on_2b'] == 0) & (df['on_3b'] == 1), '1B & 3B',
+                            np.where((df['on_1b'] == 0) & (df['on_2b'] == 1) & (df['on_3b'] == 1), '2B & 3B',
+                            np.where((df['on_1b'] == 1) & (df['on_2b'] == 1) & (df['on_3b'] == 1), 'Bases Loaded', str(np.nan)))))))))
+
+    df['batted_ball_type'] = np.where(df['launch_speed_angle'] == 1, 'Weak',
+                             np.where(df['launch_speed_angle'] == 2, 'Topped',
+                             np.where(df['launch_speed_angle'] == 3, 'Under',
+                             np.where(df['launch_speed_angle'] == 4, 'Flare/Burner',
+                             np.where(df['launch_speed_angle'] == 5, 'Solid Contact',
+                             np.where(df['launch_speed_angle'] == 6, 'Barrel',
+                             df['launch_speed_angle'].astype(str)))))))
+
+    return df
+
+
+'''
+Define a function to get the labels of a feature as strings, the missing labels of the
+notebook ('nan' and 'NA') and of the categoricals as None
+'''
+def labels(values):
+
+    values = pd.Series(np.asarray(values, dtype = object))
+
+    return values.where(values.notna() & ~values.isin(['nan', 'NA']), None).tolist()
+
+
+##### Tests -----
+
+@pytest.fixture(scope = 'module')
+def pitches():
+    df = make_pitches()
+    return df, notebook_features(df)
+
+
+def test_count_features_match_notebook(pitches):
+
+    df, expected = pitches
+    count, count_advantage = count_features(df['balls'], df['strikes'])
+
+    # four balls are counted as three, as the notebook does
+    assert (df['balls'] == 4).any()
+    assert labels(count) == labels(expected['count'])
+    assert labels(count_advantage) == labels(expected['count_advantage'])
+
+
+def test_runner_features_match_notebook(pitches):
+
+    df, expected = pitches
+    indicators, runners_on_base = runner_features(df)
+
+    assert df['on_1b'].isna().any() and df['on_1b'].notna().any()
+    for col in ['on_1b', 'on_2b', 'on_3b']:
+        np.testing.assert_array_equal(indicators[col], expected[col].to_numpy())
+    assert labels(runners_on_base) == labels(expected['runners_on_base'])
+
+
+def test_batted_ball_type_matches_notebook(pitches):
+
+    df, expected = pitches
+    result = batted_ball_type(df['launch_speed_angle'])
+
+    # pitches without a batted ball are missing in both
+    assert df['launch_speed_angle'].isna().any()
+    assert labels(result) == labels(expected['batted_ball_type'])
@@ -0,0 +1,63 @@
+##### Import Libraries -----
+
+# data manipulation
+import pandas as pd
+import os
+
+import pytest
+
+import player_names
+from player_names import PlayerNameRegistry
+
+
+##### Define Functions -----
+
+'''
+Define a fixture replacing the pybaseball lookup with one knowing the ids below 1000,
+recording the ids of each lookup
+'''
+@pytest.fixture
+def lookups(monkeypatch):
+
+    calls = []
+
+    def resolve_player_names(ids):
+        calls.append(sorted(ids))
+        return {i: 'Player {}'.format(i) for i in ids if i < 1000}
+
+    monkeypatch.setattr(player_names, 'resolve_player_names', resolve_player_names)
+
+    return calls
+
+
+##### Tests -----
+
+def test_lookup_resolves_unseen_ids_once(lookups, tmp_path):
+
+    path = os.path.join(str(tmp_path), 'player_names.csv')
+
+    registry = PlayerNameRegistry(path)
+    assert registry.lookup([1, 2, 2.0, None]) == {1: 'Player 1', 2: 'Player 2'}
+    assert registry.lookup([2, 3]) == {2: 'Player 2', 3: 'Player 3'}
+    assert lookups == [[1, 2], [3]]
+
+    # a new registry reads the names from disk
+    assert PlayerNameRegistry(path).lookup([1, 2, 3]) == {1: 'Player 1', 2: 'Player 2', 3: 'Player 3'}
+    assert len(lookups) == 2
+
+
+def test_unresolved_ids_are_recorded(lookups, tmp_path):
+
+    path = os.path.join(str(tmp_path), 'player_names.csv')
+
+    registry = PlayerNameRegistry(path)
+    assert registry.lookup([5, 5000]) == {5: 'Player 5', 5000: None}
+
+    # the unknown id is stored with an empty name and not looked up again
+    registry_df = pd.read_csv(path)
+    assert registry_df['player_id'].tolist() == [5, 5000]
+    assert registry_df['name'].isna().tolist() == [False, True]
+
+    assert registry.lookup([5000]) == {5000: None}
+    assert PlayerNameRegistry(path).lookup([5, 5000]) == {5: 'Player 5', 5000: None}
+    assert lookups == [[5, 5000]]
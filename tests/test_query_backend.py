@@ -0,0 +1,154 @@
+##### Import Libraries -----
+
+# data manipulation
+import pandas as pd
+import itertools
+import os
+
+import pytest
+
+from statcast_synthetic import synthetic_pitch_data
+from storage import write_pitch_data
+from stat_cube import write_stat_cube, stat_cube_path
+from query_backend import QueryBackend, profile_path, write_profile
+from filter_cache import filter_cache
+from plotting import (COMPARE_STATS, DASHBOARD_COLUMNS, load_data, statcast_count_filter, statcast_df_filter,
+                      statcast_pitcher_summary_filter, statcast_tto_summary_filter)
+
+
+##### Global Options -----
+
+# columns pitches are sorted on for comparison
+PITCH_ORDER = ['game_pk', 'at_bat_number', 'pitch_number']
+
+# groupings of the pitch counts compared
+COUNT_GROUPS = [['pitch_name'], ['count'], ['count', 'pitch_name'], ['count_advantage', 'pitch_name'], ['events'], ['batted_ball_type']]
+
+
+##### Define Functions -----
+
+'''
+Define a fixture writing synthetic pitch data with its stored profile and stat cube,
+and loading it both in memory and as the on-disk backend
+'''
+@pytest.fixture(scope = 'module')
+def pitch_data(tmp_path_factory):
+
+    pitch_path = str(tmp_path_factory.mktemp('pitch_data'))
+    write_pitch_data(synthetic_pitch_data(0.1, seed = 1), pitch_path)
+    write_profile(pitch_path)
+    write_stat_cube(pitch_path)
+
+    df = load_data(pitch_path, 'pitch_data', columns = DASHBOARD_COLUMNS)
+    db = load_data(pitch_path, 'pitch_data', columns = DASHBOARD_COLUMNS, out_of_core = True)
+
+    # small batches so aggregations combine many partial results
+    db.batch_rows = 5000
+
+    return pitch_path, df, db
+
+
+'''
+Define a function to build the filter selections compared: everything, narrowed
+selections, and a single batter which the stat cube does not hold
+'''
+def filter_selections(df):
+
+    pitch_names = sorted(df['pitch_name'].dropna().unique())
+    full = dict(pitch_name_filter = pitch_names,
+                stand_filter = ['L', 'R'],
+                batter_name_filter = 'All',
+                count_filter = sorted(df['count'].dropna().unique()),
+                count_advantage_filter = sorted(df['count_advantage'].dropna().unique()),
+                outs_when_up_filter = sorted(df['outs_when_up'].unique()),
+                inning_filter = sorted(df['inning'].unique()),
+                runners_on_base_filter = sorted(df['runners_on_base'].dropna().unique()),
+                run_differential_filter = (-20, 20))
+
+    return [full,
+            dict(full, pitch_name_filter = pitch_names[:2], stand_filter = ['R'], run_differential_filter = (-2, 3)),
+            dict(full, count_filter = ['0-0', '3-2'], inning_filter = [1, 2, 3], runners_on_base_filter = ['Empty']),
+            dict(full, batter_name_filter = df['batter_name'].iloc[0])]
+
+
+'''
+Define a function to summarise the times through order statistics of filtered pitches
+with pandas means, which skip missing values
+'''
+def pandas_tto_summary(df, pitcher_name, filters):
+
+    df = statcast_df_filter(df, pitcher_name, **filters)
+    stats = dict(game_pk = 'count', **{col: 'mean' for col in COMPARE_STATS})
+
+    return df.groupby(['pitcher_name', 'tto'], observed = True).agg(stats).reset_index()
+
+
+##### Tests -----
+
+def test_query_backend_is_abstract():
+
+    with pytest.raises(TypeError):
+        QueryBackend()
+
+
+def test_backend_reads_stored_summaries(pitch_data):
+
+    pitch_path, df, db = pitch_data
+
+    assert isinstance(db, QueryBackend)
+    assert os.path.isdir(profile_path(pitch_path)) and os.path.isdir(stat_cube_path(pitch_path))
+    assert db.stat_cube() is not None
+    assert len(db) == len(df)
+
+    # the filter widgets get the values and the frame the dtypes of the in-memory data
+    for col in ['pitcher_name', 'pitch_name', 'count', 'runners_on_base']:
+        assert set(db[col].dropna()) == set(df[col].dropna())
+    for col, dtype in db.dtypes.items():
+        assert str(dtype) == str(df[col].dtype)
+
+
+@pytest.mark.parametrize('pitcher_rank, selection', list(itertools.product([0, 5, 50], range(4))))
+def test_backend_matches_in_memory(pitch_data, pitcher_rank, selection):
+
+    _, df, db = pitch_data
+    pitcher_name = df['pitcher_name'].value_counts().index[pitcher_rank]
+    filters = filter_selections(df)[selection]
+    filter_cache.clear()
+
+    expected = statcast_df_filter(df, pitcher_name, **filters)
+    result = statcast_df_filter(db, pitcher_name, **filters)
+    pd.testing.assert_frame_equal(expected.sort_values(PITCH_ORDER).reset_index(drop = True),
+                                  result[expected.columns].sort_values(PITCH_ORDER).reset_index(drop = True))
+
+    for by in COUNT_GROUPS:
+        pd.testing.assert_series_equal(statcast_count_filter(df, by, pitcher_name, **filters),
+                                       statcast_count_filter(db, by, pitcher_name, **filters),
+                                       check_index_type = False, check_dtype = False)
+
+    pd.testing.assert_frame_equal(statcast_tto_summary_filter(df, pitcher_name, **filters),
+                                  statcast_tto_summary_filter(db, pitcher_name, **filters),
+                                  check_dtype = False, check_categorical = False, rtol = 1e-6)
+    pd.testing.assert_frame_equal(statcast_pitcher_summary_filter(df, pitcher_name, **filters),
+                                  statcast_pitcher_summary_filter(db, pitcher_name, **filters),
+                                  check_dtype = False, check_categorical = False, rtol = 1e-9)
+
+
+@pytest.mark.parametrize('selection', range(3))
+def test_stat_cube_means_skip_missing_values(pitch_data, selection):
+
+    _, df, db = pitch_data
+    pitcher_name = df['pitcher_name'].value_counts().index[0]
+    filters = filter_selections(df)[selection]
+    filter_cache.clear()
+
+    expected = pandas_tto_summary(df, pitcher_name, filters)
+
+    # the selection holds missing statistics, so the means differ from sums over all pitches
+    pitches = statcast_df_filter(df, pitcher_name, **filters)
+    assert pitches[['whiff_ind', 'woba_value', 'launch_speed']].isna().any().all()
+
+    # summed from the stat cube built in memory and from the stored stat cube
+    assert db.cube_totals(['pitcher_name', 'tto'], ['game_pk'] + COMPARE_STATS, pitcher_name, *filters.values()) is not None
+    for data in [df, db]:
+        pd.testing.assert_frame_equal(expected, statcast_tto_summary_filter(data, pitcher_name, **filters),
+                                      check_dtype = False, check_categorical = False, rtol = 1e-6)
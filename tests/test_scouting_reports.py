@@ -0,0 +1,26 @@
+##### Import Libraries -----
+
+import os
+
+from statcast_synthetic import synthetic_pitch_data
+from storage import write_pitch_data
+import scouting_reports
+
+
+##### Tests -----
+
+def test_write_reports_reports_unknown_pitchers(tmp_path, capsys):
+
+    pitch_path = os.path.join(str(tmp_path), 'pitch_data')
+    df = synthetic_pitch_data(0.02, seed = 2)
+    write_pitch_data(df, pitch_path)
+
+    pitcher = sorted(df['pitcher_name'].dropna().unique())[0]
+    out_dir = os.path.join(str(tmp_path), 'reports')
+
+    failed = scouting_reports.write_reports(pitch_path, out_dir, pitchers = [pitcher, 'Not A Pitcher'], workers = 0)
+
+    # the known pitcher gets a report, the unknown name is printed and returned
+    assert failed == ['Not A Pitcher']
+    assert 'Unknown pitchers: Not A Pitcher' in capsys.readouterr().out
+    assert os.path.exists(os.path.join(out_dir, scouting_reports.report_name(pitcher) + '.html'))
@@ -0,0 +1,117 @@
+##### Import Libraries -----
+
+# data manipulation
+import pandas as pd
+import datetime
+import os
+
+import pytest
+
+import statcast_download as sd
+
+
+##### Define Functions -----
+
+'''
+Define a function to download from the stand-in server without retries
+'''
+def download(savant_server, checkpoint_dir, start_dt = '2021-04-01', end_dt = '2021-04-10', step = 5):
+    return sd.download_statcast(start_dt, end_dt, str(checkpoint_dir), step = step, max_workers = 4,
+                                base_url = savant_server['url'], retries = 0, backoff = 0, verbose = False)
+
+
+'''
+Define a function to get the expected raw pitches between two dates
+'''
+def expected(savant_server, start_dt = '2021-04-01', end_dt = '2021-04-10'):
+    raw = savant_server['raw']
+    return raw[(raw['game_date'] >= start_dt) & (raw['game_date'] <= end_dt)]
+
+
+'''
+Define a function to sort downloaded pitches for comparison
+'''
+def sort_pitches(df):
+    return df.sort_values(['game_pk', 'at_bat_number', 'pitch_number']).reset_index(drop = True)
+
+
+##### Tests -----
+
+def test_download_windows(savant_server, tmp_path):
+
+    data = download(savant_server, tmp_path)
+
+    pd.testing.assert_frame_equal(sort_pitches(data), sort_pitches(expected(savant_server)), check_dtype = False)
+    assert sorted(savant_server['calls']) == [('2021-04-01', '2021-04-05'), ('2021-04-06', '2021-04-10')]
+    assert sorted(os.listdir(tmp_path)) == ['2021-04-01_2021-04-05.csv', '2021-04-06_2021-04-10.csv']
+
+
+def test_download_splits_timeouts(savant_server, tmp_path):
+
+    # windows of more than two days time out and are split in halves
+    savant_server['timeout_days'] = 1
+    data = download(savant_server, tmp_path, step = 10)
+
+    pd.testing.assert_frame_equal(sort_pitches(data), sort_pitches(expected(savant_server)), check_dtype = False)
+    assert ('2021-04-01', '2021-04-10') in savant_server['calls']
+
+    windows = [sd.CHECKPOINT_PATTERN.match(name).groups() for name in os.listdir(tmp_path)]
+    assert all((datetime.date.fromisoformat(end) - datetime.date.fromisoformat(start)).days <= 1 for start, end in windows)
+
+
+def test_download_single_day_timeout_fails(savant_server, tmp_path):
+
+    # a one day window that times out cannot be split and fails without a checkpoint
+    savant_server['timeout_days'] = -1
+    data = download(savant_server, tmp_path, start_dt = '2021-04-01', end_dt = '2021-04-02', step = 2)
+
+    assert data.empty
+    assert os.listdir(tmp_path) == []
+
+
+def test_download_resumes_from_checkpoints(savant_server, tmp_path):
+
+    download(savant_server, tmp_path, end_dt = '2021-04-05')
+    savant_server['calls'].clear()
+
+    # only the dates without a checkpoint are requested
+    data = download(savant_server, tmp_path, end_dt = '2021-04-10')
+
+    assert savant_server['calls'] == [('2021-04-06', '2021-04-10')]
+    pd.testing.assert_frame_equal(sort_pitches(data), sort_pitches(expected(savant_server)), check_dtype = False)
+
+    # a download inside the stored windows requests nothing and returns the requested dates only
+    savant_server['calls'].clear()
+    data = download(savant_server, tmp_path, start_dt = '2021-04-03', end_dt = '2021-04-07')
+
+    assert savant_server['calls'] == []
+    pd.testing.assert_frame_equal(sort_pitches(data), sort_pitches(expected(savant_server, '2021-04-03', '2021-04-07')),
+                                  check_dtype = False)
+
+
+@pytest.mark.parametrize('body', [b'', b'<html><body>Service Unavailable</body></html>', b'\xff\xfe\x00garbage'])
+def test_download_invalid_body_is_not_checkpointed(savant_server, tmp_path, body):
+
+    savant_server['broken']['2021-04-06'] = body
+    data = download(savant_server, tmp_path)
+
+    # the broken window fails without a checkpoint, the others are kept
+    assert os.listdir(tmp_path) == ['2021-04-01_2021-04-05.csv']
+    pd.testing.assert_frame_equal(sort_pitches(data), sort_pitches(expected(savant_server, end_dt = '2021-04-05')), check_dtype = False)
+
+    # a rerun requests the failed window again
+    savant_server['broken'].clear()
+    savant_server['calls'].clear()
+    data = download(savant_server, tmp_path)
+
+    assert savant_server['calls'] == [('2021-04-06', '2021-04-10')]
+    pd.testing.assert_frame_equal(sort_pitches(data), sort_pitches(expected(savant_server)), check_dtype = False)
+
+
+def test_check_csv_accepts_windows_without_pitches():
+
+    content = pd.DataFrame(columns = ['game_date', 'game_pk', 'pitcher']).to_csv(index = False).encode()
+
+    assert sd.check_csv(content, 'url') == content
+    with pytest.raises(sd.InvalidResponseError):
+        sd.check_csv(b'', 'url')
@@ -0,0 +1,111 @@
+##### Import Libraries -----
+
+# data manipulation
+import pandas as pd
+
+import pytest
+
+import statcast_ingest as si
+
+
+##### Define Functions -----
+
+'''
+Define a function to ingest from the stand-in server
+'''
+def ingest(savant_server, raw_dir, end_dt, **kwargs):
+    return si.ingest_statcast(str(raw_dir), '2021-04-01', end_dt, base_url = savant_server['url'], max_workers = 4,
+                              verbose = False, **kwargs)
+
+
+'''
+Define a function to get the game ids of a date on the stand-in server
+'''
+def date_games(savant_server, game_date):
+    raw = savant_server['raw']
+    return sorted(int(i) for i in raw.loc[raw['game_date'] == game_date, 'game_pk'].unique())
+
+
+'''
+Define a function to get the game ids stored for a date in the manifest
+'''
+def stored_games(raw_dir, game_date):
+    return sorted(int(i) for i in si.read_manifest(str(raw_dir))['dates'][game_date]['games'])
+
+
+##### Tests -----
+
+def test_ingest_stores_missing_dates(savant_server, tmp_path):
+
+    delta = ingest(savant_server, tmp_path, '2021-04-03')
+
+    manifest = si.read_manifest(str(tmp_path))
+    assert sorted(manifest['dates']) == ['2021-04-01', '2021-04-02', '2021-04-03']
+    assert len(delta) == len(si.load_raw_data(str(tmp_path))) == (savant_server['raw']['game_date'] <= '2021-04-03').sum()
+
+    # a second run only downloads the new dates
+    savant_server['calls'].clear()
+    delta = ingest(savant_server, tmp_path, '2021-04-05', recheck_days = 0)
+
+    assert savant_server['calls'] == [('2021-04-04', '2021-04-05')]
+    assert si.read_manifest(str(tmp_path))['last_delta']['dates'] == ['2021-04-04', '2021-04-05']
+
+
+@pytest.mark.parametrize('late_games', [1, 2])
+def test_recheck_adds_games_posted_late(savant_server, tmp_path, late_games):
+
+    # the last games of a date are not posted yet when the date is stored
+    raw = savant_server['raw']
+    late = date_games(savant_server, '2021-04-03')[-late_games:]
+    savant_server['raw'] = raw[~raw['game_pk'].isin(late)]
+
+    ingest(savant_server, tmp_path, '2021-04-03')
+    assert stored_games(tmp_path, '2021-04-03') == date_games(savant_server, '2021-04-03')
+
+    # once posted they are found by requesting the recheck dates again
+    savant_server['raw'] = raw
+    delta = ingest(savant_server, tmp_path, '2021-04-03')
+
+    assert sorted(delta['game_pk'].astype(int).unique()) == late
+    assert stored_games(tmp_path, '2021-04-03') == date_games(savant_server, '2021-04-03')
+    assert si.read_manifest(str(tmp_path))['last_delta'] == {'dates': ['2021-04-03'], 'game_pks': late}
+    assert len(si.load_raw_data(str(tmp_path), dates = ['2021-04-03'])) == (raw['game_date'] == '2021-04-03').sum()
+
+
+def test_recheck_replaces_changed_games(savant_server, tmp_path):
+
+    ingest(savant_server, tmp_path, '2021-04-03')
+
+    # a game of the recheck date and an older corrected game change, the other games do not
+    raw = savant_server['raw'].copy()
+    recent = date_games(savant_server, '2021-04-03')[0]
+    older = date_games(savant_server, '2021-04-01')[0]
+    raw.loc[raw['game_pk'].isin([recent, older]) & (raw['pitch_number'] == 1), 'release_speed'] = 99.0
+    savant_server['raw'] = raw
+
+    delta = ingest(savant_server, tmp_path, '2021-04-03', corrections = [older])
+
+    assert sorted(delta['game_pk'].astype(int).unique()) == sorted([recent, older])
+    assert si.read_manifest(str(tmp_path))['last_delta'] == {'dates': ['2021-04-01', '2021-04-03'],
+                                                            'game_pks': sorted([recent, older])}
+
+    stored = si.load_raw_data(str(tmp_path), game_pks = [recent, older])
+    assert (stored.loc[stored['pitch_number'] == 1, 'release_speed'] == 99.0).all()
+
+
+def test_recheck_covers_dates_stored_without_games(savant_server, tmp_path):
+
+    # no games of the last date are posted when it is stored
+    raw = savant_server['raw']
+    savant_server['raw'] = raw[raw['game_date'] != '2021-04-03']
+
+    ingest(savant_server, tmp_path, '2021-04-03')
+    assert stored_games(tmp_path, '2021-04-03') == []
+
+    savant_server['raw'] = raw
+    delta = ingest(savant_server, tmp_path, '2021-04-03')
+
+    assert sorted(delta['game_pk'].astype(int).unique()) == date_games(savant_server, '2021-04-03')
+    assert stored_games(tmp_path, '2021-04-03') == date_games(savant_server, '2021-04-03')
+    pd.testing.assert_series_equal(si.load_raw_data(str(tmp_path))['game_date'].value_counts().sort_index(),
+                                   raw.loc[raw['game_date'] <= '2021-04-03', 'game_date'].value_counts().sort_index())
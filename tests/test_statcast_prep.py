@@ -0,0 +1,175 @@
+##### Import Libraries -----
+
+# data manipulation
+import numpy as np
+import pandas as pd
+import os
+
+import statcast_ingest as si
+from statcast_download import NUMERIC_COLUMNS
+from statcast_prep import run_delta_prep, run_prep
+from statcast_synthetic import synthetic_names, synthetic_season
+from storage import read_pitch_data
+from schema import apply_pitch_schema
+
+
+##### Global Options -----
+
+# columns pitches are sorted on for comparison
+PITCH_ORDER = ['game_pk', 'at_bat_number', 'pitch_number']
+
+
+##### Define Functions -----
+
+'''
+Define a function to prep raw pitches with the cells of the original data preparation
+notebook, the pitcher and batter names coming from name_lookup rather than pybaseball
+'''
+def notebook_prep(statcast_df, name_lookup):
+
+    statcast_df = statcast_df[statcast_df['inning'] <= 9.0]
+
+    # starting pitchers and pitchers with over 100 pitches
+    first_inning_ab_0_outs_df = statcast_df[(statcast_df['inning'] == 1) & (statcast_df['outs_when_up'] == 0)][['game_pk', 'inning_topbot', 'at_bat_number', 'pitcher']].drop_duplicates()
+    starting_pitchers = first_inning_ab_0_outs_df[first_inning_ab_0_outs_df['at_bat_number'] == first_inning_ab_0_outs_df.groupby(['game_pk', 'inning_topbot'])['at_bat_number'].transform('min')]['pitcher'].unique()
+    df = statcast_df[statcast_df["pitcher"].isin(starting_pitchers)]
+    df = df[df.groupby(['pitcher'])['pitcher'].transform('count') >= 100]
+
+    # pitcher and batter names
+    names = name_lookup(starting_pitchers)
+    df = df.merge(pd.DataFrame({'pitcher': starting_pitchers, 'pitcher_name': [names[i] for i in starting_pitchers]}), on = 'pitcher', how = 'left')
+    batters = df['batter'].unique()
+    names = name_lookup(batters)
+    df = df.merge(pd.DataFrame({'batter': batters, 'batter_name': [names[i] for i in batters]}), on = 'batter', how = 'left')
+
+    # rare pitch types
+    df = df[~df['pitch_type'].isin(['CS', 'EP', 'FA'])].copy()
+
+    # count features
+    df.loc[df["balls"] == 4, "balls"] = 3
+    df["count"] = df["balls"].astype(int).astype(str) + "-" + df["strikes"].astype(int).astype(str)
+    df['count_advantage'] = np.where(df['count'].isin(['1-0', '2-1', '3-2']), 'Even',
+                            np.where(df['count'].isin(['0-0', '0-1', '1-1']), 'Ahead (<2 strikes)',
+                            np.where(df['count'].isin(['0-2', '1-2', '2-2']), 'Ahead (2 strikes)',
+                            np.where(df['count'].isin(['2-0', '3-0', '3-1']), 'Behind', 'NA'))))
+
+    # on base features
+    for col in ['on_1b', 'on_2b', 'on_3b']:
+        df[col] = np.where(df[col].isna(), 0, 1)
+    df['runners_on_base'] = np.where((df['on_1b'] == 0) & (df['on_2b'] == 0) & (df['on_3b'] == 0), 'Empty',
+                            np.where((df['on_1b'] == 1) & (df['on_2b'] == 0) & (df['on_3b'] == 0), '1B',
+                            np.where((df['on_1b'] == 0) & (df['on_2b'] == 1) & (df['on_3b'] == 0), '2B',
+                            np.where((df['on_1b'] == 0) & (df['on_2b'] == 0) & (df['on_3b'] == 1), '3B',
+                            np.where((df['on_1b'] == 1) & (df['on_2b'] == 1) & (df['on_3b'] == 0), '1B & 2B',
+                            np.where((df['on_1b'] == 1) & (df['on_2b'] == 0) & (df['on_3b'] == 1), '1B & 3B',
+                            np.where((df['on_1b'] == 0) & (df['on_2b'] == 1) & (df['on_3b'] == 1), '2B & 3B',
+                            np.where((df['on_1b'] == 1) & (df['on_2b'] == 1) & (df['on_3b'] == 1), 'Bases Loaded', str(np.nan)))))))))
+
+    # pitcher statistics
+    df['strike_ind'] = df['description'].isin(['called_strike', 'foul', 'foul_tip', 'swinging_strike', 'hit_into_play', 'hit_into_play', 'foul', 'foul_bunt', 'missed_bunt', 'bunt_foul_tip'])
+    df['whiff_ind'] = np.where(df['description'].isin(['swinging_strike', 'swinging_strike_blocked', 'foul_tip']), 1,
+                      np.where(df['description'].isin(['hit_into_play', 'foul', 'foul_bunt', 'missed_bunt', 'bunt_foul_tip']), 0, np.nan))
+    df["tto"] = df.groupby(["game_pk", "pitcher", "batter"])["at_bat_number"].rank("dense", ascending = True)
+
+    # run differential and pitch height normalization
+    df['run_differential'] = df['fld_score'] - df['bat_score']
+    df['sz_mid'] = (df['sz_bot'] + df['sz_top'])/2
+    sz_bot_avg = df['sz_bot'].mean()
+    sz_mid_avg = df['sz_mid'].mean()
+    df['plate_z_norm'] = (df['plate_z'] - df['sz_mid']) / (df['sz_mid'] - df['sz_bot']) * (sz_mid_avg-sz_bot_avg) + sz_mid_avg
+
+    # batted ball type, event names and next count
+    df['batted_ball_type'] = np.where(df['launch_speed_angle'] == 1, 'Weak',
+                             np.where(df['launch_speed_angle'] == 2, 'Topped',
+                             np.where(df['launch_speed_angle'] == 3, 'Under',
+                             np.where(df['launch_speed_angle'] == 4, 'Flare/Burner',
+                             np.where(df['launch_speed_angle'] == 5, 'Solid Contact',
+                             np.where(df['launch_speed_angle'] == 6, 'Barrel',
+                             df['launch_speed_angle'].astype(str)))))))
+    df['events'] = df['events'].str.replace("_", " ").str.capitalize()
+    df['lead_count'] = df.sort_values(['pitcher_name', 'game_pk', 'at_bat_number', 'pitch_number']).groupby(['game_pk', 'at_bat_number'])['count'].shift(-1)
+
+    # labels built with np.where hold 'nan', stored as missing
+    text_cols = [col for col in df.columns if df[col].dtype == object]
+    df[text_cols] = df[text_cols].mask(df[text_cols] == 'nan')
+
+    return df
+
+
+'''
+Define a function to assert that two preps hold the same pitches with the same values,
+comparing labels as text and numbers as floats
+'''
+def assert_same_pitches(result, expected, approx = ()):
+
+    assert len(result) == len(expected)
+
+    result = result.sort_values(PITCH_ORDER).reset_index(drop = True)
+    expected = expected.sort_values(PITCH_ORDER).reset_index(drop = True)
+
+    for col in expected.columns:
+        if col == 'index':
+            continue
+        x, y = result[col], expected[col]
+        if pd.api.types.is_numeric_dtype(y) or pd.api.types.is_bool_dtype(y):
+            np.testing.assert_allclose(x.to_numpy(dtype = float), y.to_numpy(dtype = float),
+                                       rtol = 1e-6, atol = 0.05 if col in approx else 0, equal_nan = True, err_msg = col)
+        else:
+            assert x.astype(object).where(x.notna(), None).tolist() == y.astype(object).where(y.notna(), None).tolist(), col
+
+
+'''
+Define a function to get raw pitches of a synthetic season as the daily refresh reads
+them from baseball savant
+'''
+def savant_raw(share = 0.05, seed = 0):
+
+    raw = synthetic_season(2021, share, seed).drop(columns = ['index'])
+    raw = raw.assign(game_date = raw['game_date'].dt.strftime('%Y-%m-%d'))
+
+    return raw.assign(**{col: np.nan for col in NUMERIC_COLUMNS if col not in raw.columns})
+
+
+##### Tests -----
+
+def test_run_prep_matches_notebook(tmp_path):
+
+    source = os.path.join(str(tmp_path), 'all_21_dataframe.csv')
+    synthetic_season(2021, 0.05, 0).to_csv(source, sep = ';', index = None)
+
+    expected = apply_pitch_schema(notebook_prep(pd.read_csv(source, sep = ';'), synthetic_names))
+
+    # chunks much smaller than the season, so the season wide inputs come from the context pass
+    out_path = os.path.join(str(tmp_path), 'pitch_data')
+    n_rows = run_prep(source, out_path, chunk_rows = 3000, name_lookup = synthetic_names, verbose = False)
+
+    assert n_rows == len(expected)
+    assert_same_pitches(read_pitch_data(out_path), expected)
+
+
+def test_run_delta_prep_matches_full_prep(savant_server, tmp_path):
+
+    savant_server['raw'] = savant_raw()
+    raw_dir = os.path.join(str(tmp_path), 'raw')
+    out_path = os.path.join(str(tmp_path), 'pitch_data')
+
+    def ingest(end_dt):
+        si.ingest_statcast(raw_dir, '2021-04-01', end_dt, recheck_days = 0, base_url = savant_server['url'], verbose = False)
+
+    # prep the first days in full, then the later days as a delta
+    ingest('2021-04-05')
+    run_prep(raw_dir, out_path, chunk_rows = 3000, name_lookup = synthetic_names, verbose = False)
+
+    ingest('2021-04-10')
+    n_rows = run_delta_prep(raw_dir, out_path, name_lookup = synthetic_names, verbose = False)
+    assert n_rows > 0
+
+    full_path = os.path.join(str(tmp_path), 'full')
+    run_prep(raw_dir, full_path, chunk_rows = 3000, name_lookup = synthetic_names, verbose = False)
+
+    # the stored pitches keep the strike zone averages of their own prep
+    assert_same_pitches(read_pitch_data(out_path), read_pitch_data(full_path), approx = ['plate_z_norm'])
+
+    # the summaries of the delta's pitchers are rebuilt
+    for name in ['_count_flow', '_profile', '_stat_cube']:
+        assert os.path.isdir(os.path.join(out_path, name))